@@ -1,10 +1,20 @@
 import argparse
+import concurrent.futures
 import datetime
+import glob
+import hashlib
+import heapq
+import json
 import os
 import platform
+import re
+import shutil
 import site
+import subprocess
 import sys
 import sysconfig
+import threading
+import time
 import toml
 #import tomllib
 from colorama import Fore, Back, Style
@@ -199,6 +209,30 @@ def _total_src_file_count(modules: str):
                 count += 1
     return count
 
+def _pycfml_extensions():
+    # {extension name: component files} of the split 'src-cfml-wraps' extensions, if enabled
+    src_name = CONFIG['pycfml']['src-name']
+    extensions = {}
+    for module in CONFIG['src-cfml-wraps']:
+        split = module.get('extensions', {})
+        if split.get('split', False):
+            for domain, component_files in split['domains'].items():
+                extensions[f'{src_name}_{domain}'] = component_files
+    return extensions
+
+def _pycfml_extension_core_files():
+    core_files = []
+    for module in CONFIG['src-cfml-wraps']:
+        core_files.extend(module.get('extensions', {}).get('core-files', []))
+    return core_files
+
+def _pycfml_lib_names():
+    # names of the shared objects to build: either the split extensions or the single 'src-name'
+    extensions = _pycfml_extensions()
+    if extensions:
+        return list(extensions)
+    return [CONFIG['pycfml']['src-name']]
+
 def _bash_syntax():
     bash_syntax = False  # if '--bash-syntax' is undefined
     if ARGS.bash_syntax:
@@ -249,8 +283,48 @@ def _compiler_options():
             if build['modes'][mode]:
                 options += f" {build['modes'][mode]}"
             break
+    if _profile_option('options'):
+        options += f" {_profile_option('options')}"
     return options
 
+def _build_profile():
+    # options of the build profile given by '--profile' for the compiler, or none by default
+    if not ARGS.profile:
+        return {}
+    compiler = _compiler_name()
+    for build in CONFIG['build-configs']:
+        if _platform() in build['platforms'] and compiler in build['compilers']:
+            profiles = build.get('profiles', {})
+            if ARGS.profile in profiles:
+                return profiles[ARGS.profile]
+            break
+    _print_error_msg(f"No build profile '{ARGS.profile}' for compiler '{compiler}' on platform '{_platform()}'")
+    exit(1)
+
+def _profile_data_path():
+    # profile data of the 'pgo-train' build, used by the 'pgo' one; kept apart from the build cache,
+    # so that '--clean-cache' does not remove it
+    return os.path.join(_project_path(), CONFIG['project']['dir']['profile-data'], f'{_platform()}-{_compiler_name()}')
+
+def _profile_option(key: str):
+    option = _build_profile().get(key, '')
+    option = option.replace('{PROFILE_DATA}', _profile_data_path())
+    return option
+
+def _profile_data_hash():
+    # hash of the profile data used by the profile, so objects are rebuilt after new training
+    if '{PROFILE_DATA}' not in _build_profile().get('options', '') or ARGS.profile == 'pgo-train':
+        return ''
+    paths = _input_files([_profile_data_path()])
+    if not paths:
+        _print_error_msg(f"No profile data in '{_profile_data_path()}' for build profile '{ARGS.profile}', "
+                         f"build with '--profile pgo-train' and run 'train_pgo_profile' first")
+        exit(1)
+    hasher = hashlib.sha256()
+    for path in paths:
+        hasher.update(f'{path}:{_file_hash(path)}'.encode())
+    return hasher.hexdigest()
+
 def _obj_ext():
     compiler = _compiler_name()
     ext = ''
@@ -312,8 +386,12 @@ def _compile_obj_script_line(src_path: str,
     cmd = cmd.replace('{PATH}', src_path)
     return cmd
 
-def _compile_pycfml_shared_obj_or_dynamic_lib_script_line():
-    src_name = CONFIG['pycfml']['src-name']
+def _compile_pycfml_shared_obj_or_dynamic_lib_script_line(src_name: str='',
+                                                           component_files: list=None):
+    if not src_name:
+        src_name = CONFIG['pycfml']['src-name']
+    if component_files is None:
+        component_files = []
     shared_lib_ext = CONFIG['build']['shared-lib-ext'][_platform()]
     cfml_lib_name = CONFIG['cfml']['static-lib-name']
     cfml_dist_dir = CONFIG['cfml']['dir']['dist']
@@ -321,7 +399,10 @@ def _compile_pycfml_shared_obj_or_dynamic_lib_script_line():
     cfml_lib_dist_dir = CONFIG['cfml']['dir']['dist-lib']
     cfml_lib_dist_path = os.path.join(_project_path(), cfml_lib_dist_dir)
     cmd = _compiler_build_shared_template()
-    cmd = cmd.replace('{COMPILER}', _compiler_name())
+    if component_files:  # link only the objects of this extension instead of all 'Wraps_*'
+        obj_names = ' '.join(f'{name}.{{OBJ_EXT}}' for name in component_files)
+        cmd = cmd.replace('Wraps_*.{OBJ_EXT}', obj_names)
+    cmd = cmd.replace('{COMPILER}', f"{_compiler_name()} {_profile_option('link-options')}".strip())
     cmd = cmd.replace('{PATH}', src_name)
     cmd = cmd.replace('{OBJ_EXT}', _compiler_obj_ext())
     #cmd = cmd.replace('{PATH}.{OBJ_EXT}', f'*.{obj_ext}')  # CFML_Wraps.o Wraps_*.o crysfml08lib.o
@@ -332,51 +413,359 @@ def _compile_pycfml_shared_obj_or_dynamic_lib_script_line():
     cmd = cmd.replace('{PYTHON_LIB}', _python_lib())
     return cmd
 
+def _build_cache_enabled():
+    return CONFIG['build'].get('cache', True)
+
+def _build_cache_path():
+    return os.path.join(_project_path(), CONFIG['project']['dir']['cache'])
+
+def _dir_size(path: str):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+def _prune_build_cache():
+    # removes the least recently used entries until the cache fits in 'build.cache-max-size' MB,
+    # an entry being used when it is stored or restored
+    max_size = CONFIG['build'].get('cache-max-size', 0) * 1024**2
+    if not max_size:
+        return
+    entries = []
+    for kind in ('objs', 'cmds'):
+        kind_path = os.path.join(_build_cache_path(), kind)
+        if os.path.isdir(kind_path):
+            for key in os.listdir(kind_path):
+                entry_path = os.path.join(kind_path, key)
+                if os.path.isdir(entry_path) and not key.endswith('.tmp'):
+                    entries.append((os.path.getmtime(entry_path), entry_path, _dir_size(entry_path)))
+    size = sum(entry[2] for entry in entries)
+    removed = 0
+    for _, entry_path, entry_size in sorted(entries):
+        if size <= max_size:
+            break
+        shutil.rmtree(entry_path, ignore_errors=True)
+        size -= entry_size
+        removed += 1
+    if removed:
+        _print_msg(f"Pruned {removed} least recently used build cache entries to {size / 1024**2:.0f} MB")
+
+def clean_build_cache():
+    cache_path = _build_cache_path()
+    if os.path.isdir(cache_path):
+        shutil.rmtree(cache_path)
+    _print_msg(f"Removed build cache '{cache_path}'")
+
+def _file_hash(path: str):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+def _input_files(patterns: list):
+    # files matching the glob patterns, including the files under matching dirs
+    files = set()
+    for pattern in patterns:
+        for path in glob.glob(pattern):
+            if os.path.isdir(path):
+                for root, _, names in os.walk(path):
+                    files.update(os.path.join(root, name) for name in names)
+            else:
+                files.add(path)
+    return sorted(files)
+
+def _restore_from_build_cache(kind: str,
+                              key: str,
+                              outputs: list):
+    # copies the cached outputs of the key back to their paths, if all of them are cached
+    entry_path = os.path.join(_build_cache_path(), kind, key)
+    if not os.path.isdir(entry_path):
+        return False
+    os.utime(entry_path)  # recently used, kept by _prune_build_cache()
+    for output in outputs:
+        cached_path = os.path.join(entry_path, os.path.basename(os.path.normpath(output)))
+        if os.path.isdir(cached_path):
+            shutil.copytree(cached_path, output, dirs_exist_ok=True)
+        elif os.path.isfile(cached_path):
+            shutil.copy2(cached_path, output)
+        else:
+            return False
+    return True
+
+def _store_in_build_cache(kind: str,
+                          key: str,
+                          outputs: list):
+    # copies the outputs to a temporary entry, which is then renamed to the key to be complete
+    entry_path = os.path.join(_build_cache_path(), kind, key)
+    if os.path.isdir(entry_path):
+        return
+    tmp_path = f'{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    os.makedirs(tmp_path, exist_ok=True)
+    for output in outputs:
+        cached_path = os.path.join(tmp_path, os.path.basename(os.path.normpath(output)))
+        if os.path.isdir(output):
+            shutil.copytree(output, cached_path)
+        else:
+            shutil.copy2(output, cached_path)
+    try:
+        os.rename(tmp_path, entry_path)
+    except OSError:  # stored meanwhile by another job
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+def _cached_cmd_line(cmd: str,
+                     inputs: list,
+                     outputs: list):
+    # runs the command through 'pybuild.py' to reuse its outputs from the build cache, as long
+    # as the command and the content of its inputs did not change
+    if not _build_cache_enabled():
+        return cmd
+    inputs = ' '.join(f"'{path}'" for path in inputs)  # expanded by pybuild.py, not the shell
+    outputs = ' '.join(outputs)
+    options = f'--cached-inputs {inputs} --cached-outputs {outputs} -- {cmd}'
+    cached_cmd = CONFIG['template']['run-python']
+    cached_cmd = cached_cmd.replace('{PATH}', os.path.join(_project_path(), 'pybuild.py'))
+    cached_cmd = cached_cmd.replace('{OPTIONS}', options)
+    return cached_cmd
+
+def run_cached_cmd(cmd: list,
+                   inputs: list,
+                   outputs: list):
+    hasher = hashlib.sha256()
+    hasher.update(' '.join(cmd).encode())
+    for path in _input_files(inputs):
+        hasher.update(f'{path}:{_file_hash(path)}'.encode())
+    key = hasher.hexdigest()
+    if _restore_from_build_cache('cmds', key, outputs):
+        _print_msg(f"Reused cached {', '.join(outputs)}")
+        return
+    p = subprocess.run(cmd)
+    if p.returncode:
+        exit(p.returncode)
+    _store_in_build_cache('cmds', key, outputs)
+    _prune_build_cache()
+
 def _compile_objs_script_lines(modules: str,
                                src_path: str,
                                include_path: str=''):
-    compiler = _compiler_name()
-    options = _compiler_options()
+    # the objects are compiled by 'pybuild.py --compile-objs' when the script runs, as the
+    # dependency graph is read from the sources, which do not exist yet when creating scripts
+    options = f'--compile-objs {modules} --src-path {src_path}'
+    if include_path:
+        options += f' --include-path {include_path}'
+    options += f' --platform {_platform()} --compiler {_compiler_name()} --mode {_compiling_mode()}'
+    if ARGS.profile:
+        options += f' --profile {ARGS.profile}'
+    if ARGS.jobs:
+        options += f' --jobs {ARGS.jobs}'
+    if _bash_syntax():
+        options += ' --bash-syntax'
+    if _enable_backslash_escapes():
+        options += ' --enable-backslash-escapes'
+    cmd = CONFIG['template']['run-python']
+    cmd = cmd.replace('{PATH}', os.path.join(_project_path(), 'pybuild.py'))
+    cmd = cmd.replace('{OPTIONS}', options)
+    return [cmd]
+
+def _build_jobs():
+    jobs = ARGS.jobs
+    if not jobs:
+        jobs = CONFIG['build'].get('jobs', 0)
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    return jobs
+
+def _src_files(modules: str,
+               src_path: str):
+    # names and paths of the main and components files of the modules, in pybuild.toml order
     src_ext = CONFIG['build']['src-ext']
-    template_cmd = CONFIG['template']['build-obj']
-    if not include_path:
-        template_cmd = template_cmd.replace(' -I {INCLUDE}', '')
-    else:
-        template_cmd = template_cmd.replace('{INCLUDE}', include_path)
-    total = _total_src_file_count(modules)
-    current = 0
-    lines = []
+    files = {}
     for module in CONFIG[modules]:
         if 'main-file' in module:
-            current += 1
             name = f'{module["main-file"]}.{src_ext}'
-            msg = _echo_progress_msg(current, total, f'{name}')
-            lines.append(msg)
-            path = os.path.join(src_path, name)
-            cmd = template_cmd
-            cmd = cmd.replace('{COMPILER}', compiler)
-            cmd = cmd.replace('{OPTIONS}', options)
-            cmd = cmd.replace('{PATH}', path)
-            lines.append(cmd)
+            files[name] = os.path.join(src_path, name)
         if 'components-dir' in module and 'components-files' in module:
             components_dir = module['components-dir']
             for component_file in module['components-files']:
-                current += 1
-                name = f'{component_file}.{src_ext}'
-                path = os.path.join(components_dir, name)
-                msg = _echo_progress_msg(current, total, f'{components_dir}/{name}')
-                lines.append(msg)
-                path = os.path.join(src_path, path)
-                cmd = template_cmd
-                cmd = cmd.replace('{COMPILER}', compiler)
-                cmd = cmd.replace('{OPTIONS}', options)
-                cmd = cmd.replace('{PATH}', path)
-                cmd = f'{cmd}&'  # start this bash command in background for parallel compilation
-                lines.append(cmd)
-                if current % 11 == 0:  # do not parallelise for more than 10 compilations
-                    lines.append('wait')  # wait for all parallel bash commands to finish
-            lines.append('wait')  # wait for all parallel bash commands to finish
-    return lines
+                name = f'{components_dir}/{component_file}.{src_ext}'
+                files[name] = os.path.join(src_path, components_dir, f'{component_file}.{src_ext}')
+    return files
+
+def _fortran_modules(files: dict):
+    # {name: modules and 'parent:submodule's defined by the file}, {name: modules it uses or extends}
+    module_regex = re.compile(r'^\s*module\s+(?!procedure\b|function\b|subroutine\b|pure\b|elemental\b|recursive\b|impure\b)(\w+)\s*$', re.MULTILINE)
+    submodule_regex = re.compile(r'^\s*submodule\s*\(\s*(\w+)\s*(?::\s*(\w+))?\s*\)\s*(\w+)', re.MULTILINE)
+    use_regex = re.compile(r'^\s*use\b\s*(?:,\s*(intrinsic|non_intrinsic)\s*)?(?:::)?\s*(\w+)', re.MULTILINE)
+    defines = {}
+    needs = {}
+    for name, path in files.items():
+        with open(path, errors='replace') as file:
+            src = '\n'.join(line.split('!')[0] for line in file.read().lower().splitlines())
+        defines[name] = module_regex.findall(src)
+        needs[name] = set()
+        for parent, ancestor, submodule in submodule_regex.findall(src):
+            defines[name].append(f'{parent}:{submodule}')
+            needs[name].add(f'{parent}:{ancestor}' if ancestor else parent)
+        for intrinsic, module in use_regex.findall(src):
+            if intrinsic != 'intrinsic':
+                needs[name].add(module)
+    return defines, needs
+
+def _fortran_dependency_graph(files: dict):
+    # {name: names of the files it depends on}, from the modules and submodules each file
+    # defines and the modules it uses or extends; modules from outside (intrinsic, include
+    # path) are not dependencies
+    defines, needs = _fortran_modules(files)
+    defined_in = {module: name for name, modules in defines.items() for module in modules}
+    graph = {}
+    for name in files:
+        graph[name] = {defined_in[module] for module in needs[name] if module in defined_in} - {name}
+    return graph
+
+def _module_file_names(module: str):
+    # file names of the compiled module or submodule interfaces, e.g. 'm.mod', 'm.smod', 'm@s.smod'
+    if ':' in module:
+        return [module.replace(':', '@') + '.smod']
+    return [f'{module}.mod', f'{module}.smod']
+
+def _module_files(dirs: list):
+    # {lower case name: path} of the compiled module files in the dirs, the first dir first
+    files = {}
+    for dir in reversed([dir for dir in dirs if dir and os.path.isdir(dir)]):
+        for name in os.listdir(dir):
+            if name.lower().endswith('mod'):
+                files[name.lower()] = os.path.join(dir, name)
+    return files
+
+def _obj_cache_key(cmd: str,
+                   src_path: str,
+                   needs: set,
+                   include_path: str,
+                   profile_data_hash: str=''):
+    # hash of the compile command (compiler and options), the source and the compiled
+    # interfaces of the upstream modules, so dependents are only rebuilt if these changed
+    hasher = hashlib.sha256()
+    hasher.update(cmd.encode())
+    hasher.update(profile_data_hash.encode())
+    hasher.update(_file_hash(src_path).encode())
+    module_files = _module_files([os.getcwd(), include_path])
+    for module in sorted(needs):
+        for file_name in _module_file_names(module):
+            if file_name in module_files:
+                hasher.update(f'{file_name}:{_file_hash(module_files[file_name])}'.encode())
+    return hasher.hexdigest()
+
+def _critical_path_lengths(graph: dict,
+                           weights: dict):
+    # longest weighted path from every file to the end of the build
+    dependents = {name: [] for name in graph}
+    for name, deps in graph.items():
+        for dep in deps:
+            dependents[dep].append(name)
+    lengths = {}
+    def length(name, visiting=()):
+        if name not in lengths:
+            if name in visiting:  # dependency cycle, reported by the scheduler
+                return weights[name]
+            lengths[name] = weights[name] + max((length(d, visiting + (name,)) for d in dependents[name]), default=0)
+        return lengths[name]
+    for name in graph:
+        length(name)
+    return lengths
+
+def compile_objs(modules: str,
+                 src_path: str,
+                 include_path: str=''):
+    # compiles the objects in the current dir as a DAG over the dependency graph, starting the
+    # ready file on the longest remaining path first, and reports the compile time of every file
+    files = _src_files(modules, src_path)
+    graph = _fortran_dependency_graph(files)
+    defines, needs = _fortran_modules(files)
+    profile_data_hash = _profile_data_hash()
+    os.makedirs(_build_cache_path(), exist_ok=True)
+    times_path = os.path.join(_build_cache_path(), f'{modules}_compile_times.json')
+    previous_times = {}
+    if os.path.isfile(times_path):
+        with open(times_path) as file:
+            previous_times = json.load(file)
+    weights = {name: previous_times.get(name, os.path.getsize(path) / 1.0e+05) for name, path in files.items()}
+    priorities = _critical_path_lengths(graph, weights)
+    order = {name: idx for idx, name in enumerate(files)}
+    waiting = {name: set(deps) for name, deps in graph.items()}
+    ready = []
+    for name, deps in waiting.items():
+        if not deps:
+            heapq.heappush(ready, (-priorities[name], order[name], name))
+    jobs = _build_jobs()
+    total = len(files)
+    times = {}
+    cached = set()
+    failed = []
+    start = time.perf_counter()
+    _print_msg(f"Compiling {total} files of '{modules}' with {jobs} parallel jobs")
+    def compile_file(name):
+        cmd = _compile_obj_script_line(files[name], include_path)
+        obj_name = f'{Path(files[name]).stem}.{_obj_ext()}'
+        file_start = time.perf_counter()
+        key = ''
+        if _build_cache_enabled():
+            key = _obj_cache_key(cmd, files[name], needs[name], include_path, profile_data_hash)
+            cached_names = [obj_name] + [f for module in defines[name] for f in _module_file_names(module)]
+            entry_path = os.path.join(_build_cache_path(), 'objs', key)
+            if os.path.isdir(entry_path):
+                os.utime(entry_path)  # recently used, kept by _prune_build_cache()
+                for file_name in os.listdir(entry_path):
+                    shutil.copy2(os.path.join(entry_path, file_name), file_name)
+                cached.add(name)
+                return name, subprocess.CompletedProcess(cmd, 0, '', ''), time.perf_counter() - file_start
+        p = subprocess.run(cmd, shell=True, text=True, capture_output=True)
+        if key and not p.returncode:
+            module_files = _module_files([os.getcwd()])
+            outputs = [obj_name] + [module_files[f] for f in cached_names[1:] if f in module_files]
+            _store_in_build_cache('objs', key, outputs)
+        return name, p, time.perf_counter() - file_start
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        running = set()
+        while ready or running:
+            while ready and len(running) < jobs and not failed:
+                _, _, name = heapq.heappop(ready)
+                running.add(executor.submit(compile_file, name))
+            if not running:
+                break
+            done, running = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                name, p, seconds = future.result()
+                times[name] = seconds
+                output = (p.stdout + p.stderr).strip()
+                if p.returncode:
+                    failed.append(name)
+                    _print_error_msg(f"Failed to compile '{name}'")
+                    print(output)
+                    continue
+                if name in cached:
+                    _print_msg(f"[{_compiling_progress(len(times), total):>3}%] {name} (cached)")
+                else:
+                    _print_msg(f"[{_compiling_progress(len(times), total):>3}%] {name} ({seconds:.2f} s)")
+                if output:
+                    print(output)
+                for dependent, deps in waiting.items():
+                    if name in deps:
+                        deps.discard(name)
+                        if not deps:
+                            heapq.heappush(ready, (-priorities[dependent], order[dependent], dependent))
+    if failed:
+        _print_error_msg(f"Compilation of '{modules}' failed: {', '.join(failed)}")
+        exit(1)
+    if len(times) < total:
+        _print_error_msg(f"Dependency cycle between: {', '.join(sorted(set(files) - set(times)))}")
+        exit(1)
+    for name in cached:  # keep the compile times of the reused objects for the priorities
+        times[name] = previous_times.get(name, weights[name])
+    with open(times_path, 'w') as file:
+        json.dump(times, file, indent=2)
+    if _build_cache_enabled():
+        _prune_build_cache()
+    critical_path = max(_critical_path_lengths(graph, times).values(), default=0)
+    _print_msg(f"Compiled {total - len(cached)} and reused {len(cached)} cached files in {time.perf_counter() - start:.2f} s (critical path {critical_path:.2f} s, sum {sum(times.values()):.2f} s)")
+    for name, seconds in sorted(times.items(), key=lambda item: -item[1])[:10]:
+        _print_msg(f"{seconds:8.2f} s  {name}")
 
 def _compile_shared_objs_or_dynamic_libs_script_lines(modules: str):
     shared_lib_ext = CONFIG['build']['shared-lib-ext'][_platform()]
@@ -468,6 +857,10 @@ def parsed_args():
                         choices=['debug', 'release'],
                         type=str.lower,
                         help="compiling mode")
+    parser.add_argument("--profile",
+                        default='',
+                        type=str.lower,
+                        help="build profile of the compiler in pybuild.toml, e.g., lto, native, pgo-train, pgo")
     parser.add_argument("--bash-syntax",
                         action='store_true',
                         help="force bash shell syntax")
@@ -483,6 +876,36 @@ def parsed_args():
     parser.add_argument("--print-release-title",
                         action='store_true',
                         help="print pycfml package release title")
+    parser.add_argument("--split-pycfml-src",
+                        action='store_true',
+                        help="write pycfml sources of the split extensions from the generated ones")
+    parser.add_argument("--compile-objs",
+                        default='',
+                        help="compile objects of the given pybuild.toml modules in the current dir")
+    parser.add_argument("--src-path",
+                        default='',
+                        help="path to the sources of --compile-objs")
+    parser.add_argument("--include-path",
+                        default='',
+                        help="include path for --compile-objs")
+    parser.add_argument("--jobs",
+                        default=0,
+                        type=int,
+                        help="number of parallel compilations (0 for 'build.jobs' in pybuild.toml or the number of cores)")
+    parser.add_argument("--cached-inputs",
+                        nargs='*',
+                        default=[],
+                        help="input files, dirs or glob patterns of the command after '--', keying its build cache entry")
+    parser.add_argument("--cached-outputs",
+                        nargs='*',
+                        default=[],
+                        help="output files or dirs of the command after '--', restored from the build cache if unchanged")
+    parser.add_argument("--clean-cache",
+                        action='store_true',
+                        help="remove the build cache ('project.dir.cache' in pybuild.toml)")
+    parser.add_argument("cached_cmd",
+                        nargs='*',
+                        help="command to run unless its outputs are in the build cache (with --cached-outputs)")
     return parser.parse_args()
 
 def loaded_pyproject():
@@ -538,6 +961,8 @@ def print_build_variables():
     lines.append(msg)
     msg = _echo_msg(f"Compiling mode: {_compiling_mode()}")
     lines.append(msg)
+    msg = _echo_msg(f"Build profile: {ARGS.profile or 'none'}")
+    lines.append(msg)
     #msg = _echo_msg(f"Compiler options '{_compiler_options()}'")
     #lines.append(msg)
     msg = _echo_msg(f"Fortran compiler: {_compiler_name()}")
@@ -686,9 +1111,10 @@ def build_cfml_static_lib():
     lines.append(cmd)
     msg = _echo_msg(f"Creating fortran static library '{lib_name}.{lib_ext}'")
     lines.append(msg)
-    cmd = CONFIG['template']['build-static'][_platform()]
+    cmd = _profile_option('build-static') or CONFIG['template']['build-static'][_platform()]
     cmd = cmd.replace('{LIB}', lib_name)
     cmd = cmd.replace('{OBJ_EXT}', _obj_ext())
+    cmd = _cached_cmd_line(cmd, [f'*.{_obj_ext()}'], [f'{lib_name}.{lib_ext}'])
     lines.append(cmd)
     msg = _echo_msg(f"Exiting build dir '{build_dir}'")
     lines.append(msg)
@@ -926,6 +1352,9 @@ def create_pycfml_src():
     cmd = CONFIG['template']['run-python']
     cmd = cmd.replace('{PATH}', apigen_file)
     cmd = cmd.replace('{OPTIONS}', f'--verbose False --scripts False --build {build_abspath}')
+    apigen_inputs = [os.path.join(_project_path(), apigen_parent_relpath),
+                     os.path.join(_project_path(), CONFIG['cfml']['dir']['repo-src'])]
+    cmd = _cached_cmd_line(cmd, apigen_inputs, [build_abspath])
     lines.append(cmd)
     msg = _echo_msg(f"Exiting build dir '{apigen_parent_relpath}'")
     lines.append(msg)
@@ -935,6 +1364,114 @@ def create_pycfml_src():
     _write_lines_to_file(lines, script_name)
     append_to_main_script(lines)
 
+def _fortran_statements(text: str):
+    # statements of free-form fortran source as lists of their lines, joined over '&' continuations
+    statements = []
+    statement = []
+    for line in text.splitlines():
+        statement.append(line)
+        if not line.split('!')[0].rstrip().endswith('&'):
+            statements.append(statement)
+            statement = []
+    if statement:
+        statements.append(statement)
+    return statements
+
+def _split_pycfml_lib_src(lib_src: str,
+                          lib_name: str,
+                          ext_name: str,
+                          modules: set,
+                          functions: set):
+    # source of one split extension: the generated 'src-name' module with only the wrappers
+    # modules and methods of this extension, and the names changed to the extension name
+    methods = []
+    lines = []
+    for statement in _fortran_statements(lib_src):
+        text = ' '.join(line.strip().rstrip('&') for line in statement).lower()
+        used = re.match(r'\s*use\s+(wraps_\w+)', text)
+        if used and used.group(1) not in modules:
+            continue
+        funloc = re.search(r'add_method\s*\(\s*["\'](\w+)["\'].*c_funloc\s*\(\s*(\w+)\s*\)', text)
+        if funloc:
+            if funloc.group(2) not in functions:
+                continue
+            methods.append(funloc.group(1))
+        lines.extend(statement)
+    src = '\n'.join(lines) + '\n'
+    src = re.sub(r'(method_table\s*%\s*init\s*\(\s*)\d+', rf'\g<1>{len(methods)}', src, flags=re.IGNORECASE)
+    src = re.sub(rf'(?<![a-z0-9]){lib_name}(?!\w)', ext_name, src, flags=re.IGNORECASE)  # also in PyInit_{lib_name}
+    return src, methods
+
+def split_pycfml_src_files():
+    src_ext = CONFIG['build']['src-ext']
+    lib_name = CONFIG['pycfml']['src-name']
+    src_path = os.path.join(_project_path(), CONFIG['pycfml']['dir']['build-src-fortran'])
+    py_src_path = os.path.join(_project_path(), CONFIG['pycfml']['dir']['build-src-python'])
+    with open(os.path.join(src_path, f'{lib_name}.{src_ext}')) as file:
+        lib_src = file.read()
+    components_dirs = {}
+    for module in CONFIG['src-cfml-wraps']:
+        for component_file in module.get('components-files', []):
+            components_dirs[component_file] = module['components-dir']
+    core_files = _pycfml_extension_core_files()
+    extension_of_method = {}
+    for ext_name, component_files in _pycfml_extensions().items():
+        modules = set()
+        functions = set()
+        for component_file in core_files + component_files:
+            path = os.path.join(src_path, components_dirs[component_file], f'{component_file}.{src_ext}')
+            with open(path) as file:
+                component_src = file.read().lower()
+            modules.update(re.findall(r'^\s*module\s+(?!procedure\b|function\b|subroutine\b)(\w+)', component_src, re.MULTILINE))
+            if component_file in component_files:  # methods of core files are registered by their own extension
+                functions.update(re.findall(r'^\s*(?:(?:recursive|pure|elemental|module)\s+)*function\s+(\w+)', component_src, re.MULTILINE))
+        ext_src, methods = _split_pycfml_lib_src(lib_src, lib_name, ext_name, modules, functions)
+        with open(os.path.join(src_path, f'{ext_name}.{src_ext}'), 'w') as file:
+            file.write(ext_src)
+        extension_of_method.update({method: ext_name for method in methods})
+        _print_msg(f"Written '{ext_name}.{src_ext}' with {len(methods)} methods")
+    # python module in place of the single shared object, loading every extension at first use
+    lines = [
+        f'# Generated by pybuild.py: methods of the split {lib_name} extensions',
+        'import importlib',
+        '',
+        f'_EXTENSIONS = {extension_of_method!r}',
+        '',
+        'def __getattr__(name: str):',
+        '    if name not in _EXTENSIONS:',
+        '        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")',
+        '    if __package__:',
+        "        extension = importlib.import_module(f'.{_EXTENSIONS[name]}', __package__)",
+        '    else:',
+        '        extension = importlib.import_module(_EXTENSIONS[name])',
+        '    globals()[name] = getattr(extension, name)',
+        '    return globals()[name]',
+    ]
+    with open(os.path.join(py_src_path, f'{lib_name}.py'), 'w') as file:
+        file.write('\n'.join(lines) + '\n')
+
+def split_pycfml_src():
+    project_name = CONFIG['pycfml']['log-name']
+    lib_name = CONFIG['pycfml']['src-name']
+    extensions = _pycfml_extensions()
+    if not extensions:
+        msg = _echo_msg(f"No split of {project_name} '{lib_name}' into extensions is enabled")
+        lines = [msg]
+        script_name = f'{sys._getframe().f_code.co_name}.sh'
+        _write_lines_to_file(lines, script_name)
+        append_to_main_script(lines)
+        return
+    lines = []
+    msg = _echo_msg(f"Splitting {project_name} '{lib_name}' source code into {len(extensions)} extensions")
+    lines.append(msg)
+    cmd = CONFIG['template']['run-python']
+    cmd = cmd.replace('{PATH}', 'pybuild.py')
+    cmd = cmd.replace('{OPTIONS}', '--split-pycfml-src')
+    lines.append(cmd)
+    script_name = f'{sys._getframe().f_code.co_name}.sh'
+    _write_lines_to_file(lines, script_name)
+    append_to_main_script(lines)
+
 def build_pycfml_modules_obj():
     project_name = CONFIG['cfml']['log-name']
     src_relpath = CONFIG['pycfml']['dir']['build-src-fortran']
@@ -964,10 +1501,7 @@ def build_pycfml_modules_obj():
 def build_pycfml_lib_obj():
     project_name = CONFIG['pycfml']['log-name']
     src_ext = CONFIG['build']['src-ext']
-    pycfml_src_name = CONFIG['pycfml']['src-name']
-    pycfml_src_file = f'{pycfml_src_name}.{src_ext}'
     src_relpath = CONFIG['pycfml']['dir']['build-src-fortran']
-    src_abspath = os.path.join(_project_path(), src_relpath, pycfml_src_file)
     build_relpath = CONFIG['pycfml']['dir']['build-obj']
     include_relpath = CONFIG['cfml']['dir']['dist-include']
     include_abspath = os.path.join(_project_path(), include_relpath)
@@ -976,10 +1510,13 @@ def build_pycfml_lib_obj():
     lines.append(msg)
     cmd = f'cd {build_relpath}'
     lines.append(cmd)
-    msg = _echo_msg(f"Building fortran object for {project_name} library")
-    lines.append(msg)
-    compile_line = _compile_obj_script_line(src_abspath, include_abspath)
-    lines.append(compile_line)
+    for pycfml_src_name in _pycfml_lib_names():
+        pycfml_src_file = f'{pycfml_src_name}.{src_ext}'
+        src_abspath = os.path.join(_project_path(), src_relpath, pycfml_src_file)
+        msg = _echo_msg(f"Building fortran object for {project_name} library '{pycfml_src_name}'")
+        lines.append(msg)
+        compile_line = _compile_obj_script_line(src_abspath, include_abspath)
+        lines.append(compile_line)
     msg = _echo_msg(f"Exiting build dir '{build_relpath}'")
     lines.append(msg)
     cmd = f'cd {_project_path()}'
@@ -990,17 +1527,24 @@ def build_pycfml_lib_obj():
 
 def build_pycfml_shared_obj_or_dynamic_lib():
     build_relpath = CONFIG['pycfml']['dir']['build-obj']
-    lib_name = CONFIG['pycfml']['src-name']  # NEED FIX: use CONFIG['pycfml']['dynamic-lib-name']
     lib_ext = CONFIG['build']['shared-lib-ext'][_platform()]
+    extensions = _pycfml_extensions()
+    core_files = _pycfml_extension_core_files()
+    cfml_lib_dist_path = os.path.join(_project_path(), CONFIG['cfml']['dir']['dist-lib'])
     lines = []
     msg = _echo_msg(f"Entering build dir '{build_relpath}'")
     lines.append(msg)
     cmd = f'cd {build_relpath}'
     lines.append(cmd)
-    msg = _echo_msg(f"Building fortran shared obj or dynamic lib '{lib_name}.{lib_ext}'")
-    lines.append(msg)
-    compile_line = _compile_pycfml_shared_obj_or_dynamic_lib_script_line()
-    lines.append(compile_line)
+    for lib_name in _pycfml_lib_names():  # NEED FIX: use CONFIG['pycfml']['dynamic-lib-name']
+        msg = _echo_msg(f"Building fortran shared obj or dynamic lib '{lib_name}.{lib_ext}'")
+        lines.append(msg)
+        component_files = []
+        if lib_name in extensions:
+            component_files = list(dict.fromkeys(core_files + extensions[lib_name]))
+        compile_line = _compile_pycfml_shared_obj_or_dynamic_lib_script_line(lib_name, component_files)
+        compile_line = _cached_cmd_line(compile_line, [f'*.{_obj_ext()}', cfml_lib_dist_path], [f'{lib_name}.{lib_ext}'])
+        lines.append(compile_line)
     msg = _echo_msg(f"Exiting build dir '{build_relpath}'")
     lines.append(msg)
     cmd = f'cd {_project_path()}'
@@ -1109,22 +1653,22 @@ def change_runpath_for_built_pycfml():
         no_default_lib_template_cmd = CONFIG['template']['no-default-lib'][_platform()]
         msg = _echo_msg(f"Changing runpath(s) for built {project_name} shared object")
         lines.append(msg)
-        name = CONFIG['pycfml']['src-name']
-        path = os.path.join(package_abspath, name)
-        for rpath in rpaths:
-            old_rpath = rpath['old']
-            new_rpath = rpath['new']
-            msg = _echo_msg(f"Changing runpath for {name}.{shared_lib_ext} from '{old_rpath}' to '{new_rpath}'")
-            lines.append(msg)
-            cmd = set_rpath_template_cmd
-            cmd = cmd.replace('{NEW}', new_rpath)
-            cmd = cmd.replace('{PATH}', path)
-            cmd = cmd.replace('{EXT}', shared_lib_ext)
-            lines.append(cmd)
-            cmd = no_default_lib_template_cmd
-            cmd = cmd.replace('{PATH}', path)
-            cmd = cmd.replace('{EXT}', shared_lib_ext)
-            lines.append(cmd)
+        for name in _pycfml_lib_names():
+            path = os.path.join(package_abspath, name)
+            for rpath in rpaths:
+                old_rpath = rpath['old']
+                new_rpath = rpath['new']
+                msg = _echo_msg(f"Changing runpath for {name}.{shared_lib_ext} from '{old_rpath}' to '{new_rpath}'")
+                lines.append(msg)
+                cmd = set_rpath_template_cmd
+                cmd = cmd.replace('{NEW}', new_rpath)
+                cmd = cmd.replace('{PATH}', path)
+                cmd = cmd.replace('{EXT}', shared_lib_ext)
+                lines.append(cmd)
+                cmd = no_default_lib_template_cmd
+                cmd = cmd.replace('{PATH}', path)
+                cmd = cmd.replace('{EXT}', shared_lib_ext)
+                lines.append(cmd)
     elif _platform() == 'macos':
         try:
             dependent_libs = CONFIG['build']['dependent-libs'][_platform()][_processor()][_compiler_name()]
@@ -1135,38 +1679,38 @@ def change_runpath_for_built_pycfml():
         change_rpath_template_cmd = CONFIG['template']['rpath']['change'][_platform()]
         msg = _echo_msg(f"Changing runpath(s) for built {project_name} shared objects")
         lines.append(msg)
-        name = CONFIG['pycfml']['src-name']
-        path = os.path.join(package_abspath, name)
-        for rpath in rpaths:
-            old_rpath = rpath['old']
-            new_rpath = rpath['new']
-            msg = _echo_msg(f"Changing runpath for {name}.{shared_lib_ext} from '{old_rpath}' to '{new_rpath}'")
-            lines.append(msg)
-            if rpath['new'] == '':  # delete this rpath
-                cmd = delete_rpath_template_cmd
-                cmd = cmd.replace('{OLD}', old_rpath)
-                cmd = cmd.replace('{PATH}', path)
-                cmd = cmd.replace('{EXT}', shared_lib_ext)
-            else:  # change this rpath
-                cmd = change_rpath_template_cmd
-                cmd = cmd.replace('{OLD}', old_rpath)
-                cmd = cmd.replace('{NEW}', new_rpath)
+        for name in _pycfml_lib_names():
+            path = os.path.join(package_abspath, name)
+            for rpath in rpaths:
+                old_rpath = rpath['old']
+                new_rpath = rpath['new']
+                msg = _echo_msg(f"Changing runpath for {name}.{shared_lib_ext} from '{old_rpath}' to '{new_rpath}'")
+                lines.append(msg)
+                if rpath['new'] == '':  # delete this rpath
+                    cmd = delete_rpath_template_cmd
+                    cmd = cmd.replace('{OLD}', old_rpath)
+                    cmd = cmd.replace('{PATH}', path)
+                    cmd = cmd.replace('{EXT}', shared_lib_ext)
+                else:  # change this rpath
+                    cmd = change_rpath_template_cmd
+                    cmd = cmd.replace('{OLD}', old_rpath)
+                    cmd = cmd.replace('{NEW}', new_rpath)
+                    cmd = cmd.replace('{PATH}', path)
+                    cmd = cmd.replace('{EXT}', shared_lib_ext)
+                #cmd = cmd + ' || true'  # allows to suppress the error message if no files are found
+                lines.append(cmd)
+            for lib in dependent_libs:
+                old_lib = lib['old']
+                new_lib = lib['new']
+                msg = _echo_msg(f"Changing the dependent shared library install name for {name}.{shared_lib_ext} from '{old_lib}' to '{new_lib}'")
+                lines.append(msg)
+                cmd = change_lib_template_cmd
+                cmd = cmd.replace('{OLD}', old_lib)
+                cmd = cmd.replace('{NEW}', new_lib)
                 cmd = cmd.replace('{PATH}', path)
                 cmd = cmd.replace('{EXT}', shared_lib_ext)
-            #cmd = cmd + ' || true'  # allows to suppress the error message if no files are found
-            lines.append(cmd)
-        for lib in dependent_libs:
-            old_lib = lib['old']
-            new_lib = lib['new']
-            msg = _echo_msg(f"Changing the dependent shared library install name for {name}.{shared_lib_ext} from '{old_lib}' to '{new_lib}'")
-            lines.append(msg)
-            cmd = change_lib_template_cmd
-            cmd = cmd.replace('{OLD}', old_lib)
-            cmd = cmd.replace('{NEW}', new_lib)
-            cmd = cmd.replace('{PATH}', path)
-            cmd = cmd.replace('{EXT}', shared_lib_ext)
-            #cmd = cmd + ' || true'  # allows to suppress the error message if no files are found
-            lines.append(cmd)
+                #cmd = cmd + ' || true'  # allows to suppress the error message if no files are found
+                lines.append(cmd)
     else:
         msg = _echo_msg(f"Changing runpath is not needed for platform '{_platform()}'")
         lines.append(msg)
@@ -1213,14 +1757,14 @@ def copy_py_api_files_to_pycfml_dist():
     _write_lines_to_file(lines, script_name)
     append_to_main_script(lines)
 
-def copy_init_file_to_pycfml_dist():
+def copy_py_src_files_to_pycfml_dist():
     project_name = CONFIG['pycfml']['log-name']
-    from_path = os.path.join(_project_path(), 'src', '__init__.py')
+    from_path = os.path.join(_project_path(), 'src', '*.py')
     package_relpath = CONFIG['pycfml']['dir']['dist-package'].replace('{PACKAGE_NAME}', PYPROJECT['project']['name'])
     package_abspath = os.path.join(_project_path(), package_relpath)
     to_path = package_abspath
     lines = []
-    msg = _echo_msg(f"Copying {project_name} 'src/__init__.py' to dist dir '{package_relpath}'")
+    msg = _echo_msg(f"Copying {project_name} 'src/*.py' files to dist dir '{package_relpath}'")
     lines.append(msg)
     cmd = f'cp {from_path} {to_path}'
     lines.append(cmd)
@@ -1228,10 +1772,22 @@ def copy_init_file_to_pycfml_dist():
     _write_lines_to_file(lines, script_name)
     append_to_main_script(lines)
 
+def write_scattering_tables_to_pycfml_dist():
+    package_relpath = CONFIG['pycfml']['dir']['dist-package'].replace('{PACKAGE_NAME}', PYPROJECT['project']['name'])
+    tables_relpath = os.path.join(package_relpath, 'scattering_tables.py')
+    table_relpath = os.path.join(package_relpath, 'scattering_tables.npy')
+    lines = []
+    msg = _echo_msg(f"Writing binary element table '{table_relpath}'")
+    lines.append(msg)
+    cmd = CONFIG['template']['run-python']
+    cmd = cmd.replace('{PATH}', tables_relpath)
+    cmd = cmd.replace('{OPTIONS}', table_relpath)
+    lines.append(cmd)
+    script_name = f'{sys._getframe().f_code.co_name}.sh'
+    _write_lines_to_file(lines, script_name)
+    append_to_main_script(lines)
+
 def copy_cfml_databases_to_pycfml_dist():
-    cfml_db_relpath = CONFIG['cfml']['dir']['repo-database']
-    cfml_db_abspath = os.path.join(_project_path(), cfml_db_relpath)
-    from_path = cfml_db_abspath
     package_relpath = CONFIG['pycfml']['dir']['dist-package'].replace('{PACKAGE_NAME}', PYPROJECT['project']['name'])
     pycfml_db_relpath = os.path.join(package_relpath, 'Databases')
     pycfml_db_abspath = os.path.join(_project_path(), pycfml_db_relpath)
@@ -1241,9 +1797,30 @@ def copy_cfml_databases_to_pycfml_dist():
     lines.append(msg)
     cmd = f'mkdir -p {pycfml_db_relpath}'
     lines.append(cmd)
-    msg = _echo_msg(f"Copying '{cfml_db_relpath}' database to dist dir '{pycfml_db_relpath}'")
+    for key in ('repo-database', 'repo-database-superspace'):
+        cfml_db_relpath = CONFIG['cfml']['dir'][key]
+        cfml_db_abspath = os.path.join(_project_path(), cfml_db_relpath)
+        from_path = cfml_db_abspath
+        msg = _echo_msg(f"Copying '{cfml_db_relpath}' database to dist dir '{pycfml_db_relpath}'")
+        lines.append(msg)
+        cmd = f'cp {from_path} {to_path}'
+        lines.append(cmd)
+    script_name = f'{sys._getframe().f_code.co_name}.sh'
+    _write_lines_to_file(lines, script_name)
+    append_to_main_script(lines)
+
+def write_binary_databases_to_pycfml_dist():
+    package_relpath = CONFIG['pycfml']['dir']['dist-package'].replace('{PACKAGE_NAME}', PYPROJECT['project']['name'])
+    databases_relpath = os.path.join(package_relpath, 'databases.py')
+    pycfml_db_relpath = os.path.join(package_relpath, 'Databases')
+    db_relpaths = [os.path.join(pycfml_db_relpath, os.path.basename(CONFIG['cfml']['dir'][key]))
+                   for key in ('repo-database', 'repo-database-superspace')]
+    lines = []
+    msg = _echo_msg(f"Writing binary databases to dist dir '{pycfml_db_relpath}'")
     lines.append(msg)
-    cmd = f'cp {from_path} {to_path}'
+    cmd = CONFIG['template']['run-python']
+    cmd = cmd.replace('{PATH}', databases_relpath)
+    cmd = cmd.replace('{OPTIONS}', ' '.join(db_relpaths))
     lines.append(cmd)
     script_name = f'{sys._getframe().f_code.co_name}.sh'
     _write_lines_to_file(lines, script_name)
@@ -1390,7 +1967,11 @@ def run_pycfml_functional_tests_with_benchmarks_save():
     lines = []
     msg = _echo_msg(f"Running functional tests with benchmarks from '{relpath}' and saving results")
     lines.append(msg)
-    cmd = CONFIG['template']['run-benchmarks']['base'] + ' ' + CONFIG['template']['run-benchmarks']['save']
+    if ARGS.profile:  # named by the profile to be compared with the other profiles
+        cmd = CONFIG['template']['run-benchmarks']['base'] + ' ' + CONFIG['template']['run-benchmarks']['save-profile']
+        cmd = cmd.replace('{PROFILE}', ARGS.profile)
+    else:
+        cmd = CONFIG['template']['run-benchmarks']['base'] + ' ' + CONFIG['template']['run-benchmarks']['save']
     cmd = cmd.replace('{PATH}', abspath)
     cmd = cmd.replace('{PROJECT}', project_name)
     if _github_actions():
@@ -1425,6 +2006,66 @@ def run_pycfml_functional_tests_with_benchmarks_compare():
     _write_lines_to_file(lines, script_name)
     append_to_main_script(lines)
 
+def train_pgo_profile():
+    if ARGS.profile != 'pgo-train':
+        msg = _echo_msg(f"No training of profile data is needed for build profile '{ARGS.profile or 'none'}'")
+        lines = [msg]
+        script_name = f'{sys._getframe().f_code.co_name}.sh'
+        _write_lines_to_file(lines, script_name)
+        append_to_main_script(lines)
+        return
+    data_path = _profile_data_path()
+    cfml_tests_relpath = os.path.join('tests', 'functional_tests', 'CFML', 'PowderPattern')
+    cfml_tests_abspath = os.path.join(_project_path(), cfml_tests_relpath)
+    pycfml_tests_relpath = os.path.join('tests', 'functional_tests', 'pyCFML', 'cfml_utilities', 'powder_pattern_from_json')
+    pycfml_tests_abspath = os.path.join(_project_path(), pycfml_tests_relpath)
+    lines = []
+    msg = _echo_msg(f"Deleting previous profile data in '{data_path}'")
+    lines.append(msg)
+    cmd = f'rm -rf {data_path}'
+    lines.append(cmd)
+    cmd = f'mkdir -p {data_path}'
+    lines.append(cmd)
+    msg = _echo_msg(f"Training profile data with Simple_calc_powder from '{cfml_tests_relpath}'")
+    lines.append(msg)
+    cmd = CONFIG['template']['run-tests']
+    cmd = cmd.replace('{PATH}', f'{cfml_tests_abspath} -k Simple_calc_powder')
+    lines.append(cmd)
+    msg = _echo_msg(f"Training profile data with cfml_utilities powder pattern tests from '{pycfml_tests_relpath}'")
+    lines.append(msg)
+    cmd = CONFIG['template']['run-tests']
+    cmd = cmd.replace('{PATH}', f'{pycfml_tests_abspath} -k compute_pattern__')  # only these call the Fortran library
+    lines.append(cmd)
+    msg = _echo_msg(f"Rebuild with '--profile pgo' to use the profile data")
+    lines.append(msg)
+    script_name = f'{sys._getframe().f_code.co_name}.sh'
+    _write_lines_to_file(lines, script_name)
+    append_to_main_script(lines)
+
+def compare_pycfml_benchmarks_of_profiles():
+    project_name = CONFIG['pycfml']['log-name']
+    profiles = []
+    for build in CONFIG['build-configs']:
+        if _platform() in build['platforms'] and _compiler_name() in build['compilers']:
+            profiles = [name for name in build.get('profiles', {}) if name != 'pgo-train']
+            break
+    lines = []
+    msg = _echo_msg(f"Comparing benchmarks saved with build profiles: {', '.join(profiles)}")
+    lines.append(msg)
+    cmd = CONFIG['template']['compare-benchmarks']
+    cmd = cmd.replace('{FILES}', ' '.join(f"'*_{name}.json'" for name in profiles))
+    cmd = cmd.replace('{PROJECT}', project_name)
+    if _github_actions():
+        cmd = cmd.replace('{RUNNER}', 'github')
+    else:
+        cmd = cmd.replace('{RUNNER}', 'local')
+    cmd = cmd.replace('{COMPILER}', _compiler_name())
+    cmd = cmd.replace('{PROCESSOR}', _processor())
+    lines.append(cmd)
+    script_name = f'{sys._getframe().f_code.co_name}.sh'
+    _write_lines_to_file(lines, script_name)
+    #append_to_main_script(lines)
+
 
 if __name__ == '__main__':
     ARGS = parsed_args()
@@ -1443,6 +2084,22 @@ if __name__ == '__main__':
         _print_release_title()
         exit(0)
 
+    if ARGS.split_pycfml_src:
+        split_pycfml_src_files()
+        exit(0)
+
+    if ARGS.compile_objs:
+        compile_objs(ARGS.compile_objs, ARGS.src_path, ARGS.include_path)
+        exit(0)
+
+    if ARGS.cached_outputs:
+        run_cached_cmd(ARGS.cached_cmd, ARGS.cached_inputs, ARGS.cached_outputs)
+        exit(0)
+
+    if ARGS.clean_cache:
+        clean_build_cache()
+        exit(0)
+
     if not ARGS.create_scripts:  # NEED FIX. Need proper check if create scripts or print flags are given
         _print_error_msg('Incorrect set of command line arguments')
         exit(1)
@@ -1497,6 +2154,7 @@ if __name__ == '__main__':
 
     add_main_script_header(f"Create {pyCFML} source code")
     create_pycfml_src()
+    split_pycfml_src()
 
     add_main_script_header(f"Build {pyCFML} modules")
     build_pycfml_modules_obj()
@@ -1510,8 +2168,10 @@ if __name__ == '__main__':
     change_runpath_for_built_pycfml()
     copy_extra_libs_to_pycfml_dist()
     copy_py_api_files_to_pycfml_dist()
-    copy_init_file_to_pycfml_dist()
+    copy_py_src_files_to_pycfml_dist()
+    write_scattering_tables_to_pycfml_dist()
     copy_cfml_databases_to_pycfml_dist()
+    write_binary_databases_to_pycfml_dist()
 
     add_main_script_header(f"Create Python package wheel of {pyCFML}")
     validate_pyproject_toml()
@@ -1523,10 +2183,14 @@ if __name__ == '__main__':
     add_main_script_header(f"Install {pyCFML} from Python package wheel")
     install_pycfml_from_wheel()
 
+    add_main_script_header(f"Train profile data of {CFML} and {pyCFML}")
+    train_pgo_profile()
+
     add_main_script_header(f"Run {pyCFML} tests")
     run_pycfml_unit_tests()
     run_pycfml_functional_tests_no_benchmarks()
     run_pycfml_functional_tests_with_benchmarks_save()
     run_pycfml_functional_tests_with_benchmarks_compare()
+    compare_pycfml_benchmarks_of_profiles()
 
     _print_msg(f'All scripts were successfully created in {_scripts_path()}')
@@ -1,37 +1,88 @@
-import importlib.metadata
+import importlib
+import importlib.abc
+import importlib.util
 import os
-import platform
 import sys
 
 
-# Set package version
-__version__ = importlib.metadata.version("pycrysfml")
-
-# Add current path to system path
-sys.path.append(os.path.dirname(__file__))
-
 # Set environment variable CRYSFML_DB to be the path to the Databases directory
 os.environ['CRYSFML_DB'] = os.path.join(os.path.dirname(__file__), 'Databases')
 
-# Fix path to Python
-if platform.system() == 'Darwin':  # macOS
+# Name of the shared object with the Fortran wrappers, or prefix of its split extensions,
+# loaded only with them or a cfml_* module
+_LIB_NAME = 'crysfml08lib'
+
+# Prefix of the generated Python API modules
+_API_PREFIX = 'cfml_'
+
+_python_path_fixed = False
+
+
+def _fix_python_path():
+    """Fixes the path to Python in the shared objects on macOS, once per process and just before
+    loading them. The files are searched for the framework path directly, so install_name_tool
+    only runs when the path is still there, i.e. at the first load after installation."""
+    global _python_path_fixed
+    if _python_path_fixed or sys.platform != 'darwin':  # macOS
+        return
+    _python_path_fixed = True
     import sysconfig
     python_tag = sysconfig.get_config_var('py_version_short')
     old_path = f'/Library/Frameworks/Python.framework/Versions/{python_tag}/Python'
     new_path = f'`python3-config --prefix`/Python'
-    if old_path != new_path:
-        import subprocess
-        lib_name = 'crysfml08lib.so'
-        lib_path = os.path.join(os.path.dirname(__file__), lib_name)
-        cmd = f'otool -L {lib_path}'
-        p = subprocess.run(cmd, shell=True, text=True, capture_output=True)
-        result = p.stdout
-        if old_path in result:
+    import glob
+    for lib_path in glob.glob(os.path.join(os.path.dirname(__file__), f'{_LIB_NAME}*.so')):
+        with open(lib_path, 'rb') as file:
+            linked = old_path.encode() in file.read()
+        if linked:
+            import subprocess
             cmd = f'install_name_tool -change {old_path} {new_path} {lib_path}'
-            p = subprocess.run(cmd, shell=True, text=True, capture_output=True)
-            #result = p.stdout
-            #print(result)
-            #cmd = f'otool -L {lib_path}'
-            #p = subprocess.run(cmd, shell=True, text=True, capture_output=True)
-            #result = p.stdout
-            #print(result)
+            subprocess.run(cmd, shell=True, text=True, capture_output=True)
+
+def _is_generated(name: str):
+    return name.startswith(_LIB_NAME) or name.startswith(_API_PREFIX)
+
+
+class _GeneratedModuleFinder(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """Fixes the path to Python before a shared object or generated module of the package is
+    loaded, however it is imported, and resolves the top-level imports of the generated modules
+    between each other, e.g. 'import crysfml08lib', to the modules of the package. Unlike adding
+    the package dir to sys.path, the other modules of the package, e.g. powder or cif, are not
+    importable as top-level modules."""
+
+    def find_spec(self, fullname: str, path=None, target=None):
+        package, _, name = fullname.rpartition('.')
+        if not _is_generated(name):
+            return None
+        if package == __name__:  # loaded by the regular finders once the path is fixed
+            _fix_python_path()
+        elif not package and importlib.util.find_spec(f'{__name__}.{name}') is not None:
+            return importlib.util.spec_from_loader(fullname, self)
+        return None
+
+    def create_module(self, spec):
+        module = importlib.import_module(f'{__name__}.{spec.name}')
+        spec.loader_state = module.__spec__  # replaced by the import system with the top-level spec
+        return module
+
+    def exec_module(self, module):
+        module.__spec__ = module.__spec__.loader_state
+
+
+def __getattr__(name: str):
+    """Imports the package version and submodules at first access, so that 'import pycrysfml'
+    loads neither the shared object nor numpy."""
+    if name == '__version__':
+        from importlib import metadata
+        globals()[name] = metadata.version('pycrysfml')
+        return globals()[name]
+    if name.startswith('_'):
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+    try:
+        return importlib.import_module(f'.{name}', __name__)
+    except ModuleNotFoundError as e:
+        if e.name != f'{__name__}.{name}':
+            raise
+        raise AttributeError(f"module '{__name__}' has no attribute '{name}'") from None
+
+sys.meta_path.insert(0, _GeneratedModuleFinder())
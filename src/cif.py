@@ -0,0 +1,269 @@
+import collections
+import concurrent.futures
+import os
+import re
+import numpy as np
+
+
+# Extensions of the files read from a directory
+CIF_EXTENSIONS = ('.cif', '.mcif')
+
+# Extension of the CFL files of CFML (Format_CFL), read by structure_records()
+CFL_EXTENSION = '.cfl'
+
+# Number of data blocks of a single file parsed together by a pool worker
+BLOCKS_PER_TASK = 256
+
+# Compact structure record of a data block: the file path, the block name, cell (a, b, c, alpha,
+# beta, gamma), H-M (of the parent group for mCIF) and BNS magnetic space group symbols (or None), atom labels and type symbols,
+# (n_atoms, 3) fractional coordinates, occupancies, Biso and (n_atoms, 3) magnetic moments along
+# the crystal axes (None without a moment loop) and symmetry operators in the xyz notation (None without a symop loop)
+CifRecord = collections.namedtuple('CifRecord', ['path', 'name', 'cell', 'space_group', 'magnetic_space_group',
+                                                 'labels', 'type_symbols', 'xyz', 'occupancy', 'b_iso', 'moments',
+                                                 'symmetry_operators'], defaults=[None])
+
+_CELL_TAGS = ('_cell_length_a', '_cell_length_b', '_cell_length_c',
+              '_cell_angle_alpha', '_cell_angle_beta', '_cell_angle_gamma')
+_SPACE_GROUP_TAGS = ('_space_group_name_h-m_alt', '_symmetry_space_group_name_h-m', '_space_group_name_h-m',
+                     '_parent_space_group_name_h-m_alt')
+_MAGNETIC_SPACE_GROUP_TAGS = ('_space_group_magn_name_bns', '_magnetic_space_group_name_bns')
+_SYMMETRY_OPERATOR_TAGS = ('_space_group_symop_operation_xyz', '_symmetry_space_group_symop_operation_xyz',
+                           '_symmetry_equiv_pos_as_xyz')
+_FRACT_TAGS = ('_atom_site_fract_x', '_atom_site_fract_y', '_atom_site_fract_z')
+_MOMENT_TAGS = ('_atom_site_moment_crystalaxis_x', '_atom_site_moment_crystalaxis_y', '_atom_site_moment_crystalaxis_z')
+
+# Semicolon text field, quoted string, comment or bare token; quotes end only before whitespace
+_TOKEN_REGEX = re.compile(r"""^;([^\n]*(?:\n(?!;)[^\n]*)*)\n;|'(.*?)'(?=\s|\Z)|"(.*?)"(?=\s|\Z)|(#[^\n]*)|(\S+)""",
+                          re.MULTILINE)
+# Semicolon text field, matched as by _TOKEN_REGEX so that its lines are skipped, or start of a data block
+_BLOCK_START_REGEX = re.compile(r'^;[^\n]*(?:\n(?!;)[^\n]*)*\n;|^(data_)', re.MULTILINE | re.IGNORECASE)
+_NUMBER_REGEX = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+
+
+def _normalized_tag(tag: str):
+    """Returns the tag in lower case with the DDLm category separator '.' as '_', so that
+    '_cell.length_a' and '_cell_length_a' are the same item."""
+    return tag.lower().replace('.', '_')
+
+def _closed_loop(items: dict, tags: list, values: list):
+    """Stores the values of a loop as one list per tag."""
+    values = values or []
+    for i, tag in enumerate(tags):
+        items[tag] = values[i::len(tags)]
+
+def cif_blocks(text: str):
+    """Generates (name, items) of the data blocks of a CIF text, where items maps the normalized
+    tags to their string values, or to lists of strings for the tags of a loop."""
+    name, items, pending = None, None, None
+    loop_tags, loop_values = None, None
+    for match in _TOKEN_REGEX.finditer(text):
+        kind = match.lastindex
+        if kind == 4:  # comment
+            continue
+        token = match.group(kind)
+        if kind == 1:  # text field starts on the line after the semicolon
+            token = token[1:] if token.startswith('\n') else token
+        if kind == 5 and token[0] == '_':
+            tag = _normalized_tag(token)
+            if loop_tags is not None and loop_values is None:
+                loop_tags.append(tag)
+                continue
+            if loop_tags is not None:
+                _closed_loop(items, loop_tags, loop_values)
+                loop_tags, loop_values = None, None
+            pending = tag
+            continue
+        if kind == 5 and token[0] in 'dDlLsSgG':
+            lowered = token.lower()
+            if lowered.startswith(('data_', 'save_')) or lowered in ('loop_', 'global_', 'stop_'):
+                if loop_tags is not None:
+                    _closed_loop(items, loop_tags, loop_values)
+                    loop_tags, loop_values = None, None
+                pending = None
+                if lowered.startswith('data_'):
+                    if items is not None:
+                        yield name, items
+                    name, items = token[5:], {}
+                elif lowered == 'loop_' and items is not None:
+                    loop_tags = []
+                continue
+        if loop_tags is not None:
+            if loop_values is None:
+                loop_values = []
+            loop_values.append(token)
+        elif pending is not None and items is not None:
+            items[pending] = token
+            pending = None
+    if loop_tags is not None:
+        _closed_loop(items, loop_tags, loop_values)
+    if items is not None:
+        yield name, items
+
+def _number(value: str, default: float = 0.0):
+    """Returns the value without its standard uncertainty, e.g. 0.1234(5), or the default
+    when it is missing ('?', '.' or absent)."""
+    if value is None or value in ('?', '.'):
+        return default
+    match = _NUMBER_REGEX.match(value)
+    return float(match.group(0)) if match else default
+
+def _numbers(values: list, default: float = 0.0):
+    return np.array([_number(value, default) for value in values], dtype=float)
+
+def _first(items: dict, tags: tuple):
+    for tag in tags:
+        value = items.get(tag)
+        if value is not None and value not in ('?', '.'):
+            return value
+    return None
+
+def _type_symbol(label: str):
+    """Returns the element symbol at the start of an atom label, e.g. 'Fe' of 'Fe1'."""
+    match = re.match(r'[A-Z][a-z]?', label.capitalize())
+    return match.group(0) if match else label
+
+def block_record(name: str, items: dict, path: str = ''):
+    """Returns the CifRecord of the items of a data block, or None when the block has no cell."""
+    if '_cell_length_a' not in items:
+        return None
+    cell = np.array([_number(items.get(tag), 90.0 if i > 2 else np.nan) for i, tag in enumerate(_CELL_TAGS)])
+    labels = items.get('_atom_site_label', [])
+    if isinstance(labels, str):  # single atom given without a loop
+        labels = [labels]
+        items = {tag: [value] if tag.startswith('_atom_site_') and isinstance(value, str) else value
+                 for tag, value in items.items()}
+    n_atoms = len(labels)
+    type_symbols = items.get('_atom_site_type_symbol') or [_type_symbol(label) for label in labels]
+    xyz = np.stack([_numbers(items.get(tag, ['?'] * n_atoms)) for tag in _FRACT_TAGS], axis=-1).reshape(-1, 3)
+    occupancy = _numbers(items.get('_atom_site_occupancy', ['?'] * n_atoms), 1.0)
+    if '_atom_site_b_iso_or_equiv' in items:
+        b_iso = _numbers(items['_atom_site_b_iso_or_equiv'])
+    else:
+        b_iso = 8 * np.pi**2 * _numbers(items.get('_atom_site_u_iso_or_equiv', ['?'] * n_atoms))
+    moments = None
+    if '_atom_site_moment_label' in items:
+        moments = np.zeros((n_atoms, 3))
+        indices = {label: i for i, label in enumerate(labels)}
+        components = np.stack([_numbers(items.get(tag, [])) for tag in _MOMENT_TAGS], axis=-1)
+        for label, moment in zip(items['_atom_site_moment_label'], components):
+            if label in indices:
+                moments[indices[label]] = moment
+    space_group = _first(items, _SPACE_GROUP_TAGS)
+    magnetic_space_group = _first(items, _MAGNETIC_SPACE_GROUP_TAGS)
+    symmetry_operators = _first(items, _SYMMETRY_OPERATOR_TAGS)
+    if isinstance(symmetry_operators, str):  # single operator given without a loop
+        symmetry_operators = [symmetry_operators]
+    return CifRecord(path, name, cell, space_group, magnetic_space_group, list(labels), list(type_symbols),
+                     xyz, occupancy, b_iso, moments, symmetry_operators)
+
+def cif_records(text: str, path: str = ''):
+    """Generates the CifRecord of every data block with a cell in a CIF or mCIF text."""
+    for name, items in cif_blocks(text):
+        record = block_record(name, items, path)
+        if record is not None:
+            yield record
+
+def cfl_title(text: str):
+    """Returns the text of the Title line of a CFL text, or None without a (non-empty) one."""
+    title = None
+    for line in text.splitlines():
+        fields = line.split('!')[0].split()
+        if fields and fields[0].lower() == 'title':
+            title = ' '.join(fields[1:])
+    return title or None
+
+def cfl_name(title: str, path: str):
+    """Returns the record name of a CFL file: its title, or the file name without extension."""
+    return title or os.path.splitext(os.path.basename(path))[0]
+
+def cfl_records(text: str, path: str = ''):
+    """Generates the CifRecord of the Title, Cell, Spgr and Atom lines of a CFL text, with the
+    occupancies as written (Format_CFL counts them relative to the general position)."""
+    title, cell, symbol, atoms = None, None, None, []
+    for line in text.splitlines():
+        fields = line.split('!')[0].split()
+        if not fields:
+            continue
+        keyword = fields[0].lower()
+        if keyword == 'title':
+            title = ' '.join(fields[1:])
+        elif keyword == 'cell':
+            cell = np.array([_number(value) for value in fields[1:7]])
+        elif keyword in ('spgr', 'spaceg', 'hall'):
+            symbol = ' '.join(fields[1:])
+        elif keyword == 'atom':
+            atoms.append(fields[1:8])
+    if cell is None:
+        return
+    name = cfl_name(title, path)
+    labels = [atom[0] for atom in atoms]
+    type_symbols = [atom[1] if len(atom) > 1 else _type_symbol(atom[0]) for atom in atoms]
+    xyz = np.array([[_number(value) for value in (atom[2:5] + ['?'] * 3)[:3]] for atom in atoms]).reshape(-1, 3)
+    b_iso = np.array([_number(atom[5] if len(atom) > 5 else None) for atom in atoms])
+    occupancy = np.array([_number(atom[6] if len(atom) > 6 else None, 1.0) for atom in atoms])
+    yield CifRecord(path, name, cell, symbol, None, labels, type_symbols, xyz, occupancy, b_iso, None)
+
+def structure_records(text: str, path: str = ''):
+    """Generates the CifRecord of a CFL text when the path has CFL_EXTENSION, or of a CIF text."""
+    if path.lower().endswith(CFL_EXTENSION):
+        return cfl_records(text, path)
+    return cif_records(text, path)
+
+def _read_text(path: str):
+    with open(path, encoding='utf-8', errors='replace') as file:
+        return file.read()
+
+def _records_of_files(paths: list):
+    return [record for path in paths for record in cif_records(_read_text(path), path)]
+
+def _records_of_text(text: str, path: str):
+    return list(cif_records(text, path))
+
+def cif_files(path: str):
+    """Returns the sorted paths of the CIF and mCIF files in a directory and its subdirectories,
+    or [path] for a file."""
+    if not os.path.isdir(path):
+        return [path]
+    paths = []
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        paths.extend(os.path.join(root, file) for file in sorted(files) if file.lower().endswith(CIF_EXTENSIONS))
+    return paths
+
+def _block_chunks(text: str, blocks_per_chunk: int):
+    """Splits a multi-block text at the lines starting with data_ outside text fields, every
+    blocks_per_chunk blocks."""
+    starts = [match.start() for match in _BLOCK_START_REGEX.finditer(text) if match.group(1)][::blocks_per_chunk]
+    return [text[start:stop] for start, stop in zip(starts, starts[1:] + [len(text)])]
+
+def read_cif_records(path: str, processes: int = 1, chunk_size: int = None):
+    """Generates the CifRecord of every data block of a CIF or mCIF file, or of all the files of
+    a directory, in file and block order. With more than one process (None for all the CPUs),
+    chunks of chunk_size files, or of chunk_size data blocks of a single file (BLOCKS_PER_TASK by
+    default), are parsed by a pool of worker processes, keeping only a few chunks in flight."""
+    if processes is None:
+        processes = os.cpu_count()
+    if os.path.isdir(path):
+        paths = cif_files(path)
+        if processes <= 1:
+            for file_path in paths:
+                yield from cif_records(_read_text(file_path), file_path)
+            return
+        if chunk_size is None:
+            chunk_size = max(1, min(64, len(paths) // (4 * processes)))
+        tasks = ((_records_of_files, paths[start:start + chunk_size]) for start in range(0, len(paths), chunk_size))
+    else:
+        text = _read_text(path)
+        if processes <= 1:
+            yield from cif_records(text, path)
+            return
+        chunks = _block_chunks(text, chunk_size or BLOCKS_PER_TASK)
+        tasks = ((_records_of_text, chunk, path) for chunk in chunks)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = collections.deque()
+        for task in tasks:
+            futures.append(executor.submit(*task))
+            if len(futures) >= 2 * processes:
+                yield from futures.popleft().result()
+        while futures:
+            yield from futures.popleft().result()
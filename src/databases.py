@@ -0,0 +1,176 @@
+import functools
+import json
+import math
+import mmap
+import os
+import re
+import sys
+import numpy as np
+
+
+# Text databases of CFML_Magnetic_Database and CFML_SuperSpace_Database in the CRYSFML_DB dir
+DATABASE_FILES = {'magnetic': 'magnetic_data.txt', 'superspace': 'ssg_datafile.txt'}
+
+# Extension of the binary databases written next to the text ones, see compile_database()
+BINARY_EXTENSION = '.bin'
+
+# Kinds of the tokens of a record
+NUMBER, STRING = 0, 1
+
+_MAGIC = b'PYCFMLDB'
+_ALIGNMENT = 64
+_TOKEN_REGEX = re.compile(r"""'([^']*)'|"([^"]*)"|(!.*)|([^\s,'"!]+)""")
+
+
+def _tokenized(lines):
+    """Returns the arrays of the records (lines) of a text database split as Fortran list-directed
+    input: numeric tokens as float64 values, strings (quoted or not) as slices of a UTF-8 text blob."""
+    record_offsets, kinds, values, string_starts, string_stops = [0], [], [], [], []
+    text = bytearray()
+    for line in lines:
+        for match in _TOKEN_REGEX.finditer(line):
+            if match.group(3) is not None:  # comment up to the end of the line
+                break
+            quoted = match.group(1) if match.group(1) is not None else match.group(2)
+            token = match.group(4)
+            value = None
+            if quoted is None:
+                try:
+                    value = float(token.replace('d', 'e').replace('D', 'E'))
+                except ValueError:
+                    quoted = token
+            if value is not None:
+                kinds.append(NUMBER)
+                values.append(value)
+                string_starts.append(0)
+                string_stops.append(0)
+            else:
+                encoded = quoted.encode()
+                kinds.append(STRING)
+                values.append(np.nan)
+                string_starts.append(len(text))
+                text += encoded
+                string_stops.append(len(text))
+        record_offsets.append(len(kinds))
+    return {'record_offsets': np.array(record_offsets, dtype=np.int64),
+            'kinds': np.array(kinds, dtype=np.int8),
+            'values': np.array(values, dtype=np.float64),
+            'string_starts': np.array(string_starts, dtype=np.int64),
+            'string_stops': np.array(string_stops, dtype=np.int64),
+            'text': np.frombuffer(bytes(text), dtype=np.uint8)}
+
+def _write_arrays(path: str, arrays: dict, magic: bytes = _MAGIC):
+    """Writes the arrays after the magic bytes and a JSON header with their dtypes, shapes and
+    aligned offsets."""
+    layout, offset = {}, 0
+    for name, array in arrays.items():
+        layout[name] = {'dtype': array.dtype.str, 'shape': array.shape, 'offset': offset}
+        offset += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+    header = json.dumps(layout).encode()
+    data_start = -(-(len(magic) + 8 + len(header)) // _ALIGNMENT) * _ALIGNMENT
+    with open(path, 'wb') as file:
+        file.write(magic + len(header).to_bytes(8, 'little') + header)
+        for name, array in arrays.items():
+            file.seek(data_start + layout[name]['offset'])
+            file.write(np.ascontiguousarray(array).tobytes())
+        file.truncate(data_start + offset)
+
+def _mapped_arrays(path: str, magic: bytes = _MAGIC, mapped: bool = True):
+    """Returns read-only views of the arrays written by _write_arrays() on a single memory map
+    of the file, so that only the pages read are loaded, or writable views on a single read of
+    the file when not mapped, which is faster for small files."""
+    with open(path, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if mapped else bytearray(file.read())
+    if buffer[:len(magic)] != magic:
+        raise ValueError(f"File '{path}' does not start with {magic}")
+    header_size = int.from_bytes(buffer[len(magic):len(magic) + 8], 'little')
+    layout = json.loads(buffer[len(magic) + 8:len(magic) + 8 + header_size])
+    data_start = -(-(len(magic) + 8 + header_size) // _ALIGNMENT) * _ALIGNMENT
+    arrays = {}
+    for name, item in layout.items():
+        shape = tuple(item['shape'])
+        arrays[name] = np.frombuffer(buffer, dtype=item['dtype'], count=math.prod(shape),
+                                     offset=data_start + item['offset']).reshape(shape)
+    return arrays
+
+class DatabaseRecords:
+    """Records (lines) of a text database as tokenized arrays, either parsed from the text or
+    memory-mapped from its binary form, so that a process only pages in what it reads."""
+
+    def __init__(self, arrays: dict, path: str):
+        self.path = path
+        self._record_offsets = arrays['record_offsets']
+        self._kinds = arrays['kinds']
+        self._values = arrays['values']
+        self._string_starts = arrays['string_starts']
+        self._string_stops = arrays['string_stops']
+        self._text = arrays['text']
+
+    def __len__(self):
+        return len(self._record_offsets) - 1
+
+    def __repr__(self):
+        return f"DatabaseRecords('{self.path}', {len(self)} records)"
+
+    def numbers(self, index: int):
+        """Returns the float64 values of the tokens of a record, NaN for strings, as a view."""
+        return self._values[self._record_offsets[index]:self._record_offsets[index + 1]]
+
+    def record(self, index: int):
+        """Returns the tokens of a record as ints, floats and strings."""
+        tokens = []
+        for token in range(self._record_offsets[index], self._record_offsets[index + 1]):
+            if self._kinds[token] == STRING:
+                tokens.append(bytes(self._text[self._string_starts[token]:self._string_stops[token]]).decode())
+            else:
+                value = float(self._values[token])
+                tokens.append(int(value) if value.is_integer() else value)
+        return tokens
+
+    def records(self, start: int = 0, stop: int = None):
+        """Yields the tokens of the records from start to stop."""
+        for index in range(start, len(self) if stop is None else stop):
+            yield self.record(index)
+
+
+def database_dir():
+    """Returns the CRYSFML_DB dir, or the Databases dir of the package."""
+    return os.environ.get('CRYSFML_DB') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Databases')
+
+def compile_database(text_path: str, binary_path: str = None):
+    """Writes the binary form of a text database, by default next to it with BINARY_EXTENSION,
+    and returns its path."""
+    binary_path = binary_path or os.path.splitext(text_path)[0] + BINARY_EXTENSION
+    with open(text_path, encoding='utf-8', errors='replace') as file:
+        _write_arrays(binary_path, _tokenized(file))
+    return binary_path
+
+@functools.lru_cache(maxsize=None)
+def _database_records(text_path: str):
+    binary_path = os.path.splitext(text_path)[0] + BINARY_EXTENSION
+    if os.path.exists(binary_path) and (not os.path.exists(text_path) or
+                                        os.path.getmtime(binary_path) >= os.path.getmtime(text_path)):
+        return DatabaseRecords(_mapped_arrays(binary_path), binary_path)
+    with open(text_path, encoding='utf-8', errors='replace') as file:
+        return DatabaseRecords(_tokenized(file), text_path)
+
+def database_records(name: str, directory: str = None):
+    """Returns the DatabaseRecords of the 'magnetic' or 'superspace' database, memory-mapped
+    from its binary form when present and not older than the text, otherwise parsed from the
+    text; either way only once per process."""
+    if name not in DATABASE_FILES:
+        raise ValueError(f"Unknown database '{name}', only {list(DATABASE_FILES)}")
+    return _database_records(os.path.join(directory or database_dir(), DATABASE_FILES[name]))
+
+def database_cache_info():
+    """Returns hits, misses, maxsize and currsize of the loaded database cache."""
+    return _database_records.cache_info()
+
+def clear_database_cache():
+    """Drops the databases loaded by this process."""
+    _database_records.cache_clear()
+
+
+if __name__ == '__main__':
+    for path in sys.argv[1:]:
+        compile_database(path)
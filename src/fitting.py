@@ -0,0 +1,174 @@
+import collections
+import copy
+import numpy as np
+
+from .powder import ATOM_PARAMETERS, PowderContext, PowderSimulation, _FRACT_KEYS, _blocks
+from .structure_factors import AtomList
+
+
+# Marquardt damping at the first iteration, and its factor after rejected and accepted steps
+INITIAL_DAMPING = 1.0e-03
+DAMPING_FACTOR = 10.0
+
+# Damping above which the fit stops without convergence when no step lowers chi2
+MAX_DAMPING = 1.0e+10
+
+FitResult = collections.namedtuple('FitResult', ['values', 'esds', 'covariance', 'chi2', 'reduced_chi2',
+                                                 'iterations', 'converged', 'y_calc', 'study_dict'])
+
+
+def _parameter_value(study_dict: dict, parameter, phase: int):
+    """Returns the value of an atom (label, key), cell or experiment parameter of the study dict."""
+    block = _parameter_block(study_dict, parameter, phase)
+    if isinstance(block, AtomList):
+        return float(_atom_list_column(block, parameter[1])[_atom_list_index(block, parameter[0], phase)])
+    key = parameter if isinstance(parameter, str) else parameter[1]
+    if key == '_B_iso_or_equiv' and _uses_u_iso(block):
+        return float(8 * np.pi**2 * block.get('_U_iso_or_equiv', 0))
+    return float(block.get(key, 1 if key == '_occupancy' else 0))
+
+def _set_parameter_value(study_dict: dict, parameter, phase: int, value: float):
+    block = _parameter_block(study_dict, parameter, phase)
+    key = parameter if isinstance(parameter, str) else parameter[1]
+    if isinstance(block, AtomList):
+        _atom_list_column(block, key)[_atom_list_index(block, parameter[0], phase)] = value
+    elif key == '_B_iso_or_equiv' and _uses_u_iso(block):
+        block['_U_iso_or_equiv'] = value / (8 * np.pi**2)
+    else:
+        block[key] = value
+
+def _uses_u_iso(atom: dict):
+    """Returns whether the displacement of the atom dict is given by Uiso, as read by atom_arrays()."""
+    return atom.get('_adp_type', 'Biso') == 'Uiso'
+
+def _parameter_block(study_dict: dict, parameter, phase: int):
+    """Returns the atom, phase or experiment dict holding the parameter, or the AtomList of
+    the phase for an atom parameter."""
+    if isinstance(parameter, str):
+        if parameter.startswith('_cell_'):
+            return _blocks(study_dict, 'phases')[phase]
+        return _blocks(study_dict, 'experiments')[0]
+    label, _ = parameter
+    atom_sites = _blocks(study_dict, 'phases')[phase].get('_atom_site', [])
+    if isinstance(atom_sites, AtomList):
+        return atom_sites
+    for atom in atom_sites:
+        if atom['_label'] == label:
+            return atom
+    raise KeyError(f"No atom '{label}' in phase {phase}")
+
+def _atom_list_index(atoms: AtomList, label: str, phase: int):
+    if label not in atoms.labels:
+        raise KeyError(f"No atom '{label}' in phase {phase}")
+    return atoms.labels.index(label)
+
+def _atom_list_column(atoms: AtomList, key: str):
+    """Returns the view of the AtomList holding an atom parameter of ATOM_PARAMETERS."""
+    if key in _FRACT_KEYS:
+        return atoms.xyz[:, _FRACT_KEYS.index(key)]
+    if key == '_occupancy':
+        return atoms.occupancy
+    if key == '_B_iso_or_equiv':
+        return atoms.b_iso
+    raise ValueError(f"Atom parameter '{key}' of an AtomList is not one of {ATOM_PARAMETERS}")
+
+
+class _PatternModel:
+    """Pattern and Jacobian of a study dict as functions of the refined parameter values.
+    Atom parameters only update the simulation; a change of any other parameter rebuilds
+    it, reusing the setups the context keeps by cell, resolution and the other keys."""
+
+    def __init__(self, study_dict: dict, parameters: list, phase: int, window: float):
+        self.study_dict = copy.deepcopy(study_dict)
+        self.parameters = list(parameters)
+        self.phase = phase
+        self.window = window
+        self._atom_parameters = [not isinstance(p, str) and p[1] in ATOM_PARAMETERS for p in self.parameters]
+        self._context = PowderContext()
+        self._simulation = PowderSimulation(self.study_dict, self._context, window)
+        self._other_values = self._non_atom_values(self.values())
+
+    @property
+    def x(self):
+        return self._simulation.x
+
+    def values(self):
+        return np.array([_parameter_value(self.study_dict, p, self.phase) for p in self.parameters])
+
+    def _non_atom_values(self, values: np.ndarray):
+        return [float(value) for value, atom in zip(values, self._atom_parameters) if not atom]
+
+    def evaluate(self, values: np.ndarray):
+        """Returns y at the given parameter values."""
+        for parameter, value in zip(self.parameters, values):
+            _set_parameter_value(self.study_dict, parameter, self.phase, float(value))
+        other_values = self._non_atom_values(values)
+        if other_values != self._other_values:
+            self._simulation = PowderSimulation(self.study_dict, self._context, self.window)
+            self._other_values = other_values
+        else:
+            self._simulation.update([{'_label': parameter[0], parameter[1]: float(value)}
+                                     for parameter, value, atom in zip(self.parameters, values, self._atom_parameters)
+                                     if atom], self.phase)
+        _, y = self._simulation.compute()
+        return y
+
+    def jacobian(self):
+        """Returns the Jacobian at the parameter values of the last evaluate()."""
+        return self._simulation.compute_with_jacobian(self.parameters, self.phase)[2]
+
+
+def fit_powder_pattern(study_dict: dict, y_obs: np.ndarray, parameters: list, sigma: np.ndarray = None,
+                       phase: int = 0, window: float = None, hook=None, max_iterations: int = 50,
+                       tolerance: float = 1.0e-08):
+    """Refines the parameters of the study dict against the observed pattern with Levenberg-Marquardt
+    least squares on the analytic Jacobian of PowderSimulation.compute_with_jacobian(), which also
+    defines the parameter spec, e.g. [('Pb', '_fract_x'), '_cell_length_a', '_pd_instr_resolution_u'].
+    Without sigma, all points have unit weight. The optional hook(iteration, values, chi2) is the only
+    call back to Python per iteration, and stops the fit by returning True. Returns a FitResult with
+    fitted values, esds and covariance scaled by the reduced chi2, and a copy of the fitted study dict."""
+    y_obs = np.asarray(y_obs, dtype=float)
+    weights = np.ones_like(y_obs) if sigma is None else 1 / np.asarray(sigma, dtype=float)
+    model = _PatternModel(study_dict, parameters, phase, window)
+    if model.x.shape != y_obs.shape:
+        raise ValueError(f"Observed pattern has shape {y_obs.shape} instead of {model.x.shape}")
+    values = model.values()
+    y_calc = model.evaluate(values)
+    jacobian = model.jacobian()
+    residuals = (y_obs - y_calc) * weights
+    chi2 = residuals @ residuals
+    damping = INITIAL_DAMPING
+    converged = False
+    iteration = 0
+    for iteration in range(1, max_iterations + 1):
+        weighted_jacobian = jacobian * weights[:, None]
+        normal_matrix = weighted_jacobian.T @ weighted_jacobian
+        gradient = weighted_jacobian.T @ residuals
+        diagonal = np.diag(normal_matrix).copy()
+        diagonal[diagonal == 0] = 1
+        while True:
+            step = np.linalg.solve(normal_matrix + damping * np.diag(diagonal), gradient)
+            trial_values = values + step
+            trial_y = model.evaluate(trial_values)
+            trial_residuals = (y_obs - trial_y) * weights
+            trial_chi2 = trial_residuals @ trial_residuals
+            if trial_chi2 <= chi2 or damping > MAX_DAMPING:
+                break
+            damping *= DAMPING_FACTOR
+        if trial_chi2 > chi2:  # stopped at MAX_DAMPING without lowering chi2, so not converged
+            model.evaluate(values)
+            converged = False
+            break
+        converged = chi2 - trial_chi2 <= tolerance * chi2
+        values, y_calc, residuals, chi2 = trial_values, trial_y, trial_residuals, trial_chi2
+        jacobian = model.jacobian()  # only for accepted steps
+        damping = max(damping / DAMPING_FACTOR, 1.0e-12)
+        if hook is not None and hook(iteration, values.copy(), chi2):
+            break
+        if converged:
+            break
+    weighted_jacobian = jacobian * weights[:, None]
+    reduced_chi2 = chi2 / max(len(y_obs) - len(values), 1)
+    covariance = np.linalg.pinv(weighted_jacobian.T @ weighted_jacobian) * reduced_chi2
+    return FitResult(values, np.sqrt(np.diag(covariance)), covariance, chi2, reduced_chi2,
+                     iteration, converged, y_calc, model.study_dict)
@@ -0,0 +1,135 @@
+import concurrent.futures
+import math
+import os
+import sys
+from multiprocessing import shared_memory
+import numpy as np
+
+from .powder import (PowderContext, _blocks, _experiment_key, _pattern_array, _pattern_dtype, _setup_key,
+                     _x_grid, powder_patterns_from_json)
+
+
+# Powder context of a pool worker process, kept warm across tasks
+_WORKER_CONTEXT = None
+
+
+def _initialize_worker():
+    global _WORKER_CONTEXT
+    _WORKER_CONTEXT = PowderContext()
+
+def _attached_shared_memory(name: str):
+    """Attaches to an existing shared memory block, which is unlinked by its creator."""
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    return shared_memory.SharedMemory(name=name)  # workers share the resource tracker of the parent
+
+def _compute_chunk(shm_name: str, shape: tuple, dtype: str, indices: list, study_dicts: list, window: float):
+    """Simulates the study dicts in a worker and writes the patterns to their rows of the shared y array."""
+    shm = _attached_shared_memory(shm_name)
+    try:
+        y = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        if indices == list(range(indices[0], indices[-1] + 1)):  # contiguous rows are filled in place
+            powder_patterns_from_json(study_dicts, _WORKER_CONTEXT, window, out=y[indices[0]:indices[-1] + 1])
+        else:
+            y[indices] = powder_patterns_from_json(study_dicts, _WORKER_CONTEXT, window, dtype)[1]
+        del y  # release the buffer before closing
+    finally:
+        shm.close()
+
+
+class SharedPatterns(np.ndarray):
+    """Stacked y arrays of PowderPool.patterns_from_json() in the shared memory block the
+    workers wrote them to, which stays mapped until the array and all its views are freed.
+    Ufunc results and copies are new arrays that do not keep the block mapped."""
+
+    def __array_finalize__(self, obj):
+        # only views share the block; new arrays, e.g. copies, own their data
+        self._shared_memory = None if self.flags.owndata else getattr(obj, '_shared_memory', None)
+
+    def __array_ufunc__(self, ufunc, method, *inputs, out=None, **kwargs):
+        # ufunc results are new plain arrays outside the block, unless written to out
+        inputs = tuple(np.asarray(array) if isinstance(array, SharedPatterns) else array for array in inputs)
+        if out is not None:
+            kwargs['out'] = tuple(np.asarray(array) if isinstance(array, SharedPatterns) else array for array in out)
+        result = getattr(ufunc, method)(*inputs, **kwargs)
+        if out is None:
+            return result
+        return out[0] if len(out) == 1 else out
+
+
+class PowderPool:
+    """Pool of worker processes simulating powder patterns. Every worker keeps its
+    PowderContext warm across tasks, and writes its patterns straight into a shared
+    memory block instead of sending pickled arrays back."""
+
+    def __init__(self, processes: int = None):
+        self.processes = processes or os.cpu_count()
+        self._executor = concurrent.futures.ProcessPoolExecutor(max_workers=self.processes,
+                                                                initializer=_initialize_worker)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Shuts the worker processes down."""
+        self._executor.shutdown()
+
+    def patterns_from_json(self, study_dicts, chunk_size: int = None, window: float = None,
+                           dtype=np.float64, out: np.ndarray = None):
+        """Returns x and the stacked (n, len(x)) y arrays of the powder patterns simulated
+        in parallel from a list or generator of study dicts sharing the same 2theta grid.
+        The y array has the given dtype (float64 or float32) and is a SharedPatterns view of
+        the shared memory block filled by the workers, returned without a copy, or is out when
+        given, into which the block is copied."""
+        study_dicts = list(study_dicts)
+        if not study_dicts:
+            raise ValueError("No study dicts given")
+        groups = {}
+        for index, study_dict in enumerate(study_dicts):
+            groups.setdefault(_setup_key(study_dict), []).append(index)
+        x = _x_grid(_experiment_key(_blocks(study_dicts[0], 'experiments')[0]))
+        for _, experiment_key in groups:
+            grid = _x_grid(experiment_key)
+            if len(grid) != len(x) or not np.allclose(grid, x):
+                raise ValueError("Study dicts have different 2theta grids")
+        if chunk_size is None:  # a few chunks per worker to balance the load
+            chunk_size = max(1, math.ceil(len(study_dicts) / (4 * self.processes)))
+        shape = (len(study_dicts), len(x))
+        dtype = _pattern_dtype(dtype) if out is None else _pattern_array(shape, out=out).dtype
+        shm = shared_memory.SharedMemory(create=True, size=max(1, math.prod(shape) * dtype.itemsize))
+        futures = []
+        try:
+            for indices in groups.values():  # chunks never mix setups
+                for start in range(0, len(indices), chunk_size):
+                    chunk = indices[start:start + chunk_size]
+                    futures.append(self._executor.submit(_compute_chunk, shm.name, shape, dtype.str, chunk,
+                                                         [study_dicts[i] for i in chunk], window))
+            for future in futures:
+                future.result()
+            y = np.ndarray(shape, dtype=dtype, buffer=shm.buf).view(SharedPatterns)
+        except BaseException:
+            for future in futures:  # no task may write to the block once it is unlinked
+                future.cancel()
+            concurrent.futures.wait(futures)
+            shm.close()
+            raise
+        finally:
+            shm.unlink()  # the block is freed once unmapped
+        if out is not None:
+            out[...] = y
+            del y
+            shm.close()
+            return x, out
+        y._shared_memory = shm  # keeps the block mapped as long as the array
+        return x, y
+
+
+def powder_patterns_from_json_parallel(study_dicts, processes: int = None, window: float = None,
+                                       dtype=np.float64, out: np.ndarray = None):
+    """Returns x and the stacked y arrays of the powder patterns simulated by a
+    temporary pool of worker processes; keep a PowderPool to reuse warm workers."""
+    with PowderPool(processes) as pool:
+        return pool.patterns_from_json(study_dicts, window=window, dtype=dtype, out=out)
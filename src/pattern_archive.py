@@ -0,0 +1,146 @@
+import bisect
+import re
+import zipfile
+import numpy as np
+
+
+# Maximum number of patterns stored together in one compressed chunk
+CHUNK_SIZE = 16
+
+# Member of the shared x grid in the archive
+X_MEMBER = 'x.npy'
+
+# Members of the chunks of patterns, named by the index of their first pattern and their number of
+# patterns, zero-padded to a minimum width only
+_CHUNK_MEMBER = 'y_{start:012d}_{count:06d}.npy'
+_CHUNK_REGEX = re.compile(r'^y_(\d+)_(\d+)\.npy$')
+
+
+class PatternArchive:
+    """NPZ-style zip archive of many patterns sharing one x grid. Patterns are appended in
+    compressed chunks of up to chunk_size rows, whose members are named by their first pattern
+    index, so a single pattern is read by decompressing only its chunk. The archive can also
+    be opened by np.load(). Open with mode 'r' to read, 'w' to create or 'a' to append."""
+
+    def __init__(self, path: str, mode: str = 'r', chunk_size: int = CHUNK_SIZE, compression: bool = True):
+        if mode not in ('r', 'w', 'a'):
+            raise ValueError(f"Mode '{mode}' is not one of 'r', 'w' and 'a'")
+        if int(chunk_size) < 1:
+            raise ValueError(f"Chunk size {chunk_size} is not a positive number of patterns")
+        self.path = path
+        self.chunk_size = int(chunk_size)
+        self._zip = zipfile.ZipFile(path, mode, compression=zipfile.ZIP_DEFLATED if compression else zipfile.ZIP_STORED)
+        self._x = None
+        self._starts, self._counts, self._members = [], [], []
+        self._cached_chunk = (None, None)
+        names = self._zip.namelist()
+        if X_MEMBER in names:
+            with self._zip.open(X_MEMBER) as file:
+                self._x = np.lib.format.read_array(file)
+            self._x.flags.writeable = False  # returned as views, which cannot change the shared grid
+        for start, count, name in sorted((int(m.group(1)), int(m.group(2)), m.group(0))
+                                         for m in map(_CHUNK_REGEX.match, names) if m):
+            self._starts.append(start)
+            self._counts.append(count)
+            self._members.append(name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Writes the zip directory and closes the archive."""
+        self._zip.close()
+
+    def __len__(self):
+        return self._starts[-1] + self._counts[-1] if self._starts else 0
+
+    def __repr__(self):
+        return f"PatternArchive('{self.path}', {len(self)} patterns)"
+
+    @property
+    def x(self):
+        """Read-only shared x grid of the patterns, None before the first append()."""
+        return None if self._x is None else self._x.view()
+
+    def _write(self, name: str, array: np.ndarray):
+        with self._zip.open(name, 'w', force_zip64=True) as file:
+            np.lib.format.write_array(file, np.ascontiguousarray(array), allow_pickle=False)
+
+    def append(self, y: np.ndarray, x: np.ndarray = None):
+        """Appends a pattern (len(x),) or a stack of patterns (n, len(x)), e.g. the x and y of
+        powder_patterns_from_json(). x is required by the first append of a new archive and
+        must match the shared grid afterwards. Patterns keep the dtype of y."""
+        y = np.asarray(y)
+        y = y.reshape(1, -1) if y.ndim == 1 else y
+        if self._x is None:
+            if x is None:
+                raise ValueError("The x grid is required for the first patterns of an archive")
+            self._x = np.array(x)
+            self._x.flags.writeable = False
+            self._write(X_MEMBER, self._x)
+        elif x is not None and (len(x) != len(self._x) or not np.allclose(x, self._x)):
+            raise ValueError("Patterns have a different x grid than the archive")
+        if y.ndim != 2 or y.shape[1] != len(self._x):
+            raise ValueError(f"Patterns have shape {y.shape} instead of (n, {len(self._x)})")
+        start = len(self)
+        for offset in range(0, len(y), self.chunk_size):
+            chunk = y[offset:offset + self.chunk_size]
+            name = _CHUNK_MEMBER.format(start=start + offset, count=len(chunk))
+            self._write(name, chunk)
+            self._starts.append(start + offset)
+            self._counts.append(len(chunk))
+            self._members.append(name)
+
+    def _chunk(self, index: int):
+        """Returns the decompressed chunk of the given index, keeping the last one read."""
+        if self._cached_chunk[0] != index:
+            with self._zip.open(self._members[index]) as file:
+                self._cached_chunk = (index, np.lib.format.read_array(file))
+        return self._cached_chunk[1]
+
+    def __getitem__(self, index: int):
+        """Returns the y array of a single pattern, decompressing only its chunk."""
+        index = int(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Pattern {index} is out of range of {len(self)} patterns")
+        chunk = bisect.bisect_right(self._starts, index) - 1
+        return self._chunk(chunk)[index - self._starts[chunk]].copy()
+
+    def read(self, start: int = 0, stop: int = None):
+        """Returns the read-only x grid and the stacked y arrays of the patterns from start to
+        stop, which count from the end when negative as in a slice, e.g. read(-k) for the last k
+        patterns. y keeps the stored dtype, also for an empty range."""
+        start, stop, _ = slice(start, stop).indices(len(self))
+        if self._x is None:
+            raise ValueError(f"Archive '{self.path}' has no patterns")
+        rows = []
+        first = max(0, bisect.bisect_right(self._starts, start) - 1)
+        for chunk in range(first, len(self._starts)):
+            chunk_start = self._starts[chunk]
+            if chunk_start >= stop:
+                break
+            rows.append(self._chunk(chunk)[max(start - chunk_start, 0):stop - chunk_start])
+        if not rows:
+            dtype = self._chunk(0).dtype if self._starts else np.float64
+            return self.x, np.empty((0, len(self._x)), dtype=dtype)
+        return self.x, np.concatenate(rows)
+
+
+def write_pattern_archive(path: str, x: np.ndarray, y: np.ndarray, chunk_size: int = CHUNK_SIZE, append: bool = False):
+    """Writes (or appends) the stacked patterns of a shared x grid, e.g. the output of
+    powder_patterns_from_json(), to a PatternArchive and returns its number of patterns."""
+    with PatternArchive(path, 'a' if append else 'w', chunk_size) as archive:
+        archive.append(y, x)
+        return len(archive)
+
+def read_pattern_archive(path: str, index: int = None):
+    """Returns x and the y array of one pattern of a PatternArchive, or of all its patterns."""
+    with PatternArchive(path) as archive:
+        if index is None:
+            return archive.read()
+        return archive.x, archive[index]
@@ -0,0 +1,305 @@
+import itertools
+import mmap as _mmap
+import os
+import re
+import numpy as np
+
+from .cif import cif_blocks
+
+
+# Formats of the measured patterns read by read_pattern()
+PATTERN_FORMATS = ('xysig', 'free', 'gsas', 'cif', 'socabim')
+
+# Formats detected from the file extension; other extensions are detected from the content
+PATTERN_EXTENSIONS = {'.xys': 'xysig', '.xye': 'xysig', '.xy': 'xysig', '.gss': 'gsas', '.gsa': 'gsas',
+                      '.gsas': 'gsas', '.cif': 'cif', '.uxd': 'socabim'}
+
+# Number of bytes read to detect the format of a file
+DETECTION_SIZE = 8192
+
+# Number of data lines parsed together when reading a memory-mapped file
+DATA_LINES_PER_BATCH = 65536
+
+# GSAS binnings with the divisors of their BANK and ALT x values to degrees or microseconds
+GSAS_X_UNITS = {'CONS': 100.0, 'SLOG': 1.0, 'RALF': 32.0}
+
+_COMMENT_PREFIXES = (b'!', b'#')
+_CIF_X_TAGS = ('_pd_meas_2theta_scan', '_pd_proc_2theta_corrected', '_pd_meas_time_of_flight',
+               '_pd_proc_d_spacing')
+_CIF_Y_TAGS = ('_pd_meas_counts_total', '_pd_meas_intensity_total', '_pd_proc_intensity_total',
+               '_pd_proc_intensity_net')
+_CIF_RANGE_TAGS = ('_pd_meas_2theta_range_min', '_pd_meas_2theta_range_max', '_pd_meas_2theta_range_inc')
+_SU_REGEX = re.compile(r'([-+]?\d*\.?(\d*))(?:[eE]([-+]?\d+))?(?:\((\d+)\))?')
+_UXD_KEY_REGEX = re.compile(r'^\s*(_[A-Z0-9]+)\s*(?:=\s*(\S+))?', re.MULTILINE)
+
+
+def _sigma(y: np.ndarray):
+    """Returns the counting statistics sigma = sqrt(max(|y|, 1)) of the intensities."""
+    return np.sqrt(np.maximum(np.abs(y), 1))
+
+def _numeric_line(line: bytes):
+    """Returns the floats of a line, or None when it has a non-numeric token."""
+    try:
+        return [float(token) for token in line.split()]
+    except ValueError:
+        return None
+
+def _data_start(buffer, min_columns: int = 1):
+    """Returns the offset in the bytes or memory map of the first line with at least min_columns
+    numbers and no other token, skipping comments and header lines, and the numbers of that line."""
+    position, size = 0, len(buffer)
+    while position < size:
+        end = buffer.find(b'\n', position)
+        end = size if end < 0 else end + 1
+        line = bytes(buffer[position:end]).strip()
+        if line and not line.startswith(_COMMENT_PREFIXES):
+            numbers = _numeric_line(line)
+            if numbers is not None and len(numbers) >= min_columns:
+                return position, numbers
+        position = end
+    raise ValueError("No numeric data found")
+
+def _data_lines(lines, comment_prefixes: tuple = _COMMENT_PREFIXES):
+    """Generates the stripped data lines, skipping blank and comment lines and stopping at an
+    END line."""
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith(comment_prefixes):
+            continue
+        if line.upper() == b'END':
+            return
+        yield line
+
+def _line_numbers(lines: list, path: str):
+    """Returns the numbers of the data lines, raising ValueError at a non-numeric token rather
+    than ending the data there."""
+    tokens = b' '.join(lines).split()
+    try:
+        return np.array(tokens, dtype=float)
+    except ValueError:
+        token = next(token for token in tokens if _numeric_line(token) is None)
+        raise ValueError(f"File '{path}' has the non-numeric value '{token.decode(errors='replace')}' "
+                         f"in its data") from None
+
+def _numbers_from(buffer, offset: int, path: str):
+    """Returns all the numbers of the data lines from the offset of the bytes or memory map,
+    parsing a memory map in batches of DATA_LINES_PER_BATCH lines read from the map itself."""
+    if isinstance(buffer, bytes):
+        return _line_numbers(list(_data_lines(buffer[offset:].splitlines())), path)
+    buffer.seek(offset)
+    lines = _data_lines(iter(buffer.readline, b''))
+    batches = []
+    while True:
+        batch = list(itertools.islice(lines, DATA_LINES_PER_BATCH))
+        if not batch:
+            break
+        batches.append(_line_numbers(batch, path))
+    return np.concatenate(batches) if batches else np.empty(0)
+
+def _read_bytes(path: str, use_mmap: bool):
+    """Returns a read-only memory map of the file, or its bytes."""
+    with open(path, 'rb') as file:
+        if use_mmap and os.fstat(file.fileno()).st_size:
+            return _mmap.mmap(file.fileno(), 0, access=_mmap.ACCESS_READ)
+        return file.read()
+
+def read_xysig(path: str, mmap: bool = False):
+    """Returns x, y and sigma of a file with x, y [and sigma] columns after optional comment
+    and header lines (XYSIG). Without a sigma column, sigma is sqrt(max(|y|, 1)). With mmap,
+    the data are parsed from the memory map of the file in batches of lines, so its whole text
+    is never held in memory. Blank and comment lines within the data are skipped and an END
+    line ends them; any other non-numeric token raises ValueError."""
+    buffer = _read_bytes(path, mmap)
+    try:
+        offset, first = _data_start(buffer, 2)
+        values = _numbers_from(buffer, offset, path)
+    finally:
+        if not isinstance(buffer, bytes):
+            buffer.close()
+    columns = len(first)
+    if len(values) % columns:
+        raise ValueError(f"File '{path}' has {len(values)} numbers, not a multiple of {columns} columns")
+    values = values.reshape(-1, columns)
+    x, y = values[:, 0].copy(), values[:, 1].copy()
+    sigma = values[:, 2].copy() if columns > 2 else _sigma(y)
+    return x, y, sigma
+
+def read_free(path: str, mmap: bool = False):
+    """Returns x, y and sigma = sqrt(max(|y|, 1)) of a file with a 'start step end' line after
+    optional comment lines, followed by the intensities in free format (FREE, as written by
+    CFML). With mmap, the data are parsed as in read_xysig()."""
+    buffer = _read_bytes(path, mmap)
+    try:
+        offset, first = _data_start(buffer, 3)
+        start, step, end = first[:3]
+        if step <= 0 or end <= start:
+            raise ValueError(f"File '{path}' has no valid 'start step end' line")
+        line_end = buffer.find(b'\n', offset)
+        values = _numbers_from(buffer, len(buffer) if line_end < 0 else line_end + 1, path)
+    finally:
+        if not isinstance(buffer, bytes):
+            buffer.close()
+    n_points = int(round((end - start) / step)) + 1
+    if len(values) < n_points:
+        raise ValueError(f"File '{path}' has {len(values)} intensities instead of {n_points}")
+    y = values[:n_points].copy()
+    return start + step * np.arange(n_points), y, _sigma(y)
+
+def _fixed_width_fields(records: list, width: int):
+    """Returns the (n_fields, width) bytes of the fields of the given width of 80 character
+    records."""
+    text = b''.join(record[:80].ljust(80) for record in records)
+    return np.frombuffer(text, dtype=np.uint8).reshape(-1, width)
+
+def _field_values(fields: np.ndarray, blank: float = 0.0, decimals: int = 0):
+    """Returns the numbers of (n_fields, width) bytes, with blank fields as the given value and,
+    as in a Fortran Fw.d edit descriptor, the given implied decimals in fields without a point."""
+    strings = np.ascontiguousarray(fields).view(f'S{fields.shape[1]}').ravel()
+    values = np.full(len(strings), blank)
+    filled = np.char.strip(strings) != b''
+    values[filled] = strings[filled].astype(float)
+    if decimals:
+        values[filled & (np.char.find(strings, b'.') < 0)] /= 10**decimals
+    return values
+
+def read_gsas(path: str, bank: int = 1):
+    """Returns x, y and sigma of a bank of a GSAS raw file, with x in degrees for constant step
+    (CONS) and in microseconds for time-of-flight (SLOG, RALF) binning. The data are read from
+    the fixed width 80 character records of the STD, ESD and ALT formats, or from the x, y, esd
+    lines of the FXYE format. RALF binning has x only in the ALT and FXYE data."""
+    with open(path, 'rb') as file:
+        lines = file.read().splitlines()
+    for index, line in enumerate(lines):
+        tokens = line.split()
+        if len(tokens) > 2 and tokens[0] == b'BANK' and int(tokens[1]) == bank:
+            break
+    else:
+        raise ValueError(f"File '{path}' has no BANK {bank}")
+    n_channels, n_records, bin_type = int(tokens[2]), int(tokens[3]), tokens[4].decode()
+    if bin_type not in GSAS_X_UNITS:
+        raise ValueError(f"GSAS binning '{bin_type}' is not one of {tuple(GSAS_X_UNITS)}")
+    data_type = tokens[-1].decode() if tokens[-1] in (b'STD', b'ESD', b'ALT', b'FXYE') else 'STD'
+    records = lines[index + 1:index + 1 + n_records]
+    x = None
+    if data_type == 'ESD':
+        values = _field_values(_fixed_width_fields(records, 8)).reshape(-1, 2)[:n_channels]
+        y, sigma = values[:, 0], values[:, 1]
+    elif data_type == 'STD':
+        fields = _fixed_width_fields(records, 8)[:n_channels]
+        counters, y = _field_values(fields[:, :2], 1.0), _field_values(fields[:, 2:])
+        sigma = np.sqrt(np.maximum(y, 1) / np.maximum(counters, 1))
+    elif data_type == 'ALT':
+        fields = _fixed_width_fields(records, 20)[:n_channels]  # (4(F8.0,F7.4,F5.4))
+        x = _field_values(fields[:, :8]) / GSAS_X_UNITS[bin_type]
+        y, sigma = _field_values(fields[:, 8:15], decimals=4), _field_values(fields[:, 15:], decimals=4)
+    else:
+        values = _line_numbers(list(_data_lines(records)), path)
+        if len(values) % 3:
+            raise ValueError(f"File '{path}' has {len(values)} numbers in BANK {bank}, not x, y, esd triplets")
+        x, y, sigma = values.reshape(-1, 3)[:n_channels].T
+        x = x / GSAS_X_UNITS['CONS'] if bin_type == 'CONS' else x  # microseconds, also for RALF
+    if len(y) < n_channels:
+        raise ValueError(f"File '{path}' has {len(y)} points in BANK {bank} instead of {n_channels}")
+    if x is not None:
+        return x, y, sigma
+    if bin_type == 'CONS':
+        start, step = (float(token) / GSAS_X_UNITS[bin_type] for token in tokens[5:7])
+        return start + step * np.arange(n_channels), y, sigma
+    if bin_type == 'SLOG':
+        start, ratio = float(tokens[5]), float(tokens[7])  # start, end and dt/t
+        return start * (1 + ratio)**np.arange(n_channels), y, sigma
+    raise ValueError(f"File '{path}' has GSAS RALF binning in {data_type} format, without x values")
+
+def _values_and_sus(values: list):
+    """Returns the numbers of CIF values and their standard uncertainties (NaN when not given)."""
+    numbers, sus = np.empty(len(values)), np.full(len(values), np.nan)
+    for i, value in enumerate(values):
+        match = _SU_REGEX.match(value)
+        number, decimals, exponent, su = match.groups() if match else (None, '', None, None)
+        numbers[i] = float(number + (f'e{exponent}' if exponent else '')) if number not in (None, '', '.', '-', '+') \
+            else np.nan
+        if su is not None:
+            sus[i] = int(su) * 10.0**(int(exponent or 0) - len(decimals))
+    return numbers, sus
+
+def read_cif_pattern(path: str):
+    """Returns x, y and sigma of the first data block of a powder CIF with measured or processed
+    intensities, with sigma from their standard uncertainties or sqrt(max(|y|, 1))."""
+    with open(path, encoding='utf-8', errors='replace') as file:
+        text = file.read()
+    for _, items in cif_blocks(text):
+        y_tag = next((tag for tag in _CIF_Y_TAGS if isinstance(items.get(tag), list)), None)
+        if y_tag is None:
+            continue
+        y, sigma = _values_and_sus(items[y_tag])
+        x_tag = next((tag for tag in _CIF_X_TAGS if isinstance(items.get(tag), list)), None)
+        if x_tag is not None:
+            x = _values_and_sus(items[x_tag])[0]
+        elif all(tag in items for tag in _CIF_RANGE_TAGS):
+            start, _, step = (_values_and_sus([items[tag]])[0][0] for tag in _CIF_RANGE_TAGS)
+            x = start + step * np.arange(len(y))
+        else:
+            raise ValueError(f"File '{path}' has intensities without x values")
+        missing = np.isnan(sigma)
+        sigma[missing] = _sigma(y[missing])
+        return x, y, sigma
+    raise ValueError(f"File '{path}' has no powder pattern block")
+
+def read_socabim(path: str):
+    """Returns x, y and sigma = sqrt(max(|y|, 1)) of the first range of a Socabim (Bruker UXD) file, with
+    either _COUNTS after _START and _STEPSIZE, or x, y pairs after _2THETACOUNTS."""
+    with open(path, encoding='utf-8', errors='replace') as file:
+        text = file.read()
+    keys = {}
+    for match in _UXD_KEY_REGEX.finditer(text):
+        key, value = match.groups()
+        if key in ('_COUNTS', '_CPS', '_2THETACOUNTS', '_2THETACPS'):
+            end = re.search(r'^\s*_', text[match.end():], re.MULTILINE)
+            data = text[match.end():match.end() + end.start() if end else len(text)]
+            values = _line_numbers(list(_data_lines(data.encode().splitlines(), (b';',))), path)
+            if key.startswith('_2THETA'):
+                x, y = values.reshape(-1, 2).T.copy()
+            else:
+                start, step = float(keys['_START']), float(keys['_STEPSIZE'])
+                y = values
+                x = start + step * np.arange(len(y))
+            return x, y, _sigma(y)
+        keys.setdefault(key, value)
+    raise ValueError(f"File '{path}' has no _COUNTS or _2THETACOUNTS data")
+
+def detect_pattern_format(path: str):
+    """Returns the format of a pattern file from its extension or, for other extensions, e.g.
+    .dat, from its first bytes: GSAS BANK records, CIF data blocks, UXD keys, or a FREE
+    'start step end' line rather than x, y [sigma] columns."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in PATTERN_EXTENSIONS:
+        return PATTERN_EXTENSIONS[extension]
+    with open(path, 'rb') as file:
+        head = file.read(DETECTION_SIZE)
+    if re.search(rb'^BANK\s', head, re.MULTILINE):
+        return 'gsas'
+    if re.search(rb'^\s*data_', head, re.MULTILINE | re.IGNORECASE):
+        return 'cif'
+    if re.search(rb'^\s*_(START|STEPSIZE|2THETACOUNTS|COUNTS)\b', head, re.MULTILINE):
+        return 'socabim'
+    offset, first = _data_start(head, 2)
+    rest = _data_start(head[head.find(b'\n', offset) + 1:], 1)[1] if b'\n' in head[offset:] else []
+    if len(first) == 3 and first[1] > 0 and first[2] > first[0] + first[1] and len(rest) != 3:
+        return 'free'
+    return 'xysig'
+
+def read_pattern(path: str, format: str = None, mmap: bool = False):
+    """Returns x, y and sigma arrays of a measured pattern in one of PATTERN_FORMATS, detected
+    from the file when not given. mmap applies to the xysig and free formats."""
+    format = format or detect_pattern_format(path)
+    if format == 'xysig':
+        return read_xysig(path, mmap)
+    if format == 'free':
+        return read_free(path, mmap)
+    if format == 'gsas':
+        return read_gsas(path)
+    if format == 'cif':
+        return read_cif_pattern(path)
+    if format == 'socabim':
+        return read_socabim(path)
+    raise ValueError(f"Pattern format '{format}' is not one of {PATTERN_FORMATS}")
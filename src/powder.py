@@ -0,0 +1,429 @@
+import collections
+import threading
+import numpy as np
+
+from .profiles import (pseudo_voigt, pseudo_voigt_derivatives, tch_fwhm_and_eta, tch_fwhm_and_eta_derivatives,
+                       windowed_blocks)
+from .reflections import Cell, cached_reflections, metric_tensor_derivatives
+from .space_groups import space_group
+from .structure_factors import AtomList, StructureFactorTables, atom_arrays
+
+
+# Lorentzian size broadening (Angstrom) included by CFML in simulated patterns
+LORENTZIAN_SIZE = 1900.0
+
+# Number of reflections whose profiles are evaluated together
+CHUNK_SIZE = 256
+
+# Floating point types of the simulated patterns
+PATTERN_DTYPES = (np.dtype(np.float64), np.dtype(np.float32))
+
+# Maximum number of setups kept by a PowderContext
+CONTEXT_SIZE = 32
+
+# Radiation probes of the simulated experiments
+RADIATION_PROBES = ('neutron',)
+
+# Atom parameters which can be changed without rebuilding a simulation
+ATOM_PARAMETERS = ('_fract_x', '_fract_y', '_fract_z', '_occupancy', '_B_iso_or_equiv')
+
+_CELL_KEYS = ('_cell_length_a', '_cell_length_b', '_cell_length_c',
+              '_cell_angle_alpha', '_cell_angle_beta', '_cell_angle_gamma')
+_RESOLUTION_KEYS = ('_pd_instr_resolution_u', '_pd_instr_resolution_v', '_pd_instr_resolution_w',
+                    '_pd_instr_resolution_x', '_pd_instr_resolution_y')
+_FRACT_KEYS = ('_fract_x', '_fract_y', '_fract_z')
+_OFFSET_KEY = '_pd_meas_2theta_offset'
+_ASYMMETRY_KEYS = ('_pd_instr_reflex_asymmetry_p1', '_pd_instr_reflex_asymmetry_p2',
+                   '_pd_instr_reflex_asymmetry_p3', '_pd_instr_reflex_asymmetry_p4')
+
+
+def _pattern_dtype(dtype):
+    """Returns the dtype, checked to be one of PATTERN_DTYPES."""
+    dtype = np.dtype(dtype)
+    if dtype not in PATTERN_DTYPES:
+        raise ValueError(f"Pattern dtype {dtype} is not one of {[str(t) for t in PATTERN_DTYPES]}")
+    return dtype
+
+def _pattern_array(shape: tuple, dtype=np.float64, out: np.ndarray = None):
+    """Returns out, checked to have the given shape and a pattern dtype, or a new array
+    of the given shape and dtype (float64 or float32) to fill with patterns."""
+    if out is None:
+        return np.empty(shape, dtype=_pattern_dtype(dtype))
+    if out.shape != tuple(shape):
+        raise ValueError(f"Output buffer has shape {out.shape} instead of {tuple(shape)}")
+    if out.dtype not in PATTERN_DTYPES:
+        raise ValueError(f"Output buffer dtype {out.dtype} is not one of {[str(t) for t in PATTERN_DTYPES]}")
+    return out
+
+def _blocks(study_dict: dict, key: str):
+    """Returns the data blocks of e.g. 'phases' as a list of dicts, dropping their names."""
+    blocks = [list(item.values())[0] for item in study_dict.get(key, [])]
+    if not blocks:
+        raise ValueError(f"Study dict has no '{key}'")
+    return blocks
+
+def _phase_key(phase: dict):
+    """Returns the part of a phase which defines its reflections: space group and cell."""
+    return (phase['_space_group_name_H-M_alt'],) + tuple(float(phase[key]) for key in _CELL_KEYS)
+
+def _experiment_key(experiment: dict):
+    """Returns the part of an experiment which defines the 2theta grid and the peak shapes."""
+    probe = experiment.get('_diffrn_radiation_probe', 'neutron')
+    if probe not in RADIATION_PROBES:
+        raise ValueError(f"Radiation probe '{probe}' is not one of {RADIATION_PROBES}")
+    asymmetry = [key for key in _ASYMMETRY_KEYS if experiment.get(key, 0)]
+    if asymmetry:
+        raise ValueError(f"Peak asymmetry {asymmetry} is not supported, only symmetric peaks with "
+                         f"{_ASYMMETRY_KEYS} of 0")
+    return (float(experiment['_diffrn_radiation_wavelength']),
+            float(experiment['_pd_meas_2theta_range_min']),
+            float(experiment['_pd_meas_2theta_range_max']),
+            float(experiment['_pd_meas_2theta_range_inc']),
+            float(experiment.get(_OFFSET_KEY, 0))) + \
+           tuple(float(experiment.get(key, 0)) for key in _RESOLUTION_KEYS)
+
+def _setup_key(study_dict: dict):
+    """Returns a hashable key; study dicts with equal keys differ only by their atoms."""
+    phases = tuple(_phase_key(phase) for phase in _blocks(study_dict, 'phases'))
+    experiment = _experiment_key(_blocks(study_dict, 'experiments')[0])
+    return phases, experiment
+
+def _x_grid(experiment_key: tuple):
+    """Returns the 2theta grid from range min to range max (inclusive) with range inc step."""
+    x_min, x_max, x_step = experiment_key[1:4]
+    return x_min + x_step * np.arange(int(round((x_max - x_min) / x_step)) + 1)
+
+def _atom_arrays(phase: dict):
+    """Returns fractional coordinates, occupancies, scattering lengths and Biso of the atoms."""
+    return atom_arrays(phase.get('_atom_site', []))
+
+def _atom_labels(phase: dict):
+    """Returns the labels of the atoms, given as '_atom_site' dicts or an AtomList."""
+    atom_sites = phase.get('_atom_site', [])
+    if isinstance(atom_sites, AtomList):
+        return list(atom_sites.labels)
+    return [atom['_label'] for atom in atom_sites]
+
+def _structure_factor_derivatives(hkl, s, rotations, translations, xyz, occupancy, scattering_length, b_iso):
+    """Returns the nuclear structure factors and their derivatives with respect
+    to the fractional coordinates (n_atoms, 3, n_refl), the occupancies and Biso (n_atoms, n_refl)
+    of the atoms, and to sin(theta)/lambda (n_refl)."""
+    f = np.zeros(len(hkl), dtype=complex)
+    d_xyz = np.empty((len(xyz), 3, len(hkl)), dtype=complex)
+    d_occupancy = np.empty((len(xyz), len(hkl)), dtype=complex)
+    d_b_iso = np.empty((len(xyz), len(hkl)), dtype=complex)
+    d_s = np.zeros(len(hkl), dtype=complex)
+    rotated_hkl = np.einsum('ni,kij->nkj', hkl, rotations)  # gradients of the phases h.(Rx+t) with respect to x
+    for i, (atom_xyz, atom_occupancy, atom_b, atom_b_iso) in enumerate(zip(xyz, occupancy, scattering_length, b_iso)):
+        positions = rotations @ atom_xyz + translations
+        exponentials = np.exp(2j * np.pi * (hkl @ positions.T))
+        scattering = atom_b * np.exp(-atom_b_iso * s**2)
+        d_occupancy[i] = scattering * exponentials.sum(axis=1)
+        term = atom_occupancy * d_occupancy[i]
+        f += term
+        d_xyz[i] = 2j * np.pi * atom_occupancy * scattering * np.einsum('nk,nkj->jn', exponentials, rotated_hkl)
+        d_b_iso[i] = -s**2 * term
+        d_s -= 2 * atom_b_iso * s * term
+    return f, d_xyz, d_occupancy, d_b_iso, d_s
+
+
+class _PhaseSetup:
+    """Reflections and peak shapes of one phase, which do not depend on the atoms."""
+
+    def __init__(self, phase_key: tuple, experiment_key: tuple, x: np.ndarray):
+        symbol, cell = phase_key[0], Cell(*phase_key[1:])
+        wavelength, offset = experiment_key[0], experiment_key[4]
+        u, v, w, x_, y_ = experiment_key[5:]
+        self.cell, self.wavelength, self.resolution = cell, wavelength, (u, v, w, x_, y_)
+        group = space_group(symbol)
+        self.rotations, self.translations = group.rotations, group.translations
+        s_max = np.sin(np.radians(min(x[-1], 180) / 2)) / wavelength
+        self.hkl, self.multiplicities, self.s = cached_reflections(cell, group, s_max)
+        self.tables = StructureFactorTables(self.hkl, self.s, group)
+        self.theta = theta = np.arcsin(wavelength * self.s)
+        tan, cos = np.tan(theta), np.cos(theta)
+        self.positions = 2 * np.degrees(theta) + offset
+        self.fwhm_gauss = np.sqrt(np.maximum(u * tan**2 + v * tan + w, 0))
+        self.fwhm_lorentz = x_ * tan + y_ / cos + np.degrees(wavelength / (LORENTZIAN_SIZE * cos))
+        self.fwhm, self.eta = tch_fwhm_and_eta(self.fwhm_gauss, self.fwhm_lorentz)
+        self.factors = 0.5 / cell.volume * self.multiplicities / (np.sin(theta)**2 * cos)
+
+    def intensities(self, phase: dict):
+        """Returns the integrated intensities of the reflections for the atoms of the phase."""
+        return self.intensities_from_arrays(*_atom_arrays(phase))
+
+    def intensities_from_arrays(self, xyz, occupancy, scattering_length, b_iso):
+        """Returns the integrated intensities of the reflections for the given atom arrays."""
+        f = self.tables.structure_factors(xyz, occupancy, scattering_length, b_iso)
+        return self.factors * np.abs(f)**2
+
+    def peak_derivatives(self, key: str):
+        """Returns the derivatives of the peak positions, FWHM, eta, log of the intensity factors
+        and sin(theta)/lambda of the reflections with respect to a cell parameter, a resolution
+        parameter or the 2theta offset. The reflection list itself is kept fixed."""
+        zeros = np.zeros(len(self.s))
+        if key == _OFFSET_KEY:
+            return np.ones(len(self.s)), zeros, zeros, zeros, zeros
+        u, v, w, x_, y_ = self.resolution
+        sin, cos, tan = np.sin(self.theta), np.cos(self.theta), np.tan(self.theta)
+        if key in _CELL_KEYS:
+            metric, reciprocal_metric = self.cell.metric, self.cell.reciprocal_metric
+            d_metric = metric_tensor_derivatives(*self.cell)[_CELL_KEYS.index(key)]
+            d_reciprocal_metric = -reciprocal_metric @ d_metric @ reciprocal_metric
+            d_s = np.einsum('ni,ij,nj->n', self.hkl, d_reciprocal_metric, self.hkl) / (8 * self.s)
+            d_theta = self.wavelength * d_s / cos
+            d_gauss_squared = (2 * u * tan + v) / cos**2 * d_theta
+            d_lorentz = (x_ + (y_ + np.degrees(self.wavelength / LORENTZIAN_SIZE)) * sin) / cos**2 * d_theta
+            d_log_volume = 0.5 * np.trace(np.linalg.solve(metric, d_metric))
+            d_log_factors = -d_log_volume + (tan - 2 / tan) * d_theta
+            d_position = 2 * np.degrees(d_theta)
+        elif key in _RESOLUTION_KEYS:
+            index = _RESOLUTION_KEYS.index(key)
+            d_gauss_squared = (tan**2, tan, np.ones_like(tan), zeros, zeros)[index]
+            d_lorentz = (zeros, zeros, zeros, tan, 1 / cos)[index]
+            d_position, d_log_factors, d_s = zeros, zeros, zeros
+        else:
+            raise ValueError(f"Parameter '{key}' has no derivative, only {ATOM_PARAMETERS}, "
+                             f"{_CELL_KEYS}, {_RESOLUTION_KEYS} and '{_OFFSET_KEY}'")
+        d_gauss = np.divide(d_gauss_squared, 2 * self.fwhm_gauss, out=np.zeros(len(self.s)), where=self.fwhm_gauss > 0)
+        d_fwhm_g, d_fwhm_l, d_eta_g, d_eta_l = tch_fwhm_and_eta_derivatives(self.fwhm_gauss, self.fwhm_lorentz)
+        d_fwhm = d_fwhm_g * d_gauss + d_fwhm_l * d_lorentz
+        d_eta = d_eta_g * d_gauss + d_eta_l * d_lorentz
+        return d_position, d_fwhm, d_eta, d_log_factors, d_s
+
+    def profile_blocks(self, x: np.ndarray, window: float = None):
+        """Yields reflection slices, x slices and the corresponding normalised profiles; with a
+        window, every profile is evaluated only within +-window FWHM of its position."""
+        if window is not None:
+            yield from windowed_blocks(pseudo_voigt, x, self.fwhm, self.eta, center=self.positions, window=window)
+            return
+        for start in range(0, len(self.positions), CHUNK_SIZE):
+            chunk = slice(start, start + CHUNK_SIZE)
+            yield chunk, slice(None), pseudo_voigt(x, self.fwhm[chunk], self.eta[chunk], center=self.positions[chunk])
+
+
+class _PatternSetup:
+    """2theta grid and phase setups shared by study dicts with the same setup key."""
+
+    def __init__(self, setup_key: tuple):
+        phase_keys, experiment_key = setup_key
+        self.x = _x_grid(experiment_key)
+        self.phases = [_PhaseSetup(phase_key, experiment_key, self.x) for phase_key in phase_keys]
+
+    def patterns(self, study_dicts: list, window: float = None, out: np.ndarray = None):
+        """Returns the (n_dicts, n_x) patterns, evaluating every profile once for the whole batch.
+        The patterns are summed in place into out when given."""
+        y = _pattern_array((len(study_dicts), len(self.x)), out=out)
+        y[...] = 0
+        for index, phase_setup in enumerate(self.phases):
+            intensities = np.array([phase_setup.intensities(_blocks(study_dict, 'phases')[index])
+                                    for study_dict in study_dicts])
+            for chunk, span, profiles in phase_setup.profile_blocks(self.x, window):
+                y[:, span] += intensities[:, chunk] @ profiles
+        return y
+
+
+class PowderContext:
+    """State of powder pattern calculations: setups (space group, reflections, peak
+    profiles) reused by calls with the same setup key, of which the maxsize most recently
+    used are kept, so a long-lived context, e.g. in a fit refining the cell, stays bounded.
+    Setups are read-only once built, so a context can be shared by threads; the array
+    work runs in NumPy, which releases the GIL. Contexts are independent of each other,
+    and after reset() a context holds no state, so results never depend on the order of
+    earlier calls."""
+
+    def __init__(self, maxsize: int = CONTEXT_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._setups = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._setups)
+
+    def setup(self, setup_key: tuple):
+        """Returns the setup for the key, building it on first use."""
+        with self._lock:
+            setup = self._setups.get(setup_key)
+            if setup is not None:
+                self._setups.move_to_end(setup_key)
+        if setup is None:
+            setup = _PatternSetup(setup_key)
+            with self._lock:
+                setup = self._setups.setdefault(setup_key, setup)
+                self._setups.move_to_end(setup_key)
+                while len(self._setups) > self.maxsize:
+                    self._setups.popitem(last=False)
+        return setup
+
+    def reset(self):
+        """Drops all the setups held by the context."""
+        with self._lock:
+            self._setups.clear()
+
+
+class PowderSimulation:
+    """Powder pattern simulation built once from a study dict. Space group, reflections
+    and peak profiles are kept, so that changing atom parameters with update() only
+    recomputes the structure factors and the profile sum in compute(). With a window,
+    profiles are kept only within +-window FWHM of the peaks (see profiles.truncation_error_bound).
+    An AtomList given as the '_atom_site' of a phase is shared, not copied, so update() changes it."""
+
+    def __init__(self, study_dict: dict, context: PowderContext = None, window: float = None):
+        context = PowderContext() if context is None else context
+        self._setup = context.setup(_setup_key(study_dict))
+        phases = _blocks(study_dict, 'phases')
+        self._phase_names = [list(item.keys())[0] for item in study_dict['phases']]
+        self._labels = [_atom_labels(phase) for phase in phases]
+        self._atoms = [list(_atom_arrays(phase)) for phase in phases]
+        self._profiles = [list(phase_setup.profile_blocks(self._setup.x, window)) for phase_setup in self._setup.phases]
+        self._window = window
+        self._profile_derivatives = None
+
+    @property
+    def x(self):
+        """2theta grid of the simulated pattern."""
+        return self._setup.x
+
+    def update(self, atom_sites: list, phase=0):
+        """Updates atom parameters of the phase (index or name) from a list of '_atom_site'
+        like dicts, e.g. [{'_label': 'Sr', '_B_iso_or_equiv': 0.5}]. Nothing is changed when
+        a label or key is invalid."""
+        index = self._phase_index(phase)
+        xyz, occupancy, _, b_iso = self._atoms[index]
+        updates = []  # all labels and keys are checked before any value is written
+        for atom in atom_sites:
+            i = self._atom_index(index, atom['_label'])
+            for key, value in atom.items():
+                if key == '_label':
+                    continue
+                if key not in ATOM_PARAMETERS:
+                    raise ValueError(f"Atom parameter '{key}' cannot be updated, only {ATOM_PARAMETERS}")
+                updates.append((i, key, float(value)))
+        for i, key, value in updates:
+            if key in _FRACT_KEYS:
+                xyz[i, _FRACT_KEYS.index(key)] = value
+            elif key == '_occupancy':
+                occupancy[i] = value
+            else:
+                b_iso[i] = value
+
+    def _phase_index(self, phase):
+        return self._phase_names.index(phase) if isinstance(phase, str) else phase
+
+    def _atom_index(self, index: int, label: str):
+        if label not in self._labels[index]:
+            raise KeyError(f"No atom '{label}' in phase '{self._phase_names[index]}'")
+        return self._labels[index].index(label)
+
+    def compute(self, dtype=np.float64, out: np.ndarray = None):
+        """Returns x and y arrays of the powder pattern for the current atom parameters. The
+        pattern is summed directly into a new array of the given dtype, or into out, which
+        a fit loop can pass on every call to avoid any allocation."""
+        y = _pattern_array(self.x.shape, dtype, out)
+        y[...] = 0
+        for phase_setup, atoms, blocks in zip(self._setup.phases, self._atoms, self._profiles):
+            intensities = phase_setup.intensities_from_arrays(*atoms)
+            for chunk, span, profiles in blocks:
+                y[span] += intensities[chunk] @ profiles
+        return self.x, y
+
+    def compute_with_jacobian(self, parameters: list, phase=0, sparse: bool = False):
+        """Returns x, y and the (len(x), len(parameters)) Jacobian of y with respect to the
+        parameters, in a single pass reusing the structure factors and peak profiles of y.
+        Parameters are (label, key) tuples of atoms of the phase (index or name) with keys
+        from ATOM_PARAMETERS, cell keys of the phase, resolution u, v, w, x, y keys or the
+        2theta offset key, e.g. [('Pb', '_fract_x'), '_cell_length_a', '_pd_instr_resolution_u'].
+        Derivatives with respect to the cell keep the reflection list fixed. With sparse, the
+        Jacobian is returned as a scipy.sparse CSC matrix without the zeros outside the windows."""
+        index = self._phase_index(phase)
+        atom_columns, shape_columns = [], []
+        for column, parameter in enumerate(parameters):
+            if isinstance(parameter, str):
+                if parameter in _CELL_KEYS or parameter in _RESOLUTION_KEYS or parameter == _OFFSET_KEY:
+                    shape_columns.append((column, parameter))
+                    continue
+            else:
+                label, key = parameter
+                if key in ATOM_PARAMETERS:
+                    atom_columns.append((column, self._atom_index(index, label), key))
+                    continue
+            raise ValueError(f"Parameter {parameter!r} has no derivative, only atom {ATOM_PARAMETERS}, "
+                             f"{_CELL_KEYS}, {_RESOLUTION_KEYS} and '{_OFFSET_KEY}'")
+        if shape_columns and self._profile_derivatives is None:
+            self._profile_derivatives = [[pseudo_voigt_derivatives(self.x[span], phase_setup.fwhm[chunk], phase_setup.eta[chunk],
+                                                                   center=phase_setup.positions[chunk], window=self._window)
+                                          for chunk, span, _ in blocks]
+                                         for phase_setup, blocks in zip(self._setup.phases, self._profiles)]
+        y = np.zeros(len(self.x))
+        jacobian = np.zeros((len(parameters), len(self.x)))
+        for phase_index, (phase_setup, atoms, blocks) in enumerate(zip(self._setup.phases, self._atoms, self._profiles)):
+            f, d_xyz, d_occupancy, d_b_iso, d_s = _structure_factor_derivatives(
+                phase_setup.hkl, phase_setup.s, phase_setup.rotations, phase_setup.translations, *atoms)
+            intensities = phase_setup.factors * np.abs(f)**2
+            d_intensities = np.zeros((len(parameters), len(intensities)))
+            d_peaks = np.zeros((3, len(parameters), len(intensities)))  # position, FWHM and eta terms
+            if phase_index == index:
+                for column, i, key in atom_columns:
+                    if key in _FRACT_KEYS:
+                        d_f = d_xyz[i, _FRACT_KEYS.index(key)]
+                    else:
+                        d_f = d_occupancy[i] if key == '_occupancy' else d_b_iso[i]
+                    d_intensities[column] = 2 * phase_setup.factors * np.real(np.conj(f) * d_f)
+            for column, key in shape_columns:
+                if key in _CELL_KEYS and phase_index != index:
+                    continue
+                d_position, d_fwhm, d_eta, d_log_factors, d_s_key = phase_setup.peak_derivatives(key)
+                d_intensities[column] = (intensities * d_log_factors +
+                                         2 * phase_setup.factors * np.real(np.conj(f) * d_s) * d_s_key)
+                d_peaks[:, column] = intensities * np.array([d_position, d_fwhm, d_eta])
+            for block, (chunk, span, profiles) in enumerate(blocks):
+                y[span] += intensities[chunk] @ profiles
+                jacobian[:, span] += d_intensities[:, chunk] @ profiles
+                if shape_columns:
+                    for d_peak, d_profiles in zip(d_peaks, self._profile_derivatives[phase_index][block]):
+                        jacobian[:, span] += d_peak[:, chunk] @ d_profiles
+        if sparse:
+            try:
+                import scipy.sparse
+            except ImportError as error:
+                raise ImportError("Sparse Jacobians require scipy, install pycrysfml[sparse]") from error
+            return self.x, y, scipy.sparse.csc_matrix(jacobian.T)
+        return self.x, y, jacobian.T
+
+
+def powder_pattern_from_json(study_dict: dict, context: PowderContext = None, window: float = None,
+                             dtype=np.float64, out: np.ndarray = None):
+    """Returns x and y arrays of the powder pattern simulated from the study dict. The y array
+    has the given dtype (float64 or float32), or is out when given."""
+    x, y = powder_patterns_from_json([study_dict], context, window, dtype,
+                                     None if out is None else out[np.newaxis])
+    return x, y[0] if out is None else out
+
+def powder_patterns_from_json(study_dicts, context: PowderContext = None, window: float = None,
+                              dtype=np.float64, out: np.ndarray = None):
+    """Returns x and the stacked (n, len(x)) y arrays of the powder patterns simulated
+    from a list or generator of study dicts sharing the same 2theta grid. Without a
+    context, every call starts from a fresh one. With a window, every peak is summed
+    only within +-window FWHM of its position (see profiles.truncation_error_bound).
+    The patterns are written directly into a new array of the given dtype (float64 or
+    float32), or into out when given."""
+    context = PowderContext() if context is None else context
+    groups = {}
+    for index, study_dict in enumerate(study_dicts):
+        groups.setdefault(_setup_key(study_dict), []).append((index, study_dict))
+    if not groups:
+        raise ValueError("No study dicts given")
+    x, y = None, None
+    for setup_key, group in groups.items():
+        setup = context.setup(setup_key)
+        if x is None:
+            x = setup.x
+            y = _pattern_array((sum(len(group) for group in groups.values()), len(x)), dtype, out)
+        elif len(setup.x) != len(x) or not np.allclose(setup.x, x):
+            raise ValueError("Study dicts have different 2theta grids")
+        group_dicts = [study_dict for _, study_dict in group]
+        if len(groups) == 1:
+            setup.patterns(group_dicts, window, out=y)
+        else:
+            y[[index for index, _ in group]] = setup.patterns(group_dicts, window)
+    return x, y
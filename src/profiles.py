@@ -0,0 +1,224 @@
+import math
+import numpy as np
+
+
+# Number of peaks evaluated together when the profiles are summed
+CHUNK_SIZE = 256
+
+# Number of peaks evaluated together on the span covered by their windows
+WINDOW_CHUNK_SIZE = 32
+
+_LN2 = np.log(2)
+
+
+def tch_fwhm_and_eta(fwhm_gauss: np.ndarray, fwhm_lorentz: np.ndarray):
+    """Returns the total FWHM and Lorentzian fraction of the Thompson-Cox-Hastings pseudo-Voigt."""
+    g, l = fwhm_gauss, fwhm_lorentz
+    fwhm = (g**5 + 2.69269 * g**4 * l + 2.42843 * g**3 * l**2 +
+            4.47163 * g**2 * l**3 + 0.07842 * g * l**4 + l**5) ** 0.2
+    q = l / fwhm
+    eta = np.maximum(1.0e-06, 1.36603 * q - 0.47719 * q**2 + 0.11116 * q**3)
+    return fwhm, eta
+
+def tch_fwhm_and_eta_derivatives(fwhm_gauss: np.ndarray, fwhm_lorentz: np.ndarray):
+    """Returns the derivatives of the total FWHM and of eta from tch_fwhm_and_eta() with
+    respect to the Gaussian and Lorentzian FWHM: dfwhm/dg, dfwhm/dl, deta/dg, deta/dl."""
+    g, l = fwhm_gauss, fwhm_lorentz
+    fwhm, _ = tch_fwhm_and_eta(g, l)
+    scale = 0.2 * fwhm**-4
+    d_fwhm_g = scale * (5 * g**4 + 4 * 2.69269 * g**3 * l + 3 * 2.42843 * g**2 * l**2 +
+                        2 * 4.47163 * g * l**3 + 0.07842 * l**4)
+    d_fwhm_l = scale * (2.69269 * g**4 + 2 * 2.42843 * g**3 * l + 3 * 4.47163 * g**2 * l**2 +
+                        4 * 0.07842 * g * l**3 + 5 * l**4)
+    q = l / fwhm
+    d_eta_q = np.where(1.36603 * q - 0.47719 * q**2 + 0.11116 * q**3 > 1.0e-06,
+                       1.36603 - 2 * 0.47719 * q + 3 * 0.11116 * q**2, 0)
+    d_eta_g = d_eta_q * -q / fwhm * d_fwhm_g
+    d_eta_l = d_eta_q * (1 - q * d_fwhm_l) / fwhm
+    return d_fwhm_g, d_fwhm_l, d_eta_g, d_eta_l
+
+def profile_windows(x: np.ndarray, center, width, window: float):
+    """Returns start and stop indices of the windows center +- window * width on the
+    sorted x grid, located by binary search."""
+    start = np.searchsorted(x, center - window * width, side='left')
+    stop = np.searchsorted(x, center + window * width, side='right')
+    return start, stop
+
+def truncation_error_bound(window: float, eta=1.0):
+    """Returns the upper bound of the relative area of a pseudo-Voigt peak outside its window
+    of +-window FWHM: eta * (1 - 2/pi * arctan(2 window)) + (1 - eta) * erfc(2 sqrt(ln2) window).
+    This is the Lorentzian (eta=1, default) worst case, about 1/(2 pi window) for large windows;
+    a Gaussian is exact to 1e-16 from window 2.5. For back-to-back exponentials the relative
+    area outside is (beta exp(-alpha window H) + alpha exp(-beta window H)) / (alpha + beta),
+    with H = ln2 (1/alpha + 1/beta). Pointwise, the omitted part of a peak is below its value
+    at the window edge."""
+    lorentz = 1 - 2 / np.pi * np.arctan(2 * window)
+    gauss = math.erfc(2 * math.sqrt(_LN2) * window)
+    return eta * lorentz + (1 - eta) * gauss
+
+def _broadcast_peak_arrays(center, intensity, params: tuple):
+    """Returns center, intensity and the parameters as 1-D float arrays with one item per peak."""
+    return np.broadcast_arrays(*(np.atleast_1d(np.asarray(p, dtype=float)) for p in (center, intensity) + params))
+
+def _evaluated(kernel, x, center, intensity, params: tuple, summed: bool, out: np.ndarray,
+               window: float = None, width=None):
+    """Evaluates the kernel for every peak on x, into an (n_peaks, n_x) array or summed over the
+    peaks. With a window, every peak is evaluated only within +-window * width(*params)."""
+    x = np.asarray(x, dtype=float)
+    center, intensity, *params = _broadcast_peak_arrays(center, intensity, params)
+    shape = (len(x),) if summed else (len(center), len(x))
+    if out is None:
+        out = np.empty(shape)
+    elif out.shape != shape:
+        raise ValueError(f"Output buffer has shape {out.shape} instead of {shape}")
+    if window is not None:
+        if width is None:
+            raise ValueError("Profile has no FWHM to define a window")
+        out[...] = 0
+        for chunk, span, profiles in _windowed_blocks(kernel, x, center, intensity, params, window, width):
+            if summed:
+                out[span] += profiles.sum(axis=0)
+            else:
+                out[chunk, span] = profiles
+        return out
+    if not summed:
+        kernel(out, x, center[:, None], intensity[:, None], *(p[:, None] for p in params))
+        return out
+    out[...] = 0
+    buffer = np.empty((min(len(center), CHUNK_SIZE), len(x)), dtype=out.dtype)
+    for start in range(0, len(center), CHUNK_SIZE):
+        chunk = slice(start, start + CHUNK_SIZE)
+        profiles = buffer[:len(center[chunk])]
+        kernel(profiles, x, center[chunk, None], intensity[chunk, None], *(p[chunk, None] for p in params))
+        out += profiles.sum(axis=0)
+    return out
+
+def _windowed_blocks(kernel, x, center, intensity, params: list, window: float, width):
+    """Yields peak slices, x slices spanned by the windows of the peaks and the profiles
+    evaluated on those spans, zero outside the window of every peak."""
+    start, stop = profile_windows(x, center, width(*params), window)
+    for first in range(0, len(center), WINDOW_CHUNK_SIZE):
+        chunk = slice(first, first + WINDOW_CHUNK_SIZE)
+        span = slice(start[chunk].min(), stop[chunk].max())
+        if span.start >= span.stop:
+            continue
+        columns = np.arange(span.start, span.stop)
+        inside = (columns >= start[chunk, None]) & (columns < stop[chunk, None])
+        profiles = np.empty(inside.shape)
+        kernel(profiles, x[span], center[chunk, None], intensity[chunk, None], *(p[chunk, None] for p in params))
+        np.multiply(profiles, inside, out=profiles)
+        yield chunk, span, profiles
+
+def windowed_blocks(function, x, *params, center=0.0, intensity=1.0, window: float):
+    """Yields (peak slice, x slice, profiles) blocks of a profile function, e.g. pseudo_voigt,
+    evaluated only within +-window FWHM of every peak, for block-sparse accumulation."""
+    kernel, width = _KERNELS[function]
+    if width is None:
+        raise ValueError("Profile has no FWHM to define a window")
+    x = np.asarray(x, dtype=float)
+    center, intensity, *params = _broadcast_peak_arrays(center, intensity, params)
+    yield from _windowed_blocks(kernel, x, center, intensity, params, window, width)
+
+def _gaussian(out, x, center, intensity, fwhm):
+    np.subtract(x, center, out=out)
+    np.square(out, out=out)
+    np.multiply(out, -4 * _LN2 / fwhm**2, out=out)
+    np.exp(out, out=out)
+    np.multiply(out, intensity * 2 / fwhm * np.sqrt(_LN2 / np.pi), out=out)
+
+def _lorentzian(out, x, center, intensity, fwhm):
+    np.subtract(x, center, out=out)
+    np.square(out, out=out)
+    np.multiply(out, 4 / fwhm**2, out=out)
+    np.add(out, 1, out=out)
+    np.divide(intensity * 2 / (np.pi * fwhm), out, out=out)
+
+def _pseudo_voigt(out, x, center, intensity, fwhm, eta):
+    gauss = np.empty_like(out)
+    _gaussian(gauss, x, center, intensity * (1 - eta), fwhm)
+    _lorentzian(out, x, center, intensity * eta, fwhm)
+    np.add(out, gauss, out=out)
+
+def _tch_pseudo_voigt(out, x, center, intensity, fwhm_gauss, fwhm_lorentz):
+    _pseudo_voigt(out, x, center, intensity, *tch_fwhm_and_eta(fwhm_gauss, fwhm_lorentz))
+
+def _back_to_back(out, x, center, intensity, alpha, beta):
+    np.subtract(x, center, out=out)
+    np.copyto(out, np.where(out < 0, alpha * out, -beta * out))
+    np.exp(out, out=out)
+    np.multiply(out, intensity * 0.5 * alpha * beta / (alpha + beta), out=out)
+
+def _ikeda_carpenter(out, x, center, intensity, alpha, beta, r):
+    np.subtract(x, center, out=out)
+    dx = np.maximum(out, 0)
+    exa = np.exp(-alpha * dx)
+    exb = np.exp(-beta * dx)
+    amb = alpha - beta
+    poly = 1 + (1 + 0.5 * amb * dx) * amb * dx
+    values = 0.5 * alpha**3 * ((1 - r) * dx**2 * exa + 2 * r * beta * (exb - exa * poly) / amb**3)
+    np.copyto(out, np.where(out > 0, intensity * values, 0))
+
+def _fwhm(fwhm, *params):
+    return fwhm
+
+def _tch_fwhm(fwhm_gauss, fwhm_lorentz):
+    return tch_fwhm_and_eta(fwhm_gauss, fwhm_lorentz)[0]
+
+def _back_to_back_fwhm(alpha, beta):
+    return _LN2 * (1 / alpha + 1 / beta)
+
+def pseudo_voigt_derivatives(x, fwhm, eta, center=0.0, intensity=1.0, window: float = None):
+    """Returns the derivatives of pseudo_voigt() with respect to center, fwhm and eta, as
+    three (n_peaks, n_x) arrays; with a window, they are zero outside +-window FWHM."""
+    x = np.asarray(x, dtype=float)
+    center, intensity, fwhm, eta = (p[:, None] for p in _broadcast_peak_arrays(center, intensity, (fwhm, eta)))
+    dx = x - center
+    gauss = np.empty(np.broadcast(dx, fwhm).shape)
+    lorentz = np.empty_like(gauss)
+    _gaussian(gauss, x, center, intensity, fwhm)
+    _lorentzian(lorentz, x, center, intensity, fwhm)
+    lorentz_denominator = 1 + 4 * dx**2 / fwhm**2
+    d_gauss_center = gauss * 8 * _LN2 * dx / fwhm**2
+    d_lorentz_center = lorentz * 8 * dx / fwhm**2 / lorentz_denominator
+    d_center = (1 - eta) * d_gauss_center + eta * d_lorentz_center
+    d_fwhm = ((1 - eta) * (d_gauss_center * dx - gauss) + eta * (d_lorentz_center * dx - lorentz)) / fwhm
+    d_eta = lorentz - gauss
+    if window is not None:
+        outside = (x < center - window * fwhm) | (x > center + window * fwhm)
+        for derivative in (d_center, d_fwhm, d_eta):
+            derivative[outside] = 0
+    return d_center, d_fwhm, d_eta
+
+def gaussian(x, fwhm, center=0.0, intensity=1.0, summed: bool = False, out: np.ndarray = None, window: float = None):
+    """Returns area normalised Gaussians on x, one row per peak or summed over the peaks."""
+    return _evaluated(_gaussian, x, center, intensity, (fwhm,), summed, out, window, _fwhm)
+
+def lorentzian(x, fwhm, center=0.0, intensity=1.0, summed: bool = False, out: np.ndarray = None, window: float = None):
+    """Returns area normalised Lorentzians on x, one row per peak or summed over the peaks."""
+    return _evaluated(_lorentzian, x, center, intensity, (fwhm,), summed, out, window, _fwhm)
+
+def pseudo_voigt(x, fwhm, eta, center=0.0, intensity=1.0, summed: bool = False, out: np.ndarray = None, window: float = None):
+    """Returns area normalised pseudo-Voigts on x, one row per peak or summed over the peaks."""
+    return _evaluated(_pseudo_voigt, x, center, intensity, (fwhm, eta), summed, out, window, _fwhm)
+
+def tch_pseudo_voigt(x, fwhm_gauss, fwhm_lorentz, center=0.0, intensity=1.0, summed: bool = False, out: np.ndarray = None, window: float = None):
+    """Returns Thompson-Cox-Hastings pseudo-Voigts on x, one row per peak or summed over the peaks."""
+    return _evaluated(_tch_pseudo_voigt, x, center, intensity, (fwhm_gauss, fwhm_lorentz), summed, out, window, _tch_fwhm)
+
+def back_to_back(x, alpha, beta, center=0.0, intensity=1.0, summed: bool = False, out: np.ndarray = None, window: float = None):
+    """Returns back-to-back exponentials on x, one row per peak or summed over the peaks."""
+    return _evaluated(_back_to_back, x, center, intensity, (alpha, beta), summed, out, window, _back_to_back_fwhm)
+
+def ikeda_carpenter(x, alpha, beta, r, center=0.0, intensity=1.0, summed: bool = False, out: np.ndarray = None):
+    """Returns Ikeda-Carpenter functions on x, one row per peak or summed over the peaks."""
+    return _evaluated(_ikeda_carpenter, x, center, intensity, (alpha, beta, r), summed, out)
+
+# Kernels and FWHM of the profile functions, for windowed_blocks()
+_KERNELS = {
+    gaussian: (_gaussian, _fwhm),
+    lorentzian: (_lorentzian, _fwhm),
+    pseudo_voigt: (_pseudo_voigt, _fwhm),
+    tch_pseudo_voigt: (_tch_pseudo_voigt, _tch_fwhm),
+    back_to_back: (_back_to_back, _back_to_back_fwhm),
+    ikeda_carpenter: (_ikeda_carpenter, None)
+}
@@ -0,0 +1,264 @@
+import collections
+import threading
+import numpy as np
+
+from . import space_groups
+
+
+# Number of reflections whose equivalents are generated together
+CHUNK_SIZE = 16384
+
+# Maximum number of reflection lists kept by the reflection cache
+REFLECTION_CACHE_SIZE = 64
+
+# Relative sin(theta)/lambda margin beyond the requested range of the cached reflection lists
+REFLECTION_CACHE_MARGIN = 0.02
+
+# Fields of the structured arrays returned by reflection_list()
+REFLECTION_DTYPE = np.dtype([('h', 'i4'), ('k', 'i4'), ('l', 'i4'), ('mult', 'i4'), ('d', 'f8'), ('s', 'f8')])
+
+
+def metric_tensor(a: float, b: float, c: float, alpha: float, beta: float, gamma: float):
+    """Returns the direct metric tensor of a cell with angles in degrees."""
+    ca, cb, cg = np.cos(np.radians([alpha, beta, gamma]))
+    return np.array([[a * a, a * b * cg, a * c * cb],
+                     [a * b * cg, b * b, b * c * ca],
+                     [a * c * cb, b * c * ca, c * c]])
+
+def metric_tensor_derivatives(a: float, b: float, c: float, alpha: float, beta: float, gamma: float):
+    """Returns the (6, 3, 3) derivatives of the direct metric tensor with respect to a, b, c
+    and the angles alpha, beta, gamma in degrees."""
+    ca, cb, cg = np.cos(np.radians([alpha, beta, gamma]))
+    sa, sb, sg = np.sin(np.radians([alpha, beta, gamma])) * np.pi / 180
+    return np.array([[[2 * a, b * cg, c * cb], [b * cg, 0, 0], [c * cb, 0, 0]],
+                     [[0, a * cg, 0], [a * cg, 2 * b, c * ca], [0, c * ca, 0]],
+                     [[0, 0, a * cb], [0, 0, b * ca], [a * cb, b * ca, 2 * c]],
+                     [[0, 0, 0], [0, 0, -b * c * sa], [0, -b * c * sa, 0]],
+                     [[0, 0, -a * c * sb], [0, 0, 0], [-a * c * sb, 0, 0]],
+                     [[0, -a * b * sg, 0], [-a * b * sg, 0, 0], [0, 0, 0]]])
+
+def cell_volume(a: float, b: float, c: float, alpha: float, beta: float, gamma: float):
+    """Returns the volume of a cell with angles in degrees."""
+    return np.sqrt(np.linalg.det(metric_tensor(a, b, c, alpha, beta, gamma)))
+
+
+class Cell:
+    """Cell parameters (a, b, c, alpha, beta, gamma), with angles in degrees, together with
+    the direct and reciprocal metric tensors and the volume, computed once into a single
+    read-only buffer. The arrays are views of that buffer, and the parameters are exposed
+    through the NumPy array interface (and the buffer protocol on Python 3.12+), so passing
+    a Cell to the functions of this module or to np.asarray() copies nothing. A Cell also
+    unpacks like the tuple of its parameters."""
+
+    def __init__(self, a: float, b: float, c: float, alpha: float, beta: float, gamma: float):
+        buffer = np.empty(25)
+        buffer[:6] = a, b, c, alpha, beta, gamma
+        metric = metric_tensor(a, b, c, alpha, beta, gamma)
+        buffer[6:15] = metric.ravel()
+        buffer[15:24] = np.linalg.inv(metric).ravel()
+        buffer[24] = np.sqrt(np.linalg.det(metric))
+        buffer.flags.writeable = False
+        self._buffer = buffer
+
+    @property
+    def parameters(self):
+        """View of a, b, c, alpha, beta, gamma."""
+        return self._buffer[:6]
+
+    @property
+    def metric(self):
+        """View of the (3, 3) direct metric tensor."""
+        return self._buffer[6:15].reshape(3, 3)
+
+    @property
+    def reciprocal_metric(self):
+        """View of the (3, 3) reciprocal metric tensor."""
+        return self._buffer[15:24].reshape(3, 3)
+
+    @property
+    def volume(self):
+        """Cell volume."""
+        return float(self._buffer[24])
+
+    @property
+    def __array_interface__(self):
+        return self.parameters.__array_interface__
+
+    def __buffer__(self, flags: int):
+        return memoryview(self.parameters)
+
+    def __len__(self):
+        return 6
+
+    def __iter__(self):
+        return iter(self.parameters.tolist())
+
+    def __getitem__(self, index):
+        return self.parameters.tolist()[index]
+
+    def __repr__(self):
+        return f'Cell{tuple(self.parameters.tolist())}'
+
+
+def _metric(cell):
+    return cell.metric if isinstance(cell, Cell) else metric_tensor(*cell)
+
+def _reciprocal_metric(cell):
+    return cell.reciprocal_metric if isinstance(cell, Cell) else np.linalg.inv(metric_tensor(*cell))
+
+def sin_theta_over_lambda(hkl: np.ndarray, cell):
+    """Returns sin(theta)/lambda of the given (n, 3) Miller indices of the cell, a tuple
+    (a, b, c, alpha, beta, gamma) or a Cell."""
+    reciprocal_metric = _reciprocal_metric(cell)
+    return 0.5 * np.sqrt(np.einsum('ni,ij,nj->n', hkl, reciprocal_metric, hkl))
+
+def _encoded(hkl: np.ndarray, offset: int):
+    base = 2 * offset + 1
+    return ((hkl[..., 0] + offset) * base + hkl[..., 1] + offset) * base + hkl[..., 2] + offset
+
+def _allowed(hkl: np.ndarray, rotations: np.ndarray, translations: np.ndarray):
+    """Returns a mask of the reflections which are not systematically absent, i.e.
+    without an operator with h.R = h and a non-integer phase h.t."""
+    absent = np.zeros(len(hkl), dtype=bool)
+    for rotation, translation in zip(rotations, translations):
+        phase = hkl @ translation
+        shifted = np.abs(phase - np.round(phase)) > 1e-6
+        absent |= shifted & (hkl @ rotation == hkl).all(axis=1)
+    return ~absent
+
+def _independent(hkl: np.ndarray, point_rotations: np.ndarray, offset: int):
+    """Returns a mask of the representatives (largest encoded equivalent) of the reflections
+    under the Laue group, and the multiplicities of all the given reflections."""
+    equivalents = np.einsum('ni,kij->nkj', hkl, point_rotations)
+    keys = _encoded(np.concatenate([equivalents, -equivalents], axis=1), offset)
+    keys.sort(axis=1)
+    multiplicities = 1 + (np.diff(keys, axis=1) != 0).sum(axis=1)
+    return keys[:, -1] == _encoded(hkl, offset), multiplicities
+
+def generate_reflections(cell, rotations: np.ndarray, translations: np.ndarray, s_max: float, s_min: float = 0.0):
+    """Returns Miller indices (n, 3), multiplicities and sin(theta)/lambda of the
+    symmetry independent allowed reflections with s_min <= sin(theta)/lambda <= s_max
+    (zero excluded), sorted by increasing sin(theta)/lambda."""
+    limits = np.ceil(2 * s_max * np.sqrt(np.diag(_metric(cell)))).astype(int)
+    ranges = [np.arange(0, limits[0] + 1)] + [np.arange(-n, n + 1) for n in limits[1:]]  # representatives have h >= 0
+    hkl = np.stack(np.meshgrid(*ranges, indexing='ij'), axis=-1).reshape(-1, 3)
+    s = sin_theta_over_lambda(hkl, cell)
+    inside = (s > 0) & (s >= s_min) & (s <= s_max)
+    hkl, s = hkl[inside], s[inside]
+    point_rotations = np.unique(rotations, axis=0)
+    offset = int(limits.max())
+    selected, multiplicities = [], []
+    for start in range(0, len(hkl), CHUNK_SIZE):  # bounds the memory of the equivalents
+        chunk = hkl[start:start + CHUNK_SIZE]
+        independent, chunk_multiplicities = _independent(chunk, point_rotations, offset)
+        indices = np.flatnonzero(independent)
+        indices = indices[_allowed(chunk[indices], rotations, translations)]
+        selected.append(start + indices)
+        multiplicities.append(chunk_multiplicities[indices])
+    selected = np.concatenate(selected)
+    hkl, s, multiplicities = hkl[selected], s[selected], np.concatenate(multiplicities)
+    order = np.lexsort((-hkl[:, 2], -hkl[:, 1], -hkl[:, 0], np.round(s, 10)))
+    return hkl[order], multiplicities[order], s[order]
+
+ReflectionCacheInfo = collections.namedtuple('ReflectionCacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class _ReflectionCache:
+    """LRU cache of reflection lists keyed by space group and sin(theta)/lambda range.
+    Every list is generated up to s_max * (1 + REFLECTION_CACHE_MARGIN) for a reference
+    cell. For another cell, the stored reflections are reused with recomputed
+    sin(theta)/lambda as long as no reflection beyond the margin can enter the range;
+    otherwise the list is generated again for the new cell."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def reflections(self, cell, space_group: space_groups.SpaceGroup, s_max: float, s_min: float = 0.0):
+        """Returns Miller indices, multiplicities and sin(theta)/lambda as generate_reflections()."""
+        key = (space_group.hall, float(s_min), float(s_max))
+        reciprocal_metric = _reciprocal_metric(cell)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None and _smallest_s_ratio(entry[0], reciprocal_metric) * entry[1] >= s_max:
+            with self._lock:
+                self._hits += 1
+            _, _, hkl, multiplicities = entry
+            s = sin_theta_over_lambda(hkl, cell)
+            inside = (s >= s_min) & (s <= s_max)
+            order = np.lexsort((-hkl[inside, 2], -hkl[inside, 1], -hkl[inside, 0], np.round(s[inside], 10)))
+            return hkl[inside][order], multiplicities[inside][order], s[inside][order]
+        s_generated = s_max * (1 + REFLECTION_CACHE_MARGIN)
+        hkl, multiplicities, s = generate_reflections(cell, space_group.rotations, space_group.translations, s_generated)
+        for array in (hkl, multiplicities):
+            array.flags.writeable = False
+        with self._lock:
+            self._misses += 1
+            self._entries[key] = (reciprocal_metric, s_generated, hkl, multiplicities)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        inside = (s >= s_min) & (s <= s_max)
+        return hkl[inside], multiplicities[inside], s[inside]
+
+    def info(self):
+        with self._lock:
+            return ReflectionCacheInfo(self._hits, self._misses, self.maxsize, len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
+
+
+def _smallest_s_ratio(reference_reciprocal_metric: np.ndarray, reciprocal_metric: np.ndarray):
+    """Returns the smallest ratio of sin(theta)/lambda of any hkl in the new and the reference
+    reciprocal metric, from the generalized eigenvalues of the two metrics."""
+    eigenvalues = np.linalg.eigvals(np.linalg.solve(reference_reciprocal_metric, reciprocal_metric))
+    return np.sqrt(np.min(eigenvalues.real))
+
+_REFLECTION_CACHE = _ReflectionCache(REFLECTION_CACHE_SIZE)
+
+def cached_reflections(cell, space_group, s_max: float, s_min: float = 0.0):
+    """Returns Miller indices, multiplicities and sin(theta)/lambda as generate_reflections(),
+    reusing the reflections of the process-wide cache when only the cell changes slightly."""
+    if isinstance(space_group, str):
+        space_group = space_groups.space_group(space_group)
+    return _REFLECTION_CACHE.reflections(cell, space_group, s_max, s_min)
+
+def reflection_cache_info():
+    """Returns hits, misses, maxsize and currsize of the reflection cache."""
+    return _REFLECTION_CACHE.info()
+
+def clear_reflection_cache():
+    """Removes all the reflection lists from the cache and resets its counters."""
+    _REFLECTION_CACHE.clear()
+
+def reflection_list(cell, space_group, s_range: tuple = None, two_theta_range: tuple = None, wavelength: float = None):
+    """Returns a structured array (h, k, l, mult, d, s) of the symmetry independent allowed
+    reflections of the cell (a, b, c, alpha, beta, gamma or a Cell) and space group (symbol or
+    SpaceGroup) within a sin(theta)/lambda range or a 2theta range at the given wavelength."""
+    if isinstance(space_group, str):
+        space_group = space_groups.space_group(space_group)
+    if two_theta_range is not None:
+        if wavelength is None:
+            raise ValueError("Wavelength is required with a 2theta range")
+        two_theta_min, two_theta_max = np.clip(two_theta_range, 0, 180)
+        s_range = (np.sin(np.radians(two_theta_min / 2)) / wavelength,
+                   np.sin(np.radians(two_theta_max / 2)) / wavelength)
+    if s_range is None:
+        raise ValueError("Either sin(theta)/lambda or 2theta range is required")
+    s_min, s_max = s_range
+    hkl, multiplicities, s = cached_reflections(cell, space_group, s_max, s_min)
+    reflections = np.empty(len(hkl), dtype=REFLECTION_DTYPE)
+    reflections['h'], reflections['k'], reflections['l'] = hkl.T
+    reflections['mult'] = multiplicities
+    reflections['d'] = 0.5 / s
+    reflections['s'] = s
+    return reflections
@@ -0,0 +1,101 @@
+import functools
+import os
+import re
+import sys
+import numpy as np
+
+
+# Coherent neutron scattering lengths (10^-12 cm) of the natural elements,
+# V.F. Sears, Neutron News 3 (1992) 26-37
+NEUTRON_SCATTERING_LENGTHS = {
+    'H': -0.3739, 'D': 0.6671, 'He': 0.326, 'Li': -0.190, 'Be': 0.779,
+    'B': 0.530, 'C': 0.6646, 'N': 0.936, 'O': 0.5803, 'F': 0.5654,
+    'Ne': 0.4566, 'Na': 0.363, 'Mg': 0.5375, 'Al': 0.3449, 'Si': 0.41491,
+    'P': 0.513, 'S': 0.2847, 'Cl': 0.9577, 'Ar': 0.1909, 'K': 0.367,
+    'Ca': 0.470, 'Sc': 1.229, 'Ti': -0.3438, 'V': -0.03824, 'Cr': 0.3635,
+    'Mn': -0.373, 'Fe': 0.945, 'Co': 0.249, 'Ni': 1.03, 'Cu': 0.7718,
+    'Zn': 0.568, 'Ga': 0.7288, 'Ge': 0.8185, 'As': 0.658, 'Se': 0.797,
+    'Br': 0.6795, 'Kr': 0.781, 'Rb': 0.709, 'Sr': 0.702, 'Y': 0.775,
+    'Zr': 0.716, 'Nb': 0.7054, 'Mo': 0.6715, 'Tc': 0.68, 'Ru': 0.703,
+    'Rh': 0.588, 'Pd': 0.591, 'Ag': 0.5922, 'Cd': 0.487, 'In': 0.4065,
+    'Sn': 0.6225, 'Sb': 0.557, 'Te': 0.580, 'I': 0.528, 'Xe': 0.492,
+    'Cs': 0.542, 'Ba': 0.507, 'La': 0.824, 'Ce': 0.484, 'Pr': 0.458,
+    'Nd': 0.769, 'Pm': 1.26, 'Sm': 0.080, 'Eu': 0.722, 'Gd': 0.650,
+    'Tb': 0.738, 'Dy': 1.69, 'Ho': 0.801, 'Er': 0.779, 'Tm': 0.707,
+    'Yb': 1.243, 'Lu': 0.721, 'Hf': 0.770, 'Ta': 0.691, 'W': 0.486,
+    'Re': 0.920, 'Os': 1.07, 'Ir': 1.06, 'Pt': 0.960, 'Au': 0.763,
+    'Hg': 1.2692, 'Tl': 0.8776, 'Pb': 0.9405, 'Bi': 0.8532, 'Th': 1.031,
+    'Pa': 0.91, 'U': 0.8417, 'Np': 1.055, 'Pu': 0.77, 'Am': 0.83
+}
+
+# Fields of the element table, one row per element
+ELEMENT_TABLE_DTYPE = np.dtype([('symbol', 'U2'), ('neutron_scattering_length', 'f8')])
+
+# Binary element table written next to this module by the build, see write_element_table()
+ELEMENT_TABLE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scattering_tables.npy')
+
+_ELEMENT_REGEX = re.compile(r'^([A-Za-z]{1,2}?)(?:\d*[+-]?\d*)?$')
+
+
+def _built_element_table():
+    table = np.empty(len(NEUTRON_SCATTERING_LENGTHS), dtype=ELEMENT_TABLE_DTYPE)
+    table['symbol'] = list(NEUTRON_SCATTERING_LENGTHS.keys())
+    table['neutron_scattering_length'] = list(NEUTRON_SCATTERING_LENGTHS.values())
+    return table
+
+@functools.lru_cache(maxsize=None)
+def element_table():
+    """Returns the read-only structured array of the element data, loaded once per process
+    from the binary table file when it exists, otherwise built from the tables of this module."""
+    table = None
+    if os.path.exists(ELEMENT_TABLE_FILE):
+        table = np.load(ELEMENT_TABLE_FILE, allow_pickle=False)
+    if table is None or table.dtype != ELEMENT_TABLE_DTYPE:
+        table = _built_element_table()
+    table.flags.writeable = False
+    return table
+
+@functools.lru_cache(maxsize=None)
+def _element_rows():
+    return {symbol: row for row, symbol in enumerate(element_table()['symbol'])}
+
+@functools.lru_cache(maxsize=None)
+def _element_row(type_symbol: str):
+    """Returns the element table row of an atom type symbol, resolved once per symbol."""
+    row = _element_rows().get(element_symbol(type_symbol))
+    if row is None:
+        raise KeyError(f"No neutron scattering length for '{type_symbol}'")
+    return row
+
+def element_table_cache_info():
+    """Returns hits, misses, maxsize and currsize of the cache of resolved atom type symbols."""
+    return _element_row.cache_info()
+
+def clear_element_table_cache():
+    """Drops the element table and the resolved atom type symbols, which are loaded again on next use."""
+    for function in (element_table, _element_rows, _element_row):
+        function.cache_clear()
+
+def write_element_table(path: str = ELEMENT_TABLE_FILE):
+    """Writes the element table as a binary .npy file, e.g. into the package at build time."""
+    np.save(path, _built_element_table(), allow_pickle=False)
+
+def element_symbol(type_symbol: str):
+    """Returns the element of an atom type symbol, e.g. 'Fe' for 'FE3+'."""
+    match = _ELEMENT_REGEX.match(type_symbol.strip())
+    if match is None:
+        raise ValueError(f"Invalid atom type symbol '{type_symbol}'")
+    return match.group(1).capitalize()
+
+def neutron_scattering_length(type_symbol: str):
+    """Returns the coherent neutron scattering length (10^-12 cm) of an atom type."""
+    return float(element_table()['neutron_scattering_length'][_element_row(type_symbol)])
+
+def neutron_scattering_lengths(type_symbols: list):
+    """Returns an array of the coherent neutron scattering lengths (10^-12 cm) of the atom types."""
+    rows = [_element_row(type_symbol) for type_symbol in type_symbols]
+    return element_table()['neutron_scattering_length'][rows]
+
+
+if __name__ == '__main__':
+    write_element_table(*sys.argv[1:])
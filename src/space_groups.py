@@ -0,0 +1,975 @@
+import fractions
+import functools
+import re
+import numpy as np
+
+
+# Space groups in their standard ITA settings (unique axis b, origin choice 2,
+# hexagonal axes for rhombohedral groups) as (number, H-M symbol, Hall symbol)
+SPACE_GROUPS = [
+    (1, 'P 1', 'P 1'),
+    (2, 'P -1', '-P 1'),
+    (3, 'P 2', 'P 2y'),
+    (4, 'P 21', 'P 2yb'),
+    (5, 'C 2', 'C 2y'),
+    (6, 'P m', 'P -2y'),
+    (7, 'P c', 'P -2yc'),
+    (8, 'C m', 'C -2y'),
+    (9, 'C c', 'C -2yc'),
+    (10, 'P 2/m', '-P 2y'),
+    (11, 'P 21/m', '-P 2yb'),
+    (12, 'C 2/m', '-C 2y'),
+    (13, 'P 2/c', '-P 2yc'),
+    (14, 'P 21/c', '-P 2ybc'),
+    (15, 'C 2/c', '-C 2yc'),
+    (16, 'P 2 2 2', 'P 2 2'),
+    (17, 'P 2 2 21', 'P 2c 2'),
+    (18, 'P 21 21 2', 'P 2 2ab'),
+    (19, 'P 21 21 21', 'P 2ac 2ab'),
+    (20, 'C 2 2 21', 'C 2c 2'),
+    (21, 'C 2 2 2', 'C 2 2'),
+    (22, 'F 2 2 2', 'F 2 2'),
+    (23, 'I 2 2 2', 'I 2 2'),
+    (24, 'I 21 21 21', 'I 2b 2c'),
+    (25, 'P m m 2', 'P 2 -2'),
+    (26, 'P m c 21', 'P 2c -2'),
+    (27, 'P c c 2', 'P 2 -2c'),
+    (28, 'P m a 2', 'P 2 -2a'),
+    (29, 'P c a 21', 'P 2c -2ac'),
+    (30, 'P n c 2', 'P 2 -2bc'),
+    (31, 'P m n 21', 'P 2ac -2'),
+    (32, 'P b a 2', 'P 2 -2ab'),
+    (33, 'P n a 21', 'P 2c -2n'),
+    (34, 'P n n 2', 'P 2 -2n'),
+    (35, 'C m m 2', 'C 2 -2'),
+    (36, 'C m c 21', 'C 2c -2'),
+    (37, 'C c c 2', 'C 2 -2c'),
+    (38, 'A m m 2', 'A 2 -2'),
+    (39, 'A e m 2', 'A 2 -2c'),
+    (40, 'A m a 2', 'A 2 -2a'),
+    (41, 'A e a 2', 'A 2 -2ac'),
+    (42, 'F m m 2', 'F 2 -2'),
+    (43, 'F d d 2', 'F 2 -2d'),
+    (44, 'I m m 2', 'I 2 -2'),
+    (45, 'I b a 2', 'I 2 -2c'),
+    (46, 'I m a 2', 'I 2 -2a'),
+    (47, 'P m m m', '-P 2 2'),
+    (48, 'P n n n', '-P 2ab 2bc'),
+    (49, 'P c c m', '-P 2 2c'),
+    (50, 'P b a n', '-P 2ab 2b'),
+    (51, 'P m m a', '-P 2a 2a'),
+    (52, 'P n n a', '-P 2a 2bc'),
+    (53, 'P m n a', '-P 2ac 2'),
+    (54, 'P c c a', '-P 2a 2ac'),
+    (55, 'P b a m', '-P 2 2ab'),
+    (56, 'P c c n', '-P 2ab 2ac'),
+    (57, 'P b c m', '-P 2c 2b'),
+    (58, 'P n n m', '-P 2 2n'),
+    (59, 'P m m n', '-P 2ab 2a'),
+    (60, 'P b c n', '-P 2n 2ab'),
+    (61, 'P b c a', '-P 2ac 2ab'),
+    (62, 'P n m a', '-P 2ac 2n'),
+    (63, 'C m c m', '-C 2c 2'),
+    (64, 'C m c e', '-C 2bc 2'),
+    (65, 'C m m m', '-C 2 2'),
+    (66, 'C c c m', '-C 2 2c'),
+    (67, 'C m m e', '-C 2b 2'),
+    (68, 'C c c e', '-C 2b 2bc'),
+    (69, 'F m m m', '-F 2 2'),
+    (70, 'F d d d', '-F 2uv 2vw'),
+    (71, 'I m m m', '-I 2 2'),
+    (72, 'I b a m', '-I 2 2c'),
+    (73, 'I b c a', '-I 2b 2c'),
+    (74, 'I m m a', '-I 2b 2'),
+    (75, 'P 4', 'P 4'),
+    (76, 'P 41', 'P 4w'),
+    (77, 'P 42', 'P 4c'),
+    (78, 'P 43', 'P 4cw'),
+    (79, 'I 4', 'I 4'),
+    (80, 'I 41', 'I 4bw'),
+    (81, 'P -4', 'P -4'),
+    (82, 'I -4', 'I -4'),
+    (83, 'P 4/m', '-P 4'),
+    (84, 'P 42/m', '-P 4c'),
+    (85, 'P 4/n', '-P 4a'),
+    (86, 'P 42/n', '-P 4bc'),
+    (87, 'I 4/m', '-I 4'),
+    (88, 'I 41/a', '-I 4ad'),
+    (89, 'P 4 2 2', 'P 4 2'),
+    (90, 'P 4 21 2', 'P 4ab 2ab'),
+    (91, 'P 41 2 2', 'P 4w 2c'),
+    (92, 'P 41 21 2', 'P 4abw 2nw'),
+    (93, 'P 42 2 2', 'P 4c 2'),
+    (94, 'P 42 21 2', 'P 4n 2n'),
+    (95, 'P 43 2 2', 'P 4cw 2c'),
+    (96, 'P 43 21 2', 'P 4nw 2abw'),
+    (97, 'I 4 2 2', 'I 4 2'),
+    (98, 'I 41 2 2', 'I 4bw 2bw'),
+    (99, 'P 4 m m', 'P 4 -2'),
+    (100, 'P 4 b m', 'P 4 -2ab'),
+    (101, 'P 42 c m', 'P 4c -2c'),
+    (102, 'P 42 n m', 'P 4n -2n'),
+    (103, 'P 4 c c', 'P 4 -2c'),
+    (104, 'P 4 n c', 'P 4 -2n'),
+    (105, 'P 42 m c', 'P 4c -2'),
+    (106, 'P 42 b c', 'P 4c -2ab'),
+    (107, 'I 4 m m', 'I 4 -2'),
+    (108, 'I 4 c m', 'I 4 -2c'),
+    (109, 'I 41 m d', 'I 4bw -2'),
+    (110, 'I 41 c d', 'I 4bw -2c'),
+    (111, 'P -4 2 m', 'P -4 2'),
+    (112, 'P -4 2 c', 'P -4 2c'),
+    (113, 'P -4 21 m', 'P -4 2ab'),
+    (114, 'P -4 21 c', 'P -4 2n'),
+    (115, 'P -4 m 2', 'P -4 -2'),
+    (116, 'P -4 c 2', 'P -4 -2c'),
+    (117, 'P -4 b 2', 'P -4 -2ab'),
+    (118, 'P -4 n 2', 'P -4 -2n'),
+    (119, 'I -4 m 2', 'I -4 -2'),
+    (120, 'I -4 c 2', 'I -4 -2c'),
+    (121, 'I -4 2 m', 'I -4 2'),
+    (122, 'I -4 2 d', 'I -4 2bw'),
+    (123, 'P 4/m m m', '-P 4 2'),
+    (124, 'P 4/m c c', '-P 4 2c'),
+    (125, 'P 4/n b m', '-P 4a 2b'),
+    (126, 'P 4/n n c', '-P 4a 2bc'),
+    (127, 'P 4/m b m', '-P 4 2ab'),
+    (128, 'P 4/m n c', '-P 4 2n'),
+    (129, 'P 4/n m m', '-P 4a 2a'),
+    (130, 'P 4/n c c', '-P 4a 2ac'),
+    (131, 'P 42/m m c', '-P 4c 2'),
+    (132, 'P 42/m c m', '-P 4c 2c'),
+    (133, 'P 42/n b c', '-P 4ac 2b'),
+    (134, 'P 42/n n m', '-P 4ac 2bc'),
+    (135, 'P 42/m b c', '-P 4c 2ab'),
+    (136, 'P 42/m n m', '-P 4n 2n'),
+    (137, 'P 42/n m c', '-P 4ac 2a'),
+    (138, 'P 42/n c m', '-P 4ac 2ac'),
+    (139, 'I 4/m m m', '-I 4 2'),
+    (140, 'I 4/m c m', '-I 4 2c'),
+    (141, 'I 41/a m d', '-I 4bd 2'),
+    (142, 'I 41/a c d', '-I 4bd 2c'),
+    (143, 'P 3', 'P 3'),
+    (144, 'P 31', 'P 31'),
+    (145, 'P 32', 'P 32'),
+    (146, 'R 3', 'R 3'),
+    (147, 'P -3', '-P 3'),
+    (148, 'R -3', '-R 3'),
+    (149, 'P 3 1 2', 'P 3 2'),
+    (150, 'P 3 2 1', 'P 3 2"'),
+    (151, 'P 31 1 2', 'P 31 2c (0 0 1)'),
+    (152, 'P 31 2 1', 'P 31 2"'),
+    (153, 'P 32 1 2', 'P 32 2c (0 0 -1)'),
+    (154, 'P 32 2 1', 'P 32 2"'),
+    (155, 'R 3 2', 'R 3 2"'),
+    (156, 'P 3 m 1', 'P 3 -2"'),
+    (157, 'P 3 1 m', 'P 3 -2'),
+    (158, 'P 3 c 1', 'P 3 -2"c'),
+    (159, 'P 3 1 c', 'P 3 -2c'),
+    (160, 'R 3 m', 'R 3 -2"'),
+    (161, 'R 3 c', 'R 3 -2"c'),
+    (162, 'P -3 1 m', '-P 3 2'),
+    (163, 'P -3 1 c', '-P 3 2c'),
+    (164, 'P -3 m 1', '-P 3 2"'),
+    (165, 'P -3 c 1', '-P 3 2"c'),
+    (166, 'R -3 m', '-R 3 2"'),
+    (167, 'R -3 c', '-R 3 2"c'),
+    (168, 'P 6', 'P 6'),
+    (169, 'P 61', 'P 61'),
+    (170, 'P 65', 'P 65'),
+    (171, 'P 62', 'P 62'),
+    (172, 'P 64', 'P 64'),
+    (173, 'P 63', 'P 6c'),
+    (174, 'P -6', 'P -6'),
+    (175, 'P 6/m', '-P 6'),
+    (176, 'P 63/m', '-P 6c'),
+    (177, 'P 6 2 2', 'P 6 2'),
+    (178, 'P 61 2 2', 'P 61 2 (0 0 -1)'),
+    (179, 'P 65 2 2', 'P 65 2 (0 0 1)'),
+    (180, 'P 62 2 2', 'P 62 2c (0 0 1)'),
+    (181, 'P 64 2 2', 'P 64 2c (0 0 -1)'),
+    (182, 'P 63 2 2', 'P 6c 2c'),
+    (183, 'P 6 m m', 'P 6 -2'),
+    (184, 'P 6 c c', 'P 6 -2c'),
+    (185, 'P 63 c m', 'P 6c -2'),
+    (186, 'P 63 m c', 'P 6c -2c'),
+    (187, 'P -6 m 2', 'P -6 2'),
+    (188, 'P -6 c 2', 'P -6c 2'),
+    (189, 'P -6 2 m', 'P -6 -2'),
+    (190, 'P -6 2 c', 'P -6c -2c'),
+    (191, 'P 6/m m m', '-P 6 2'),
+    (192, 'P 6/m c c', '-P 6 2c'),
+    (193, 'P 63/m c m', '-P 6c 2'),
+    (194, 'P 63/m m c', '-P 6c 2c'),
+    (195, 'P 2 3', 'P 2 2 3'),
+    (196, 'F 2 3', 'F 2 2 3'),
+    (197, 'I 2 3', 'I 2 2 3'),
+    (198, 'P 21 3', 'P 2ac 2ab 3'),
+    (199, 'I 21 3', 'I 2b 2c 3'),
+    (200, 'P m -3', '-P 2 2 3'),
+    (201, 'P n -3', '-P 2ab 2bc 3'),
+    (202, 'F m -3', '-F 2 2 3'),
+    (203, 'F d -3', '-F 2uv 2vw 3'),
+    (204, 'I m -3', '-I 2 2 3'),
+    (205, 'P a -3', '-P 2ac 2ab 3'),
+    (206, 'I a -3', '-I 2b 2c 3'),
+    (207, 'P 4 3 2', 'P 4 2 3'),
+    (208, 'P 42 3 2', 'P 4n 2 3'),
+    (209, 'F 4 3 2', 'F 4 2 3'),
+    (210, 'F 41 3 2', 'F 4d 2 3'),
+    (211, 'I 4 3 2', 'I 4 2 3'),
+    (212, 'P 43 3 2', 'P 4acd 2ab 3'),
+    (213, 'P 41 3 2', 'P 4bd 2ab 3'),
+    (214, 'I 41 3 2', 'I 4bd 2c 3'),
+    (215, 'P -4 3 m', 'P -4 2 3'),
+    (216, 'F -4 3 m', 'F -4 2 3'),
+    (217, 'I -4 3 m', 'I -4 2 3'),
+    (218, 'P -4 3 n', 'P -4n 2 3'),
+    (219, 'F -4 3 c', 'F -4c 2 3'),
+    (220, 'I -4 3 d', 'I -4bd 2c 3'),
+    (221, 'P m -3 m', '-P 4 2 3'),
+    (222, 'P n -3 n', '-P 4a 2bc 3'),
+    (223, 'P m -3 n', '-P 4n 2 3'),
+    (224, 'P n -3 m', '-P 4bc 2bc 3'),
+    (225, 'F m -3 m', '-F 4 2 3'),
+    (226, 'F m -3 c', '-F 4c 2 3'),
+    (227, 'F d -3 m', '-F 4vw 2vw 3'),
+    (228, 'F d -3 c', '-F 4cvw 2vw 3'),
+    (229, 'I m -3 m', '-I 4 2 3'),
+    (230, 'I a -3 d', '-I 4bd 2c 3'),
+]
+
+# Hall symbols of origin choice 1 for the groups listed above with origin choice 2
+ORIGIN_CHOICE_1 = {
+    48: 'P 2 2 -1n',
+    50: 'P 2 2 -1ab',
+    59: 'P 2 2ab -1ab',
+    68: 'C 2 2 -1bc',
+    70: 'F 2 2 -1d',
+    85: 'P 4ab -1ab',
+    86: 'P 4n -1n',
+    88: 'I 4bw -1bw',
+    125: 'P 4 2 -1ab',
+    126: 'P 4 2 -1n',
+    129: 'P 4ab 2ab -1ab',
+    130: 'P 4ab 2n -1ab',
+    133: 'P 4n 2c -1n',
+    134: 'P 4n 2 -1n',
+    137: 'P 4n 2n -1n',
+    138: 'P 4n 2ab -1n',
+    141: 'I 4bw 2bw -1bw',
+    142: 'I 4bw 2aw -1bw',
+    201: 'P 2 2 3 -1n',
+    203: 'F 2 2 3 -1d',
+    222: 'P 4 2 3 -1n',
+    224: 'P 4n 2 3 -1n',
+    227: 'F 4d 2 3 -1d',
+    228: 'F 4d 2 3 -1cd',
+}
+
+# Non-standard settings (unique axes, cell choices and axes permutations), origin choices of
+# the permuted settings and rhombohedral groups in hexagonal (:H) and rhombohedral (:R) axes
+# as (number, H-M symbol, Hall symbol)
+SETTINGS = [
+    (3, 'P 1 1 2', 'P 2'),
+    (3, 'P 2 1 1', 'P 2x'),
+    (4, 'P 1 1 21', 'P 2c'),
+    (4, 'P 21 1 1', 'P 2xa'),
+    (5, 'A 1 2 1', 'A 2y'),
+    (5, 'I 1 2 1', 'I 2y'),
+    (5, 'A 1 1 2', 'A 2'),
+    (5, 'B 1 1 2', 'B 2'),
+    (5, 'B 2', 'B 2'),
+    (5, 'I 1 1 2', 'I 2'),
+    (5, 'B 2 1 1', 'B 2x'),
+    (5, 'C 2 1 1', 'C 2x'),
+    (5, 'I 2 1 1', 'I 2x'),
+    (6, 'P 1 1 m', 'P -2'),
+    (6, 'P m 1 1', 'P -2x'),
+    (7, 'P 1 n 1', 'P -2yac'),
+    (7, 'P 1 a 1', 'P -2ya'),
+    (7, 'P 1 1 a', 'P -2a'),
+    (7, 'P 1 1 n', 'P -2ab'),
+    (7, 'P 1 1 b', 'P -2b'),
+    (7, 'P b', 'P -2b'),
+    (7, 'P b 1 1', 'P -2xb'),
+    (7, 'P n 1 1', 'P -2xbc'),
+    (7, 'P c 1 1', 'P -2xc'),
+    (8, 'A 1 m 1', 'A -2y'),
+    (8, 'I 1 m 1', 'I -2y'),
+    (8, 'A 1 1 m', 'A -2'),
+    (8, 'B 1 1 m', 'B -2'),
+    (8, 'B m', 'B -2'),
+    (8, 'I 1 1 m', 'I -2'),
+    (8, 'B m 1 1', 'B -2x'),
+    (8, 'C m 1 1', 'C -2x'),
+    (8, 'I m 1 1', 'I -2x'),
+    (9, 'A 1 n 1', 'A -2yab'),
+    (9, 'I 1 a 1', 'I -2ya'),
+    (9, 'A 1 a 1', 'A -2ya'),
+    (9, 'C 1 n 1', 'C -2yac'),
+    (9, 'I 1 c 1', 'I -2yc'),
+    (9, 'A 1 1 a', 'A -2a'),
+    (9, 'B 1 1 n', 'B -2ab'),
+    (9, 'I 1 1 b', 'I -2b'),
+    (9, 'B 1 1 b', 'B -2b'),
+    (9, 'B b', 'B -2b'),
+    (9, 'A 1 1 n', 'A -2ab'),
+    (9, 'I 1 1 a', 'I -2a'),
+    (9, 'B b 1 1', 'B -2xb'),
+    (9, 'C n 1 1', 'C -2xac'),
+    (9, 'I c 1 1', 'I -2xc'),
+    (9, 'C c 1 1', 'C -2xc'),
+    (9, 'B n 1 1', 'B -2xab'),
+    (9, 'I b 1 1', 'I -2xb'),
+    (10, 'P 1 1 2/m', '-P 2'),
+    (10, 'P 2/m 1 1', '-P 2x'),
+    (11, 'P 1 1 21/m', '-P 2c'),
+    (11, 'P 21/m 1 1', '-P 2xa'),
+    (12, 'A 1 2/m 1', '-A 2y'),
+    (12, 'I 1 2/m 1', '-I 2y'),
+    (12, 'A 1 1 2/m', '-A 2'),
+    (12, 'B 1 1 2/m', '-B 2'),
+    (12, 'B 2/m', '-B 2'),
+    (12, 'I 1 1 2/m', '-I 2'),
+    (12, 'B 2/m 1 1', '-B 2x'),
+    (12, 'C 2/m 1 1', '-C 2x'),
+    (12, 'I 2/m 1 1', '-I 2x'),
+    (13, 'P 1 2/n 1', '-P 2yac'),
+    (13, 'P 1 2/a 1', '-P 2ya'),
+    (13, 'P 1 1 2/a', '-P 2a'),
+    (13, 'P 1 1 2/n', '-P 2ab'),
+    (13, 'P 1 1 2/b', '-P 2b'),
+    (13, 'P 2/b', '-P 2b'),
+    (13, 'P 2/b 1 1', '-P 2xb'),
+    (13, 'P 2/n 1 1', '-P 2xbc'),
+    (13, 'P 2/c 1 1', '-P 2xc'),
+    (14, 'P 1 21/n 1', '-P 2yn'),
+    (14, 'P 1 21/a 1', '-P 2yab'),
+    (14, 'P 1 1 21/a', '-P 2ac'),
+    (14, 'P 1 1 21/n', '-P 2n'),
+    (14, 'P 1 1 21/b', '-P 2bc'),
+    (14, 'P 21/b', '-P 2bc'),
+    (14, 'P 21/b 1 1', '-P 2xab'),
+    (14, 'P 21/n 1 1', '-P 2xn'),
+    (14, 'P 21/c 1 1', '-P 2xac'),
+    (15, 'A 1 2/n 1', '-A 2yab'),
+    (15, 'I 1 2/a 1', '-I 2ya'),
+    (15, 'A 1 2/a 1', '-A 2ya'),
+    (15, 'C 1 2/n 1', '-C 2yac'),
+    (15, 'I 1 2/c 1', '-I 2yc'),
+    (15, 'A 1 1 2/a', '-A 2a'),
+    (15, 'B 1 1 2/n', '-B 2ab'),
+    (15, 'I 1 1 2/b', '-I 2b'),
+    (15, 'B 1 1 2/b', '-B 2b'),
+    (15, 'B 2/b', '-B 2b'),
+    (15, 'A 1 1 2/n', '-A 2ab'),
+    (15, 'I 1 1 2/a', '-I 2a'),
+    (15, 'B 2/b 1 1', '-B 2xb'),
+    (15, 'C 2/n 1 1', '-C 2xac'),
+    (15, 'I 2/c 1 1', '-I 2xc'),
+    (15, 'C 2/c 1 1', '-C 2xc'),
+    (15, 'B 2/n 1 1', '-B 2xab'),
+    (15, 'I 2/b 1 1', '-I 2xb'),
+    (17, 'P 21 2 2', 'P 2a 2a'),
+    (17, 'P 2 21 2', 'P 2 2b'),
+    (18, 'P 2 21 21', 'P 2bc 2'),
+    (18, 'P 21 2 21', 'P 2ac 2ac'),
+    (20, 'A 21 2 2', 'A 2a 2a'),
+    (20, 'B 2 21 2', 'B 2 2b'),
+    (21, 'A 2 2 2', 'A 2 2'),
+    (21, 'B 2 2 2', 'B 2 2'),
+    (25, 'P 2 m m', 'P -2 2'),
+    (25, 'P m 2 m', 'P -2 -2'),
+    (26, 'P c m 21', 'P 2c -2c'),
+    (26, 'P 21 m a', 'P -2a 2a'),
+    (26, 'P 21 a m', 'P -2 2a'),
+    (26, 'P b 21 m', 'P -2 -2b'),
+    (26, 'P m 21 b', 'P -2b -2'),
+    (27, 'P 2 a a', 'P -2a 2'),
+    (27, 'P b 2 b', 'P -2b -2b'),
+    (28, 'P b m 2', 'P 2 -2b'),
+    (28, 'P 2 m b', 'P -2b 2'),
+    (28, 'P 2 c m', 'P -2c 2'),
+    (28, 'P c 2 m', 'P -2c -2c'),
+    (28, 'P m 2 a', 'P -2a -2a'),
+    (29, 'P b c 21', 'P 2c -2b'),
+    (29, 'P 21 a b', 'P -2b 2a'),
+    (29, 'P 21 c a', 'P -2ac 2a'),
+    (29, 'P c 21 b', 'P -2bc -2c'),
+    (29, 'P b 21 a', 'P -2a -2ab'),
+    (30, 'P c n 2', 'P 2 -2ac'),
+    (30, 'P 2 n a', 'P -2ac 2'),
+    (30, 'P 2 a n', 'P -2ab 2'),
+    (30, 'P b 2 n', 'P -2ab -2ab'),
+    (30, 'P n 2 b', 'P -2bc -2bc'),
+    (31, 'P n m 21', 'P 2bc -2bc'),
+    (31, 'P 21 m n', 'P -2ab 2ab'),
+    (31, 'P 21 n m', 'P -2 2ac'),
+    (31, 'P n 21 m', 'P -2 -2bc'),
+    (31, 'P m 21 n', 'P -2ab -2'),
+    (32, 'P 2 c b', 'P -2bc 2'),
+    (32, 'P c 2 a', 'P -2ac -2ac'),
+    (33, 'P b n 21', 'P 2c -2ab'),
+    (33, 'P 21 n b', 'P -2bc 2a'),
+    (33, 'P 21 c n', 'P -2n 2a'),
+    (33, 'P c 21 n', 'P -2n -2ac'),
+    (33, 'P n 21 a', 'P -2ac -2n'),
+    (34, 'P 2 n n', 'P -2n 2'),
+    (34, 'P n 2 n', 'P -2n -2n'),
+    (35, 'A 2 m m', 'A -2 2'),
+    (35, 'B m 2 m', 'B -2 -2'),
+    (36, 'C c m 21', 'C 2c -2c'),
+    (36, 'A 21 m a', 'A -2a 2a'),
+    (36, 'A 21 a m', 'A -2 2a'),
+    (36, 'B b 21 m', 'B -2 -2b'),
+    (36, 'B m 21 b', 'B -2b -2'),
+    (37, 'A 2 a a', 'A -2a 2'),
+    (37, 'B b 2 b', 'B -2b -2b'),
+    (38, 'B m m 2', 'B 2 -2'),
+    (38, 'B 2 m m', 'B -2 2'),
+    (38, 'C 2 m m', 'C -2 2'),
+    (38, 'C m 2 m', 'C -2 -2'),
+    (38, 'A m 2 m', 'A -2 -2'),
+    (39, 'B m e 2', 'B 2 -2a'),
+    (39, 'B 2 e m', 'B -2a 2'),
+    (39, 'C 2 m e', 'C -2a 2'),
+    (39, 'C m 2 e', 'C -2a -2a'),
+    (39, 'A e 2 m', 'A -2b -2b'),
+    (40, 'B b m 2', 'B 2 -2b'),
+    (40, 'B 2 m b', 'B -2b 2'),
+    (40, 'C 2 c m', 'C -2c 2'),
+    (40, 'C c 2 m', 'C -2c -2c'),
+    (40, 'A m 2 a', 'A -2a -2a'),
+    (41, 'B b e 2', 'B 2 -2ab'),
+    (41, 'B 2 e b', 'B -2ab 2'),
+    (41, 'C 2 c e', 'C -2ac 2'),
+    (41, 'C c 2 e', 'C -2ac -2ac'),
+    (41, 'A e 2 a', 'A -2ab -2ab'),
+    (42, 'F 2 m m', 'F -2 2'),
+    (42, 'F m 2 m', 'F -2 -2'),
+    (43, 'F 2 d d', 'F -2d 2'),
+    (43, 'F d 2 d', 'F -2d -2d'),
+    (44, 'I 2 m m', 'I -2 2'),
+    (44, 'I m 2 m', 'I -2 -2'),
+    (45, 'I 2 c b', 'I -2a 2'),
+    (45, 'I c 2 a', 'I -2b -2b'),
+    (46, 'I b m 2', 'I 2 -2b'),
+    (46, 'I 2 m b', 'I -2b 2'),
+    (46, 'I 2 c m', 'I -2c 2'),
+    (46, 'I c 2 m', 'I -2c -2c'),
+    (46, 'I m 2 a', 'I -2a -2a'),
+    (49, 'P m a a', '-P 2a 2'),
+    (49, 'P b m b', '-P 2b 2b'),
+    (50, 'P n c b:1', 'P 2 2 -1bc'),
+    (50, 'P n c b:2', '-P 2b 2bc'),
+    (50, 'P n c b', '-P 2b 2bc'),
+    (50, 'P c n a:1', 'P 2 2 -1ac'),
+    (50, 'P c n a:2', '-P 2a 2c'),
+    (50, 'P c n a', '-P 2a 2c'),
+    (51, 'P m m b', '-P 2b 2'),
+    (51, 'P b m m', '-P 2 2b'),
+    (51, 'P c m m', '-P 2c 2c'),
+    (51, 'P m c m', '-P 2c 2'),
+    (51, 'P m a m', '-P 2 2a'),
+    (52, 'P n n b', '-P 2b 2n'),
+    (52, 'P b n n', '-P 2n 2b'),
+    (52, 'P c n n', '-P 2ab 2c'),
+    (52, 'P n c n', '-P 2ab 2n'),
+    (52, 'P n a n', '-P 2n 2bc'),
+    (53, 'P n m b', '-P 2bc 2bc'),
+    (53, 'P b m n', '-P 2ab 2ab'),
+    (53, 'P c n m', '-P 2 2ac'),
+    (53, 'P n c m', '-P 2 2bc'),
+    (53, 'P m a n', '-P 2ab 2'),
+    (54, 'P c c b', '-P 2b 2c'),
+    (54, 'P b a a', '-P 2a 2b'),
+    (54, 'P c a a', '-P 2ac 2c'),
+    (54, 'P b c b', '-P 2bc 2b'),
+    (54, 'P b a b', '-P 2b 2ab'),
+    (55, 'P m c b', '-P 2bc 2'),
+    (55, 'P c m a', '-P 2ac 2ac'),
+    (56, 'P n a a', '-P 2ac 2bc'),
+    (56, 'P b n b', '-P 2bc 2ab'),
+    (57, 'P c a m', '-P 2c 2ac'),
+    (57, 'P m c a', '-P 2ac 2a'),
+    (57, 'P m a b', '-P 2b 2a'),
+    (57, 'P b m a', '-P 2a 2ab'),
+    (57, 'P c m b', '-P 2bc 2c'),
+    (58, 'P m n n', '-P 2n 2'),
+    (58, 'P n m n', '-P 2n 2n'),
+    (59, 'P n m m:1', 'P 2bc 2 -1bc'),
+    (59, 'P n m m:2', '-P 2c 2bc'),
+    (59, 'P n m m', '-P 2c 2bc'),
+    (59, 'P m n m:1', 'P 2ac 2ac -1ac'),
+    (59, 'P m n m:2', '-P 2c 2a'),
+    (59, 'P m n m', '-P 2c 2a'),
+    (60, 'P c a n', '-P 2n 2c'),
+    (60, 'P n c a', '-P 2a 2n'),
+    (60, 'P n a b', '-P 2bc 2n'),
+    (60, 'P b n a', '-P 2ac 2b'),
+    (60, 'P c n b', '-P 2b 2ac'),
+    (61, 'P c a b', '-P 2bc 2ac'),
+    (62, 'P m n b', '-P 2bc 2a'),
+    (62, 'P b n m', '-P 2c 2ab'),
+    (62, 'P c m n', '-P 2n 2ac'),
+    (62, 'P m c n', '-P 2n 2a'),
+    (62, 'P n a m', '-P 2c 2n'),
+    (63, 'C c m m', '-C 2c 2c'),
+    (63, 'A m m a', '-A 2a 2a'),
+    (63, 'A m a m', '-A 2 2a'),
+    (63, 'B b m m', '-B 2 2b'),
+    (63, 'B m m b', '-B 2b 2'),
+    (64, 'C c m e', '-C 2ac 2ac'),
+    (64, 'A e m a', '-A 2ab 2ab'),
+    (64, 'A e a m', '-A 2 2ab'),
+    (64, 'B b e m', '-B 2 2ab'),
+    (64, 'B m e b', '-B 2ab 2'),
+    (65, 'A m m m', '-A 2 2'),
+    (65, 'B m m m', '-B 2 2'),
+    (66, 'A m a a', '-A 2a 2'),
+    (66, 'B b m b', '-B 2b 2b'),
+    (67, 'A e m m', '-A 2b 2b'),
+    (67, 'B m e m', '-B 2 2a'),
+    (68, 'A e a a:1', 'A 2 2 -1ab'),
+    (68, 'A e a a:2', '-A 2a 2b'),
+    (68, 'A e a a', '-A 2a 2b'),
+    (68, 'B b e b:1', 'B 2 2 -1ab'),
+    (68, 'B b e b:2', '-B 2b 2ab'),
+    (68, 'B b e b', '-B 2b 2ab'),
+    (72, 'I m c b', '-I 2a 2'),
+    (72, 'I c m a', '-I 2b 2b'),
+    (73, 'I c a b', '-I 2a 2b'),
+    (74, 'I m m b', '-I 2a 2a'),
+    (74, 'I b m m', '-I 2c 2c'),
+    (74, 'I c m m', '-I 2 2b'),
+    (74, 'I m c m', '-I 2 2a'),
+    (74, 'I m a m', '-I 2c 2'),
+    (146, 'R 3:H', 'R 3'),
+    (146, 'R 3:R', 'P 3*'),
+    (148, 'R -3:H', '-R 3'),
+    (148, 'R -3:R', '-P 3*'),
+    (155, 'R 3 2:H', 'R 3 2"'),
+    (155, 'R 3 2:R', 'P 3* 2'),
+    (160, 'R 3 m:H', 'R 3 -2"'),
+    (160, 'R 3 m:R', 'P 3* -2'),
+    (161, 'R 3 c:H', 'R 3 -2"c'),
+    (161, 'R 3 c:R', 'P 3* -2n'),
+    (166, 'R -3 m:H', '-R 3 2"'),
+    (166, 'R -3 m:R', '-P 3* 2'),
+    (167, 'R -3 c:H', '-R 3 2"c'),
+    (167, 'R -3 c:R', '-P 3* 2n')
+]
+
+# Symbols of the groups with an e glide plane used before ITA 2002, by their current symbol
+OBSOLETE_SYMBOLS = {
+    'A b m 2': 'A e m 2', 'B m a 2': 'B m e 2', 'B 2 c m': 'B 2 e m', 'C 2 m b': 'C 2 m e',
+    'C m 2 a': 'C m 2 e', 'A c 2 m': 'A e 2 m',
+    'A b a 2': 'A e a 2', 'B b a 2': 'B b e 2', 'B 2 c b': 'B 2 e b', 'C 2 c b': 'C 2 c e',
+    'C c 2 a': 'C c 2 e', 'A c 2 a': 'A e 2 a',
+    'C m c a': 'C m c e', 'C c m b': 'C c m e', 'A b m a': 'A e m a', 'A c a m': 'A e a m',
+    'B b c m': 'B b e m', 'B m a b': 'B m e b',
+    'C m m a': 'C m m e', 'C m m b': 'C m m e', 'A b m m': 'A e m m', 'A c m m': 'A e m m',
+    'B m c m': 'B m e m', 'B m a m': 'B m e m',
+    'C c c a': 'C c c e', 'C c c b': 'C c c e', 'A b a a': 'A e a a', 'A c a a': 'A e a a',
+    'B b c b': 'B b e b', 'B b a b': 'B b e b'
+}
+
+# Lattice centring translations in units of 1/12
+_CENTRING = {
+    'P': [],
+    'A': [(0, 6, 6)],
+    'B': [(6, 0, 6)],
+    'C': [(6, 6, 0)],
+    'I': [(6, 6, 6)],
+    'R': [(8, 4, 4), (4, 8, 8)],
+    'S': [(4, 4, 8), (8, 8, 4)],
+    'T': [(4, 8, 4), (8, 4, 8)],
+    'F': [(0, 6, 6), (6, 0, 6), (6, 6, 0)]
+}
+
+# Translation symbols of the Hall notation in units of 1/12
+_TRANSLATIONS = {
+    'a': (6, 0, 0),
+    'b': (0, 6, 0),
+    'c': (0, 0, 6),
+    'n': (6, 6, 6),
+    'u': (3, 0, 0),
+    'v': (0, 3, 0),
+    'w': (0, 0, 3),
+    'd': (3, 3, 3)
+}
+
+# Proper rotations along the principal axes
+_ROTATIONS = {
+    'x': {1: [[1, 0, 0], [0, 1, 0], [0, 0, 1]],
+          2: [[1, 0, 0], [0, -1, 0], [0, 0, -1]],
+          3: [[1, 0, 0], [0, 0, -1], [0, 1, -1]],
+          4: [[1, 0, 0], [0, 0, -1], [0, 1, 0]],
+          6: [[1, 0, 0], [0, 1, -1], [0, 1, 0]]},
+    'y': {1: [[1, 0, 0], [0, 1, 0], [0, 0, 1]],
+          2: [[-1, 0, 0], [0, 1, 0], [0, 0, -1]],
+          3: [[-1, 0, 1], [0, 1, 0], [-1, 0, 0]],
+          4: [[0, 0, 1], [0, 1, 0], [-1, 0, 0]],
+          6: [[0, 0, 1], [0, 1, 0], [-1, 0, 1]]},
+    'z': {1: [[1, 0, 0], [0, 1, 0], [0, 0, 1]],
+          2: [[-1, 0, 0], [0, -1, 0], [0, 0, 1]],
+          3: [[0, -1, 0], [1, -1, 0], [0, 0, 1]],
+          4: [[0, -1, 0], [1, 0, 0], [0, 0, 1]],
+          6: [[1, -1, 0], [1, 0, 0], [0, 0, 1]]}
+}
+
+# Two-fold rotations along face diagonals (' and ") relative to the preceding axis
+_DIAGONAL_ROTATIONS = {
+    'x': {"'": [[-1, 0, 0], [0, 0, -1], [0, -1, 0]],
+          '"': [[-1, 0, 0], [0, 0, 1], [0, 1, 0]]},
+    'y': {"'": [[0, 0, -1], [0, -1, 0], [-1, 0, 0]],
+          '"': [[0, 0, 1], [0, -1, 0], [1, 0, 0]]},
+    'z': {"'": [[0, -1, 0], [-1, 0, 0], [0, 0, -1]],
+          '"': [[0, 1, 0], [1, 0, 0], [0, 0, -1]]}
+}
+
+# Three-fold rotation along the body diagonal (*)
+_BODY_DIAGONAL_ROTATION = [[0, 0, 1], [1, 0, 0], [0, 1, 0]]
+
+_AXIS_INDEX = {'x': 0, 'y': 1, 'z': 2}
+
+_MONOCLINIC_NUMBERS = range(3, 16)
+
+_CRYSTAL_SYSTEMS = {
+    '-1': 'triclinic',
+    '2/m': 'monoclinic',
+    'mmm': 'orthorhombic',
+    '4/m': 'tetragonal',
+    '4/mmm': 'tetragonal',
+    '-3': 'trigonal',
+    '-3m': 'trigonal',
+    '-3m1': 'trigonal',
+    '-31m': 'trigonal',
+    '6/m': 'hexagonal',
+    '6/mmm': 'hexagonal',
+    'm-3': 'cubic',
+    'm-3m': 'cubic'
+}
+
+# Maximum number of space groups kept by the space_group() cache
+SPACE_GROUP_CACHE_SIZE = 64
+
+# Signed terms of a component of a symmetry operator in the xyz notation, e.g. '-x', '+1/2' or '2*y'
+_XYZ_TERM_REGEX = re.compile(r'([+-]?)([^+-]+)')
+
+
+def _normalized_symbol(symbol: str):
+    """Returns the symbol with single spaces and without the '_' of screw axes, e.g. 'P 21/c'
+    for 'P 2_1/c'."""
+    return ' '.join(symbol.replace('_', '').split())
+
+def _compact_symbol(symbol: str):
+    return ''.join(symbol.split())
+
+def _hall_symbols_by_hm():
+    symbols = {}
+    for number, hm, hall in SPACE_GROUPS:
+        symbols[hm] = hall
+        if number in _MONOCLINIC_NUMBERS:  # full symbol, e.g. 'P 1 21/c 1'
+            lattice, rest = hm.split(' ', 1)
+            symbols[f'{lattice} 1 {rest} 1'] = hall
+        if number in ORIGIN_CHOICE_1:
+            symbols[f'{hm}:1'] = ORIGIN_CHOICE_1[number]
+            symbols[f'{hm}:2'] = hall
+    for number, hm, hall in SETTINGS:
+        symbols.setdefault(hm, hall)
+        fields = hm.split()
+        if number in _MONOCLINIC_NUMBERS and len(fields) == 4 and fields[1] == fields[3] == '1':
+            symbols.setdefault(f'{fields[0]} {fields[2]}', hall)  # short symbol of unique axis b, e.g. 'P 21/n'
+    for obsolete, hm in OBSOLETE_SYMBOLS.items():
+        symbols[obsolete] = symbols[hm]
+    return symbols
+
+_HALL_SYMBOLS_BY_HM = _hall_symbols_by_hm()
+
+_HALL_SYMBOLS_BY_COMPACT_HM = {_compact_symbol(hm): hall for hm, hall in _HALL_SYMBOLS_BY_HM.items()}
+
+_NUMBERS_AND_HM_BY_HALL = {hall: (number, hm) for number, hm, hall in SETTINGS[::-1] + SPACE_GROUPS}
+_NUMBERS_AND_HM_BY_HALL.update({hall: (number, f'{SPACE_GROUPS[number - 1][1]}:1') for number, hall in ORIGIN_CHOICE_1.items()})
+
+def hall_symbol(symbol: str):
+    """Returns the Hall symbol for the given H-M or Hall space group symbol. H-M symbols of the
+    standard and SETTINGS tables (':1', ':2', ':H' and ':R' for the origin choices and axes)
+    and OBSOLETE_SYMBOLS are matched as written, up to spacing, before the symbol is read as
+    a Hall symbol, so 'P 4 2' is P 4 2 2 and not P 42. Compact H-M symbols, e.g. 'Pnma', are
+    matched only when the symbol is not a valid Hall symbol."""
+    normalized = _normalized_symbol(symbol)
+    if normalized in _HALL_SYMBOLS_BY_HM:
+        return _HALL_SYMBOLS_BY_HM[normalized]
+    if normalized in _NUMBERS_AND_HM_BY_HALL:
+        return normalized
+    try:
+        _parsed_hall_symbol(normalized)
+    except ValueError:
+        compact = _compact_symbol(normalized)
+        if compact in _HALL_SYMBOLS_BY_COMPACT_HM:
+            return _HALL_SYMBOLS_BY_COMPACT_HM[compact]
+        raise ValueError(f"Unknown space group symbol '{symbol}'") from None
+    return normalized
+
+def _parsed_hall_symbol(hall: str):
+    """Parses a Hall symbol into lattice symbol, generators and origin shift."""
+    shift = np.zeros(3, dtype=int)
+    if '(' in hall:
+        hall, shift_str = hall.split('(')
+        shift = np.array([int(v) for v in shift_str.rstrip(')').split()])
+    tokens = hall.split()
+    if not tokens:
+        raise ValueError(f"Empty space group symbol")
+    lattice = tokens[0].lstrip('-')
+    centric = tokens[0].startswith('-')
+    if lattice not in _CENTRING:
+        raise ValueError(f"Unknown lattice symbol '{lattice}' in space group '{hall}'")
+    generators = []
+    previous_order = None
+    previous_axis = 'z'
+    for position, token in enumerate(tokens[1:]):
+        improper = token.startswith('-')
+        token = token.lstrip('-')
+        if not token or not token[0].isdigit() or int(token[0]) not in (1, 2, 3, 4, 6):
+            raise ValueError(f"Invalid matrix symbol '{token}' in space group '{hall}'")
+        order = int(token[0])
+        axis = None
+        screw = 0
+        translation = np.zeros(3, dtype=int)
+        for char in token[1:]:
+            if char in 'xyz\'"*':
+                axis = char
+            elif char.isdigit():
+                screw = int(char)
+            elif char in _TRANSLATIONS:
+                translation += _TRANSLATIONS[char]
+            else:
+                raise ValueError(f"Invalid matrix symbol '{token}' in space group '{hall}'")
+        if axis is None:  # default axes
+            if position == 0:
+                axis = 'z'
+            elif position == 1 and order == 2:
+                axis = 'x' if previous_order in (2, 4) else "'"
+            elif order == 3:
+                axis = '*'
+            else:
+                axis = 'z'
+        if axis in _AXIS_INDEX:
+            rotation = np.array(_ROTATIONS[axis][order])
+            if screw:
+                translation[_AXIS_INDEX[axis]] += 12 * screw // order
+            previous_axis = axis
+        elif axis == '*':
+            rotation = np.array(_BODY_DIAGONAL_ROTATION)
+        else:
+            rotation = np.array(_DIAGONAL_ROTATIONS[previous_axis][axis])
+        if improper:
+            rotation = -rotation
+        generators.append((rotation, translation))
+        previous_order = order
+    if centric:
+        generators.append((-np.eye(3, dtype=int), np.zeros(3, dtype=int)))
+    return lattice, generators, shift
+
+def _operators_from_hall(hall: str):
+    """Returns rotations and translations of all the symmetry operators of a Hall symbol."""
+    lattice, generators, shift = _parsed_hall_symbol(hall)
+    # apply the origin shift: (R, t) -> (R, t + V - R V)
+    generators = [(r, (t + shift - r @ shift) % 12) for r, t in generators]
+    centring = [np.zeros(3, dtype=int)] + [np.array(c) for c in _CENTRING[lattice]]
+    def canonical(r, t):  # translations are reduced modulo the centring vectors
+        return tuple(r.ravel()), min(tuple((t + c) % 12) for c in centring)
+    identity = canonical(np.eye(3, dtype=int), np.zeros(3, dtype=int))
+    operators = {identity}
+    queue = [identity]
+    while queue:
+        r1, t1 = queue.pop()
+        r1 = np.array(r1).reshape(3, 3)
+        for r2, t2 in generators:
+            key = canonical(r1 @ r2, r1 @ t2 + t1)
+            if key not in operators:
+                operators.add(key)
+                queue.append(key)
+                if len(operators) > 48:
+                    raise ValueError(f"Space group '{hall}' is not a valid group")
+    if len({r for r, _ in operators}) != len(operators):
+        raise ValueError(f"Space group '{hall}' is not a valid group")
+    rotations = []
+    translations = []
+    for r, t in sorted(operators, key=lambda op: (op != identity, op)):
+        for c in centring:
+            rotations.append(np.array(r).reshape(3, 3))
+            translations.append((np.array(t) + c) % 12)
+    rotations = np.array(rotations, dtype=int)
+    translations = np.array(translations, dtype=float) / 12
+    return rotations, translations
+
+def _laue_class(rotations: np.ndarray, centring: str):
+    """Returns the Laue class symbol of the point group of the rotations."""
+    proper = {tuple((r * np.rint(np.linalg.det(r))).astype(int).ravel()) for r in rotations}
+    proper = np.array(sorted(proper)).reshape(-1, 3, 3)
+    traces = np.trace(proper, axis1=1, axis2=2)
+    sixfold = (traces == 2).any()
+    order = 2 * len(proper)
+    if order == 8:
+        return '4/m' if (traces == 1).any() else 'mmm'
+    if order == 12:
+        if sixfold:
+            return '6/m'
+        if centring == 'R' or (proper == _BODY_DIAGONAL_ROTATION).all(axis=(1, 2)).any():  # rhombohedral axes
+            return '-3m'
+        twofold_along_a = ((traces == -1) & (proper[:, :, 0] == [1, 0, 0]).all(axis=1)).any()
+        return '-3m1' if twofold_along_a else '-31m'
+    if order == 24:
+        return '6/mmm' if sixfold else 'm-3'
+    return {2: '-1', 4: '2/m', 6: '-3', 16: '4/mmm', 48: 'm-3m'}[order]
+
+def _operator_from_xyz(xyz: str):
+    """Returns the rotation and translation of a symmetry operator in the xyz notation, e.g.
+    '-x+1/2, y, -z' or '1/2-X,Y,-Z'."""
+    components = xyz.lower().replace(' ', '').split(',')
+    if len(components) != 3:
+        raise ValueError(f"Invalid symmetry operator '{xyz}'")
+    rotation = np.zeros((3, 3), dtype=int)
+    translation = np.zeros(3)
+    for i, component in enumerate(components):
+        terms = _XYZ_TERM_REGEX.findall(component)
+        if not terms or ''.join(sign + term for sign, term in terms) != component:
+            raise ValueError(f"Invalid symmetry operator '{xyz}'")
+        for sign, term in terms:
+            factor = -1 if sign == '-' else 1
+            try:
+                if term[-1] in _AXIS_INDEX:
+                    coefficient = term[:-1].rstrip('*')
+                    rotation[i, _AXIS_INDEX[term[-1]]] += factor * (int(coefficient) if coefficient else 1)
+                else:
+                    translation[i] += factor * float(fractions.Fraction(term))
+            except (ValueError, ZeroDivisionError):
+                raise ValueError(f"Invalid symmetry operator '{xyz}'") from None
+    if round(abs(np.linalg.det(rotation))) != 1:
+        raise ValueError(f"Symmetry operator '{xyz}' is not a rotation")
+    return rotation, translation % 1
+
+def operators_from_xyz(operators: list):
+    """Returns rotations (n, 3, 3) and translations (n, 3), reduced to [0, 1), of symmetry
+    operators in the xyz notation of CIF symop loops, e.g. ['x,y,z', '-x+1/2,y,-z']."""
+    rotations, translations = zip(*map(_operator_from_xyz, operators)) if operators else ((), ())
+    return np.array(rotations, dtype=int).reshape(-1, 3, 3), np.array(translations, dtype=float).reshape(-1, 3)
+
+def _centring_from_operators(rotations: np.ndarray, translations: np.ndarray):
+    """Returns the lattice symbol of the pure translations of the operators."""
+    pure = np.rint(12 * translations[(rotations == np.eye(3, dtype=int)).all(axis=(1, 2))]).astype(int) % 12
+    vectors = {tuple(t) for t in pure}
+    for lattice, centring in _CENTRING.items():
+        if vectors == {(0, 0, 0), *centring}:
+            return lattice
+    raise ValueError(f"Unknown lattice centring {sorted(vectors)} of the symmetry operators")
+
+
+class SpaceGroup:
+    """Space group built from a Hall symbol: symmetry operators (including lattice
+    centring), centring, Laue class and crystal system. Instances are shared by the
+    space_group() cache, so their arrays are read-only. Operators generated before
+    from the same Hall symbol, e.g. read from the structure cache, can be given to
+    skip generating them again. The Hall symbol is None for the groups built by
+    space_group_from_operators() in settings that are not in the tables."""
+
+    def __init__(self, hall: str, rotations: np.ndarray = None, translations: np.ndarray = None):
+        self.hall = hall
+        self.number, self.hm = _NUMBERS_AND_HM_BY_HALL.get(hall, (None, None))
+        if rotations is None or translations is None:
+            rotations, translations = _operators_from_hall(hall)
+        self.rotations = np.array(rotations, dtype=int)
+        self.translations = np.array(translations, dtype=float)
+        if hall is None:
+            self.centring = _centring_from_operators(self.rotations, self.translations)
+        else:
+            self.centring = _parsed_hall_symbol(hall)[0]
+        self.centring_vectors = np.array([(0, 0, 0)] + _CENTRING[self.centring], dtype=float) / 12
+        self.centrosymmetric = bool((self.rotations == -np.eye(3, dtype=int)).all(axis=(1, 2)).any())
+        self.laue_class = _laue_class(self.rotations, self.centring)
+        self.crystal_system = _CRYSTAL_SYSTEMS[self.laue_class]
+        for array in (self.rotations, self.translations, self.centring_vectors):
+            array.flags.writeable = False
+
+    def __len__(self):
+        return len(self.rotations)
+
+    def __repr__(self):
+        if self.hall is None:
+            return f"SpaceGroup({len(self)} operators, laue_class='{self.laue_class}')"
+        return f"SpaceGroup('{self.hm or self.hall}', hall='{self.hall}', laue_class='{self.laue_class}')"
+
+
+@functools.lru_cache(maxsize=SPACE_GROUP_CACHE_SIZE)
+def _space_group_from_hall(hall: str):
+    return SpaceGroup(hall)
+
+def space_group(symbol: str):
+    """Returns the space group of the given H-M or Hall symbol from a process-wide LRU cache."""
+    return _space_group_from_hall(hall_symbol(symbol))
+
+def space_group_cache_info():
+    """Returns hits, misses, maxsize and currsize of the space group cache."""
+    return _space_group_from_hall.cache_info()
+
+def clear_space_group_cache():
+    """Removes all the space groups from the cache and resets its counters."""
+    _space_group_from_hall.cache_clear()
+
+def space_group_operators(symbol: str):
+    """Returns rotations (n, 3, 3) and translations (n, 3) of all the symmetry
+    operators, including lattice centring, of the given H-M or Hall symbol."""
+    group = space_group(symbol)
+    return group.rotations.copy(), group.translations.copy()
+
+def _operator_set(rotations: np.ndarray, translations: np.ndarray, denominator: int = 12):
+    """Returns the operators as a set of rotations and translations in units of 1/denominator,
+    or None when a translation is not a multiple of 1/denominator."""
+    units = denominator * np.asarray(translations, dtype=float)
+    if not np.allclose(units, np.rint(units), atol=1e-3):
+        return None
+    units = np.rint(units).astype(int) % denominator
+    return frozenset(zip(map(tuple, np.asarray(rotations, dtype=int).reshape(-1, 9).tolist()), map(tuple, units.tolist())))
+
+@functools.lru_cache(maxsize=None)
+def _halls_by_operators():
+    """Returns the Hall symbols of the tables keyed by their sets of operators, built on first use."""
+    halls = {}
+    for hall in _NUMBERS_AND_HM_BY_HALL:
+        halls.setdefault(_operator_set(*_operators_from_hall(hall)), hall)
+    return halls
+
+def _is_group(rotations: np.ndarray, translations: np.ndarray):
+    """Returns whether the operators are distinct and closed under composition, comparing the
+    translations in units of 1/10^6 since they need not be multiples of 1/12."""
+    operators = _operator_set(rotations, translations, 10**6)
+    if len(operators) != len(rotations):
+        return False
+    products = np.einsum('iab,jbc->ijac', rotations, rotations).reshape(-1, 3, 3)
+    shifts = (np.einsum('iab,jb->ija', rotations, translations) + translations[:, None]).reshape(-1, 3)
+    return _operator_set(products, shifts, 10**6) == operators
+
+def space_group_from_operators(rotations: np.ndarray, translations: np.ndarray, symbol: str = None):
+    """Returns the space group of all the symmetry operators, including lattice centring, e.g.
+    read from a CIF symop loop by operators_from_xyz(). The group of the H-M or Hall symbol, or
+    of a Hall symbol of the tables, is returned from the space_group() cache when it has the
+    same operators; otherwise a SpaceGroup without Hall symbol, number and H-M symbol is built
+    from the operators."""
+    rotations = np.asarray(rotations, dtype=int).reshape(-1, 3, 3)
+    translations = np.asarray(translations, dtype=float).reshape(-1, 3) % 1
+    operators = _operator_set(rotations, translations)
+    if symbol:
+        try:
+            group = space_group(symbol)
+        except (ValueError, KeyError, IndexError):  # not a known H-M or valid Hall symbol
+            group = None
+        if group is not None and _operator_set(group.rotations, group.translations) == operators:
+            return group
+    if operators is not None and operators in _halls_by_operators():
+        return _space_group_from_hall(_halls_by_operators()[operators])
+    if not _is_group(rotations, translations):
+        raise ValueError(f"The {len(rotations)} symmetry operators are not a space group")
+    return SpaceGroup(None, rotations, translations)
@@ -0,0 +1,189 @@
+import collections
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import numpy as np
+
+from .cif import CFL_EXTENSION, CifRecord, cfl_name, cfl_title, structure_records
+from .databases import _mapped_arrays, _write_arrays
+from .space_groups import (SpaceGroup, _space_group_from_hall, operators_from_xyz, space_group,
+                           space_group_from_operators)
+
+
+# Environment variable with the directory of the structure cache
+CACHE_DIR_VARIABLE = 'PYCRYSFML_STRUCTURE_CACHE'
+
+# Extension of the cached parse results
+CACHE_EXTENSION = '.bin'
+
+# Version of the layout of the cached arrays, part of every key
+CACHE_FORMAT = 2
+
+# Parsed structure of a data block: its CifRecord and SpaceGroup, built from the symop loop when there
+# is one (None when neither the operators nor the symbol are known)
+Structure = collections.namedtuple('Structure', ['record', 'space_group'])
+
+StructureCacheInfo = collections.namedtuple('StructureCacheInfo', ['hits', 'misses', 'currsize'])
+
+_counters = {'hits': 0, 'misses': 0}
+_counters_lock = threading.Lock()
+
+_MAGIC = b'PYCFMLSC'
+
+
+def structure_cache_dir():
+    """Returns the directory of the structure cache: the PYCRYSFML_STRUCTURE_CACHE variable,
+    or pycrysfml/structures in the user cache dir."""
+    return os.environ.get(CACHE_DIR_VARIABLE) or \
+        os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                     'pycrysfml', 'structures')
+
+@functools.lru_cache(maxsize=None)
+def library_version():
+    """Returns the version of the installed pycrysfml package, part of every cache key, read
+    once per process."""
+    from importlib import metadata
+    try:
+        return metadata.version('pycrysfml')
+    except metadata.PackageNotFoundError:
+        return 'unknown'
+
+def _is_cfl(path: str):
+    return path.lower().endswith(CFL_EXTENSION)
+
+def _cache_key(content: bytes, path: str):
+    """Returns the SHA-256 of the file content, its format (CFL or CIF), the library version
+    and the cache format."""
+    kind = 'cfl' if _is_cfl(path) else 'cif'
+    digest = hashlib.sha256(f'{kind}\0{library_version()}\0{CACHE_FORMAT}\0'.encode())
+    digest.update(content)
+    return digest.hexdigest()
+
+def _record_space_group(record: CifRecord):
+    """Returns the SpaceGroup of the symop loop of the record, or of its symbol."""
+    if record.symmetry_operators:
+        try:
+            return space_group_from_operators(*operators_from_xyz(record.symmetry_operators), record.space_group)
+        except ValueError:  # invalid operators, the symbol is used
+            pass
+    try:
+        return space_group(record.space_group) if record.space_group else None
+    except (ValueError, KeyError, IndexError):  # not a known H-M or valid Hall symbol
+        return None
+
+def _parsed_structures(text: str, path: str):
+    return [Structure(record, _record_space_group(record)) for record in structure_records(text, path)]
+
+def _structure_arrays(structures: list, names: list = None):
+    """Returns the arrays of the records and space group operators of the structures, with their
+    strings as a JSON text. The names, by default those of the records, are stored in place of
+    the names of the records."""
+    records = [structure.record for structure in structures]
+    names = [record.name for record in records] if names is None else names
+    groups = [structure.space_group for structure in structures]
+    n_atoms = [len(record.labels) for record in records]
+    n_operators = [len(group) if group is not None else 0 for group in groups]
+    strings = [{'name': name, 'space_group': record.space_group,
+                'magnetic_space_group': record.magnetic_space_group,
+                'hall': group.hall if group is not None else None,
+                'labels': record.labels, 'type_symbols': record.type_symbols,
+                'symmetry_operators': record.symmetry_operators} for record, group, name in zip(records, groups, names)]
+    moments = [record.moments if record.moments is not None else np.zeros((len(record.labels), 3)) for record in records]
+    return {'cells': np.array([record.cell for record in records], dtype=float).reshape(-1, 6),
+            'atom_offsets': np.cumsum([0] + n_atoms, dtype=np.int64),
+            'xyz': np.concatenate([record.xyz for record in records] or [np.empty((0, 3))]).reshape(-1, 3),
+            'occupancy': np.concatenate([record.occupancy for record in records] or [np.empty(0)]),
+            'b_iso': np.concatenate([record.b_iso for record in records] or [np.empty(0)]),
+            'has_moments': np.array([record.moments is not None for record in records], dtype=np.int8),
+            'moments': np.concatenate(moments or [np.empty((0, 3))]).reshape(-1, 3),
+            'operator_offsets': np.cumsum([0] + n_operators, dtype=np.int64),
+            'rotations': np.concatenate([group.rotations for group in groups if group is not None] or
+                                        [np.empty((0, 3, 3))]).astype(np.int8),
+            'translations': np.concatenate([group.translations for group in groups if group is not None] or
+                                           [np.empty((0, 3))]),
+            'strings': np.frombuffer(json.dumps(strings).encode(), dtype=np.uint8)}
+
+def _structures_from_arrays(arrays: dict, path: str):
+    """Returns the structures of the arrays written by _structure_arrays(), taking the space
+    groups of the tables from the space_group() cache and building the others from the stored
+    operators. The names of CFL records are the stored titles, or derived from the path."""
+    strings = json.loads(arrays['strings'].tobytes())
+    atom_offsets, operator_offsets = arrays['atom_offsets'], arrays['operator_offsets']
+    structures = []
+    for i, item in enumerate(strings):
+        atoms = slice(atom_offsets[i], atom_offsets[i + 1])
+        operators = slice(operator_offsets[i], operator_offsets[i + 1])
+        moments = arrays['moments'][atoms] if arrays['has_moments'][i] else None
+        name = cfl_name(item['name'], path) if _is_cfl(path) else item['name']
+        record = CifRecord(path, name, arrays['cells'][i], item['space_group'], item['magnetic_space_group'],
+                           item['labels'], item['type_symbols'], arrays['xyz'][atoms], arrays['occupancy'][atoms],
+                           arrays['b_iso'][atoms], moments, item['symmetry_operators'])
+        group = None
+        if item['hall'] is not None:
+            group = _space_group_from_hall(item['hall'])
+        elif operators.stop > operators.start:  # group in a setting not in the tables
+            group = SpaceGroup(None, arrays['rotations'][operators], arrays['translations'][operators])
+        structures.append(Structure(record, group))
+    return structures
+
+def _count(counter: str):
+    with _counters_lock:
+        _counters[counter] += 1
+
+def read_structures(path: str, use_cache: bool = True, cache_dir: str = None):
+    """Returns the Structures of the data blocks of a CFL, CIF or mCIF file. With the cache, the
+    records and space group operators parsed once are stored in a compact binary file keyed by
+    the content hash of the file and the library version, so reading the same content again,
+    in this or another process, skips tokenizing and space group generation."""
+    with open(path, 'rb') as file:
+        content = file.read()
+    if not use_cache:
+        return _parsed_structures(content.decode('utf-8', errors='replace'), path)
+    cache_dir = cache_dir or structure_cache_dir()
+    cache_path = os.path.join(cache_dir, _cache_key(content, path) + CACHE_EXTENSION)
+    try:
+        structures = _structures_from_arrays(_mapped_arrays(cache_path, _MAGIC, mapped=False), path)
+    except (OSError, ValueError, KeyError):  # missing or unreadable entry, parsed and written again
+        pass
+    else:
+        _count('hits')
+        return structures
+    _count('misses')
+    text = content.decode('utf-8', errors='replace')
+    structures = _parsed_structures(text, path)
+    names = [cfl_title(text)] * len(structures) if _is_cfl(path) else None  # not the names derived from the path
+    tmp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        descriptor, tmp_path = tempfile.mkstemp(suffix=CACHE_EXTENSION, dir=cache_dir)
+        os.close(descriptor)
+        _write_arrays(tmp_path, _structure_arrays(structures, names), _MAGIC)
+        os.replace(tmp_path, cache_path)  # atomic, so concurrent jobs never see a partial entry
+    except OSError:  # unwritable cache dir, the structures are returned uncached
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return structures
+
+def structure_cache_info(cache_dir: str = None):
+    """Returns the hits and misses of read_structures() in this process and the number of
+    entries in the cache dir."""
+    cache_dir = cache_dir or structure_cache_dir()
+    currsize = 0
+    if os.path.isdir(cache_dir):
+        currsize = sum(name.endswith(CACHE_EXTENSION) for name in os.listdir(cache_dir))
+    with _counters_lock:
+        return StructureCacheInfo(_counters['hits'], _counters['misses'], currsize)
+
+def clear_structure_cache(cache_dir: str = None):
+    """Removes all the entries of the cache dir and resets the counters."""
+    cache_dir = cache_dir or structure_cache_dir()
+    if os.path.isdir(cache_dir):
+        for name in os.listdir(cache_dir):
+            if name.endswith(CACHE_EXTENSION):
+                os.remove(os.path.join(cache_dir, name))
+    with _counters_lock:
+        _counters['hits'] = 0
+        _counters['misses'] = 0
@@ -0,0 +1,214 @@
+import collections
+import functools
+import threading
+import numpy as np
+
+from . import space_groups
+from .scattering_tables import neutron_scattering_lengths
+
+
+# Maximum number of reflection lists whose tables are kept by the structure factor cache
+STRUCTURE_FACTOR_CACHE_SIZE = 16
+
+# Maximum number of Biso values whose Debye-Waller factors are kept by every table
+DEBYE_WALLER_CACHE_SIZE = 256
+
+# Number of (set, reflection, operator) phases evaluated together in batches
+CHUNK_ELEMENTS = 1 << 22
+
+
+def _half_operators(rotations: np.ndarray, translations: np.ndarray):
+    """Returns the indices of one operator of every (R, t), (-R, -t) pair when the group is
+    centrosymmetric with the inversion centre at the origin, or None otherwise."""
+    keys = {(r.tobytes(), tuple(np.round(t % 1, 6) % 1)): i for i, (r, t) in enumerate(zip(rotations, translations))}
+    half, paired = [], set()
+    for i, (r, t) in enumerate(zip(rotations, translations)):
+        if i in paired:
+            continue
+        j = keys.get(((-r).tobytes(), tuple(np.round(-t % 1, 6) % 1)))
+        if j is None or j == i:
+            return None
+        half.append(i)
+        paired.update((i, j))
+    return np.array(half)
+
+
+class StructureFactorTables:
+    """Tables of a fixed reflection list and space group: the Miller indices rotated by the
+    symmetry operators, the phase shifts of their translations, (sin(theta)/lambda)^2 and the
+    Debye-Waller factors of the Biso values seen so far. For centrosymmetric groups with the
+    inversion centre at the origin, only one operator of every (R, t), (-R, -t) pair is kept
+    and the phases are summed as cosines."""
+
+    def __init__(self, hkl: np.ndarray, s: np.ndarray, space_group):
+        if isinstance(space_group, str):
+            space_group = space_groups.space_group(space_group)
+        rotations, translations = space_group.rotations, space_group.translations
+        half = _half_operators(rotations, translations)
+        self.centrosymmetric_origin = half is not None
+        if half is not None:
+            rotations, translations = rotations[half], translations[half]
+        self.hkl = np.asarray(hkl, dtype=float)
+        self.s_squared = np.asarray(s, dtype=float)**2
+        self.rotated_hkl = np.einsum('ni,kij->nkj', self.hkl, rotations)
+        self.shifts = 2 * np.pi * (self.hkl @ translations.T)
+        self._rotated_hkl_rows = 2 * np.pi * self.rotated_hkl.reshape(-1, 3)
+        self._debye_waller = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.hkl)
+
+    def debye_waller(self, b_iso: float):
+        """Returns exp(-Biso s^2) of the reflections, cached by Biso."""
+        b_iso = float(b_iso)
+        with self._lock:
+            factors = self._debye_waller.get(b_iso)
+            if factors is not None:
+                self._debye_waller.move_to_end(b_iso)
+                return factors
+        factors = np.exp(-b_iso * self.s_squared)
+        with self._lock:
+            self._debye_waller[b_iso] = factors
+            while len(self._debye_waller) > DEBYE_WALLER_CACHE_SIZE:
+                self._debye_waller.popitem(last=False)
+        return factors
+
+    def structure_factors(self, xyz, occupancy, scattering_length, b_iso):
+        """Returns the complex structure factors of one atom-parameter set, with xyz (n_atoms, 3)
+        and occupancy, scattering length and Biso (n_atoms,), or of a batch of sets with a
+        leading (n_sets,) dimension on all of them, as an (n_sets, n_refl) array."""
+        xyz = np.asarray(xyz, dtype=float)
+        batched = xyz.ndim == 3
+        xyz = xyz.reshape(-1, *xyz.shape[-2:])
+        occupancy, scattering_length, b_iso = (np.broadcast_to(np.asarray(p, dtype=float), xyz.shape[:2])
+                                               for p in (occupancy, scattering_length, b_iso))
+        f = np.zeros((len(xyz), len(self.hkl)), dtype=complex)
+        n_sets = max(1, CHUNK_ELEMENTS // max(1, self.shifts.size))
+        for start in range(0, len(xyz), n_sets):
+            chunk = slice(start, start + n_sets)
+            f[chunk] = self._structure_factors(xyz[chunk], occupancy[chunk], scattering_length[chunk], b_iso[chunk])
+        return f if batched else f[0]
+
+    def _structure_factors(self, xyz, occupancy, scattering_length, b_iso):
+        f = np.zeros((len(xyz), len(self.hkl)), dtype=float if self.centrosymmetric_origin else complex)
+        for atom in range(xyz.shape[1]):
+            phases = (xyz[:, atom] @ self._rotated_hkl_rows.T).reshape(len(xyz), *self.shifts.shape)
+            phases += self.shifts
+            if self.centrosymmetric_origin:
+                phase_sums = 2 * np.cos(phases).sum(axis=2)
+            else:
+                phase_sums = np.exp(1j * phases).sum(axis=2)
+            amplitudes = occupancy[:, atom] * scattering_length[:, atom]
+            for b in np.unique(b_iso[:, atom]):
+                sets = b_iso[:, atom] == b
+                f[sets] += amplitudes[sets, None] * self.debye_waller(b) * phase_sums[sets]
+        return f
+
+
+def _reflection_arrays(reflections):
+    """Returns (n, 3) Miller indices and sin(theta)/lambda of a reflection_list() array."""
+    hkl = np.stack([reflections['h'], reflections['k'], reflections['l']], axis=-1).astype(np.int32)
+    return hkl, np.asarray(reflections['s'], dtype=float)
+
+@functools.lru_cache(maxsize=STRUCTURE_FACTOR_CACHE_SIZE)
+def _tables_from_bytes(hall: str, hkl_bytes: bytes, s_bytes: bytes):
+    hkl = np.frombuffer(hkl_bytes, dtype=np.int32).reshape(-1, 3)
+    s = np.frombuffer(s_bytes, dtype=float)
+    return StructureFactorTables(hkl, s, space_groups.space_group(hall))
+
+def structure_factor_tables(reflections, space_group):
+    """Returns the StructureFactorTables of a reflection_list() array and a space group
+    (symbol or SpaceGroup), kept in a process-wide LRU cache between calls."""
+    if isinstance(space_group, str):
+        space_group = space_groups.space_group(space_group)
+    hkl, s = _reflection_arrays(reflections)
+    return _tables_from_bytes(space_group.hall, hkl.tobytes(), s.tobytes())
+
+def structure_factor_cache_info():
+    """Returns hits, misses, maxsize and currsize of the structure factor table cache."""
+    return _tables_from_bytes.cache_info()
+
+def clear_structure_factor_cache():
+    """Removes all the tables from the structure factor cache and resets its counters."""
+    _tables_from_bytes.cache_clear()
+
+
+class AtomList:
+    """Atoms of a list of '_atom_site' dicts held in one (n_atoms, 6) float64 buffer with
+    the fractional coordinates, occupancies, neutron scattering lengths and Biso as columns.
+    The atom arrays are writable views of that buffer, which is also exposed through the
+    NumPy array interface (and the buffer protocol on Python 3.12+), so an AtomList passed
+    to atom_arrays(), structure_factors() or as the '_atom_site' of a powder phase is used
+    without any copy, and changes to its arrays are seen by the next call."""
+
+    def __init__(self, atom_sites: list):
+        self.labels = [atom.get('_label', '') for atom in atom_sites]
+        self.type_symbols = [atom['_type_symbol'] for atom in atom_sites]
+        self._buffer = np.empty((len(atom_sites), 6))
+        self.xyz[...], self.occupancy[...], self.scattering_length[...], self.b_iso[...] = _atom_site_arrays(atom_sites)
+
+    @property
+    def xyz(self):
+        """View of the (n_atoms, 3) fractional coordinates."""
+        return self._buffer[:, 0:3]
+
+    @property
+    def occupancy(self):
+        """View of the occupancies."""
+        return self._buffer[:, 3]
+
+    @property
+    def scattering_length(self):
+        """View of the neutron scattering lengths."""
+        return self._buffer[:, 4]
+
+    @property
+    def b_iso(self):
+        """View of the isotropic displacement parameters Biso."""
+        return self._buffer[:, 5]
+
+    def arrays(self):
+        """Returns views of fractional coordinates, occupancies, scattering lengths and Biso."""
+        return self.xyz, self.occupancy, self.scattering_length, self.b_iso
+
+    @property
+    def __array_interface__(self):
+        return self._buffer.__array_interface__
+
+    def __buffer__(self, flags: int):
+        return memoryview(self._buffer)
+
+    def __len__(self):
+        return len(self._buffer)
+
+
+def _atom_site_arrays(atom_sites: list):
+    xyz = np.array([[atom['_fract_x'], atom['_fract_y'], atom['_fract_z']] for atom in atom_sites], dtype=float).reshape(-1, 3)
+    occupancy = np.array([atom.get('_occupancy', 1) for atom in atom_sites], dtype=float)
+    scattering_length = neutron_scattering_lengths([atom['_type_symbol'] for atom in atom_sites])
+    b_iso = np.array([8 * np.pi**2 * atom.get('_U_iso_or_equiv', 0) if atom.get('_adp_type', 'Biso') == 'Uiso'
+                      else atom.get('_B_iso_or_equiv', 0) for atom in atom_sites], dtype=float)
+    return xyz, occupancy, scattering_length, b_iso
+
+def atom_arrays(atom_sites):
+    """Returns fractional coordinates, occupancies, neutron scattering lengths and Biso
+    arrays of a list of '_atom_site' dicts, or the views of an AtomList."""
+    if isinstance(atom_sites, AtomList):
+        return atom_sites.arrays()
+    return _atom_site_arrays(atom_sites)
+
+def structure_factors(reflections, space_group, atom_sites):
+    """Returns the complex nuclear structure factors of a reflection_list() array for a list
+    of '_atom_site' dicts or an AtomList, summed over all the symmetry operators of the space group."""
+    return structure_factor_tables(reflections, space_group).structure_factors(*atom_arrays(atom_sites))
+
+def structure_factors_batch(reflections, space_group, type_symbols: list, xyz, occupancy=1.0, b_iso=0.0):
+    """Returns the (n_sets, n_refl) complex structure factors of a batch of atom-parameter sets
+    sharing the atom types, with xyz (n_sets, n_atoms, 3) and occupancy and Biso broadcast to
+    (n_sets, n_atoms), against the same reflection list."""
+    xyz = np.asarray(xyz, dtype=float)
+    if xyz.ndim != 3 or xyz.shape[1:] != (len(type_symbols), 3):
+        raise ValueError(f"Coordinates have shape {xyz.shape} instead of (n_sets, {len(type_symbols)}, 3)")
+    scattering_length = neutron_scattering_lengths(type_symbols)
+    return structure_factor_tables(reflections, space_group).structure_factors(xyz, occupancy, scattering_length, b_iso)
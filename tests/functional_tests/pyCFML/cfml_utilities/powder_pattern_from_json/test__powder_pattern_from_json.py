@@ -1,7 +1,9 @@
+import concurrent.futures
 import copy
 import numpy as np
 from numpy.testing import assert_almost_equal
 import os
+import pytest
 import sys
 
 sys.path.append(os.getcwd())  # to access tests/helpers.py
@@ -11,6 +13,12 @@ from tests.helpers import path_to_desired
 #import pycrysfml
 #from pycrysfml import crysfml08lib
 from pycrysfml import cfml_utilities
+from pycrysfml import fitting
+from pycrysfml import parallel
+from pycrysfml import pattern_archive
+from pycrysfml import powder
+from pycrysfml import profiles
+from pycrysfml import structure_factors
 
 
 STUDY_DICT_PM3M = {
@@ -83,6 +91,96 @@ STUDY_DICT_PM3M = {
   ]
 }
 
+STUDY_DICT_PBSO4 = {
+  "phases": [
+    {
+      "PbSO4": {
+        "_space_group_name_H-M_alt": "P n m a",
+        "_cell_length_a": 8.47793,
+        "_cell_length_b": 5.39682,
+        "_cell_length_c": 6.9581,
+        "_cell_angle_alpha": 90,
+        "_cell_angle_beta": 90,
+        "_cell_angle_gamma": 90,
+        "_atom_site": [
+          {
+            "_label": "Pb",
+            "_type_symbol": "Pb",
+            "_fract_x": 0.18724,
+            "_fract_y": 0.25,
+            "_fract_z": 0.16615,
+            "_occupancy": 1,
+            "_adp_type": "Biso",
+            "_B_iso_or_equiv": 0.5
+          },
+          {
+            "_label": "S",
+            "_type_symbol": "S",
+            "_fract_x": 0.06434,
+            "_fract_y": 0.25,
+            "_fract_z": 0.68261,
+            "_occupancy": 1,
+            "_adp_type": "Biso",
+            "_B_iso_or_equiv": 0.5
+          },
+          {
+            "_label": "O1",
+            "_type_symbol": "O",
+            "_fract_x": 0.9079,
+            "_fract_y": 0.25,
+            "_fract_z": 0.59598,
+            "_occupancy": 1,
+            "_adp_type": "Biso",
+            "_B_iso_or_equiv": 0.5
+          },
+          {
+            "_label": "O2",
+            "_type_symbol": "O",
+            "_fract_x": 0.1926,
+            "_fract_y": 0.25,
+            "_fract_z": 0.54171,
+            "_occupancy": 1,
+            "_adp_type": "Biso",
+            "_B_iso_or_equiv": 0.5
+          },
+          {
+            "_label": "O3",
+            "_type_symbol": "O",
+            "_fract_x": 0.08043,
+            "_fract_y": 0.02893,
+            "_fract_z": 0.80734,
+            "_occupancy": 1,
+            "_adp_type": "Biso",
+            "_B_iso_or_equiv": 0.5
+          }
+        ]
+      }
+    }
+  ],
+  "experiments": [
+    {
+      "NPD": {
+        "_diffrn_source": "nuclear reactor",
+        "_diffrn_radiation_probe": "neutron",
+        "_diffrn_radiation_wavelength": 1.912,
+        "_pd_instr_resolution_u": 0.12205,
+        "_pd_instr_resolution_v": -0.33588,
+        "_pd_instr_resolution_w": 0.2838,
+        "_pd_instr_resolution_x": 0.14871,
+        "_pd_instr_resolution_y": 0,
+        "_pd_instr_reflex_asymmetry_p1": 0,
+        "_pd_instr_reflex_asymmetry_p2": 0,
+        "_pd_instr_reflex_asymmetry_p3": 0,
+        "_pd_instr_reflex_asymmetry_p4": 0,
+        "_pd_meas_2theta_offset": -0.138,
+        "_pd_meas_2theta_range_min": 10,
+        "_pd_meas_2theta_range_max": 140,
+        "_pd_meas_2theta_range_inc": 0.05
+      }
+    }
+  ]
+}
+
 # Help functions
 
 #def path_to_desired(file_name:str):
@@ -93,6 +191,61 @@ def compute_pattern(study_dict:dict):
     _, y = cfml_utilities.powder_pattern_from_json(study_dict)  # returns x and y arrays
     return y
 
+def compute_patterns(study_dicts:list):
+    _, y = powder.powder_patterns_from_json(study_dicts)  # returns x and stacked 2D y array
+    return y
+
+def trial_study_dicts(study_dict:dict, size:int):
+    """Returns copies of the study dict with slightly different Biso of the first atom."""
+    study_dicts = []
+    for i in range(size):
+        trial_dict = copy.deepcopy(study_dict)
+        atom = list(trial_dict['phases'][0].values())[0]['_atom_site'][0]
+        atom['_B_iso_or_equiv'] += 0.01 * i
+        study_dicts.append(trial_dict)
+    return study_dicts
+
+def simulate_fit_steps(simulation:powder.PowderSimulation, label:str, steps:int=10):
+    """Updates Biso of the atom with the given label and recomputes the pattern, as in a fit loop."""
+    for i in range(steps):
+        simulation.update([{'_label': label, '_B_iso_or_equiv': 0.5 + 0.01 * i}])
+        _, y = simulation.compute()
+    return y
+
+def shifted_study_dict(study_dict:dict, parameter, shift:float):
+    """Returns a copy of the study dict with the atom, cell, resolution or offset parameter shifted."""
+    study_dict = copy.deepcopy(study_dict)
+    phase = list(study_dict['phases'][0].values())[0]
+    experiment = list(study_dict['experiments'][0].values())[0]
+    if isinstance(parameter, tuple):
+        label, key = parameter
+        atom = [atom for atom in phase['_atom_site'] if atom['_label'] == label][0]
+        atom[key] = atom.get(key, 1) + shift
+    elif parameter.startswith('_cell'):
+        phase[parameter] += shift
+    else:
+        experiment[parameter] = experiment.get(parameter, 0) + shift
+    return study_dict
+
+def finite_difference_jacobian(study_dict:dict, parameters:list, step:float=1e-6):
+    columns = []
+    for parameter in parameters:
+        _, plus = powder.powder_pattern_from_json(shifted_study_dict(study_dict, parameter, step))
+        _, minus = powder.powder_pattern_from_json(shifted_study_dict(study_dict, parameter, -step))
+        columns.append((plus - minus) / (2 * step))
+    return np.stack(columns, axis=1)
+
+def observed_pattern(study_dict:dict, seed:int=0):
+    """Returns a noisy pattern simulated from the study dict, and its sigma."""
+    _, y = powder.powder_pattern_from_json(study_dict)
+    sigma = np.sqrt(100 * y + 1) / 100
+    return y + np.random.default_rng(seed).normal(0, sigma), sigma
+
+def numbers_of_processes():
+    """Returns 1, 2, 4, ... up to the number of cores, and the number of cores itself."""
+    cores = os.cpu_count()
+    return sorted({2**i for i in range(cores.bit_length()) if 2**i <= cores} | {cores})
+
 # Tests
 
 def test__compute_pattern__SrTiO3_Pm3m(benchmark):
@@ -117,6 +270,308 @@ def test__compute_pattern__SrTiO3_Pnma(benchmark):
     actual = actual / norm
     assert_almost_equal(desired, actual, decimal=2, verbose=True)
 
+def test__compute_patterns__SrTiO3_Pm3m_Pnma():
+    study_dict_pm3m = copy.deepcopy(STUDY_DICT_PM3M)
+    study_dict_pnma = copy.deepcopy(STUDY_DICT_PM3M)
+    study_dict_pnma['phases'][0]['SrTiO3']['_space_group_name_H-M_alt'] = 'P n m a'
+    actual = compute_patterns([study_dict_pm3m, study_dict_pnma])
+    assert actual.shape == (2, 2781)
+    # Pm-3m
+    norm = 120
+    _, desired = np.loadtxt(path_to_desired('srtio3-pm3m-pattern_Nebil-ifort.xy'), unpack=True)
+    desired = desired - 20.0  # remove background
+    desired = np.roll(desired, -1)  # see test__compute_pattern__SrTiO3_Pm3m
+    assert_almost_equal(desired / norm, actual[0] / norm, decimal=0, verbose=True)
+    # Pnma
+    norm = 0.65
+    desired = np.loadtxt(path_to_desired('srtio3-pnma-pattern_Andrew-ifort.y'), unpack=True)
+    desired = desired - 20.0  # remove background
+    assert_almost_equal(desired / norm, actual[1] / norm, decimal=2, verbose=True)
+
+@pytest.mark.parametrize('batch_size', [1, 10, 100])
+def test__compute_patterns__SrTiO3_Pm3m_batch(benchmark, batch_size:int):
+    study_dicts = trial_study_dicts(STUDY_DICT_PM3M, batch_size)
+    actual = benchmark(compute_patterns, study_dicts)
+    if benchmark.stats:  # per-pattern cost falls as the batch size grows
+        benchmark.extra_info['mean_per_pattern'] = benchmark.stats.stats.mean / batch_size
+    assert actual.shape == (batch_size, 2781)
+    desired = compute_patterns(study_dicts[-1:])[0]
+    assert_almost_equal(desired, actual[-1], decimal=8, verbose=True)
+
+@pytest.mark.parametrize('study_dict, label', [(STUDY_DICT_PM3M, 'Sr'), (STUDY_DICT_PBSO4, 'Pb')], ids=['SrTiO3', 'PbSO4'])
+def test__powder_simulation__update_compute(study_dict:dict, label:str):
+    study_dict = copy.deepcopy(study_dict)
+    simulation = powder.PowderSimulation(study_dict)
+    simulation.update([{'_label': label, '_fract_x': 0.2, '_occupancy': 0.9, '_B_iso_or_equiv': 0.8}])
+    _, actual = simulation.compute()
+    atom = list(study_dict['phases'][0].values())[0]['_atom_site'][0]
+    atom.update({'_fract_x': 0.2, '_occupancy': 0.9, '_B_iso_or_equiv': 0.8})
+    _, desired = powder.powder_pattern_from_json(study_dict)
+    assert_almost_equal(desired, actual, decimal=8, verbose=True)
+
+def test__powder_simulation__update_invalid():
+    simulation = powder.PowderSimulation(STUDY_DICT_PBSO4)
+    _, desired = simulation.compute()
+    with pytest.raises(KeyError):
+        simulation.update([{'_label': 'Pb', '_fract_x': 0.2}, {'_label': 'Xx', '_fract_x': 0.2}])
+    with pytest.raises(ValueError):
+        simulation.update([{'_label': 'Pb', '_fract_x': 0.2, '_U_iso_or_equiv': 0.01}])
+    _, actual = simulation.compute()
+    assert np.array_equal(desired, actual)
+
+@pytest.mark.parametrize('key, value, message', [('_diffrn_radiation_probe', 'x-ray', 'probe'),
+                                                 ('_pd_instr_reflex_asymmetry_p1', 0.1, 'asymmetry')])
+def test__powder_pattern_from_json__unsupported_experiment(key:str, value, message:str):
+    study_dict = copy.deepcopy(STUDY_DICT_PBSO4)
+    list(study_dict['experiments'][0].values())[0][key] = value
+    with pytest.raises(ValueError, match=message):
+        powder.powder_pattern_from_json(study_dict)
+
+@pytest.mark.parametrize('study_dict, label', [(STUDY_DICT_PM3M, 'Sr'), (STUDY_DICT_PBSO4, 'Pb')], ids=['SrTiO3', 'PbSO4'])
+def test__powder_simulation__fit_steps(benchmark, study_dict:dict, label:str):
+    simulation = powder.PowderSimulation(study_dict)
+    actual = benchmark(simulate_fit_steps, simulation, label)
+    assert actual.shape == simulation.x.shape
+
+@pytest.mark.parametrize('window', [None, 10, 50])
+def test__compute_patterns__PbSO4_window(benchmark, window:float):
+    study_dicts = trial_study_dicts(STUDY_DICT_PBSO4, 10)
+    _, desired = powder.powder_patterns_from_json(study_dicts)
+    _, actual = benchmark(powder.powder_patterns_from_json, study_dicts, window=window)
+    # every peak loses less than truncation_error_bound of its area, at most its value at the window edge
+    tolerance = 0 if window is None else profiles.truncation_error_bound(window) * desired.max()
+    assert np.abs(desired - actual).max() <= tolerance
+    simulation = powder.PowderSimulation(study_dicts[-1], window=window)
+    assert_almost_equal(actual[-1], simulation.compute()[1], decimal=10, verbose=True)
+
+@pytest.mark.parametrize('window', [None, 20])
+def test__powder_simulation__PbSO4_jacobian(window:float):
+    parameters = [('Pb', '_fract_x'), ('Pb', '_fract_z'), ('O1', '_B_iso_or_equiv'), ('S', '_occupancy'),
+                  '_cell_length_a', '_cell_length_c', '_pd_instr_resolution_u', '_pd_instr_resolution_v',
+                  '_pd_instr_resolution_w', '_pd_instr_resolution_x', '_pd_instr_resolution_y', '_pd_meas_2theta_offset']
+    study_dict = copy.deepcopy(STUDY_DICT_PBSO4)
+    simulation = powder.PowderSimulation(study_dict, window=window)
+    x, y, actual = simulation.compute_with_jacobian(parameters)
+    assert actual.shape == (len(x), len(parameters))
+    assert_almost_equal(simulation.compute()[1], y, decimal=10, verbose=True)
+    desired = finite_difference_jacobian(study_dict, parameters) if window is None else \
+              np.stack([(powder.PowderSimulation(shifted_study_dict(study_dict, p, 1e-6), window=window).compute()[1] -
+                         powder.PowderSimulation(shifted_study_dict(study_dict, p, -1e-6), window=window).compute()[1]) / 2e-6
+                        for p in parameters], axis=1)
+    scale = np.abs(desired).max(axis=0)
+    assert_almost_equal(desired / scale, actual / scale, decimal=6, verbose=True)
+    with pytest.raises(ValueError):
+        simulation.compute_with_jacobian([('Pb', '_type_symbol')])
+    with pytest.raises(KeyError):
+        simulation.compute_with_jacobian([('Xx', '_occupancy')])
+
+def test__powder_simulation__PbSO4_sparse_jacobian():
+    pytest.importorskip('scipy')
+    simulation = powder.PowderSimulation(STUDY_DICT_PBSO4, window=5)
+    _, _, desired = simulation.compute_with_jacobian(['_pd_instr_resolution_w', ('Pb', '_occupancy')])
+    _, _, actual = simulation.compute_with_jacobian(['_pd_instr_resolution_w', ('Pb', '_occupancy')], sparse=True)
+    assert actual.nnz == np.count_nonzero(desired)
+    assert_almost_equal(desired, actual.toarray(), decimal=12)
+
+@pytest.mark.parametrize('method', ['analytic', 'finite_differences'])
+def test__powder_simulation__PbSO4_jacobian_cost(benchmark, method:str):
+    parameters = [(label, key) for label in ('Pb', 'S', 'O1', 'O2', 'O3') for key in powder.ATOM_PARAMETERS] + \
+                 ['_cell_length_a', '_cell_length_b', '_cell_length_c', '_pd_instr_resolution_u',
+                  '_pd_instr_resolution_v', '_pd_instr_resolution_w', '_pd_instr_resolution_y']
+    simulation = powder.PowderSimulation(STUDY_DICT_PBSO4)
+    if method == 'analytic':
+        actual = benchmark(simulation.compute_with_jacobian, parameters)[2]
+    else:  # one pattern per parameter, as an external optimizer needs without derivatives
+        actual = benchmark(finite_difference_jacobian, STUDY_DICT_PBSO4, parameters)
+    if benchmark.stats:
+        benchmark.extra_info['parameters'] = len(parameters)
+    assert actual.shape == (2601, len(parameters))
+
+def test__fit_powder_pattern__PbSO4(benchmark):
+    parameters = [('Pb', '_fract_x'), ('Pb', '_fract_z'), ('O1', '_B_iso_or_equiv'), '_cell_length_a', '_pd_instr_resolution_w']
+    desired = [0.19024, 0.16615, 0.9, 8.48093, 0.3]
+    true_study_dict = copy.deepcopy(STUDY_DICT_PBSO4)
+    for parameter, value in zip(parameters, desired):
+        fitting._set_parameter_value(true_study_dict, parameter, 0, value)
+    y_obs, sigma = observed_pattern(true_study_dict)
+    iterations = []
+    hook = lambda iteration, values, chi2: iterations.append((iteration, chi2))
+    result = benchmark(fitting.fit_powder_pattern, STUDY_DICT_PBSO4, y_obs, parameters, sigma=sigma, hook=hook)
+    if benchmark.stats:
+        benchmark.extra_info['iterations'] = result.iterations
+    assert result.converged
+    assert abs(result.reduced_chi2 - 1) < 0.1
+    assert (np.abs(result.values - desired) < 3 * result.esds).all()
+    assert result.covariance.shape == (5, 5)
+    assert_almost_equal(np.sqrt(np.diag(result.covariance)), result.esds, decimal=12)
+    last_fit = iterations[-result.iterations:]  # the benchmark may run the fit several times
+    assert [iteration for iteration, _ in last_fit] == list(range(1, result.iterations + 1))
+    assert all(later <= earlier for (_, earlier), (_, later) in zip(last_fit, last_fit[1:]))
+    assert fitting._parameter_value(result.study_dict, '_cell_length_a', 0) == result.values[3]
+    assert STUDY_DICT_PBSO4['phases'][0]['PbSO4']['_cell_length_a'] == 8.47793
+
+def test__fit_powder_pattern__hook_stop():
+    y_obs, sigma = observed_pattern(STUDY_DICT_PBSO4)
+    result = fitting.fit_powder_pattern(STUDY_DICT_PBSO4, y_obs, [('Pb', '_B_iso_or_equiv')], sigma=sigma,
+                                        hook=lambda iteration, values, chi2: True)
+    assert result.iterations == 1
+    with pytest.raises(ValueError):
+        fitting.fit_powder_pattern(STUDY_DICT_PBSO4, y_obs[:-1], [('Pb', '_B_iso_or_equiv')])
+
+def test__fit_powder_pattern__PbSO4_atom_list():
+    parameters = [('Pb', '_fract_x'), ('O1', '_B_iso_or_equiv'), '_cell_length_a']
+    y_obs, sigma = observed_pattern(STUDY_DICT_PBSO4)
+    study_dict = copy.deepcopy(STUDY_DICT_PBSO4)
+    phase = list(study_dict['phases'][0].values())[0]
+    phase['_atom_site'] = structure_factors.AtomList(phase['_atom_site'])
+    desired = fitting.fit_powder_pattern(STUDY_DICT_PBSO4, y_obs, parameters, sigma=sigma)
+    actual = fitting.fit_powder_pattern(study_dict, y_obs, parameters, sigma=sigma)
+    assert_almost_equal(desired.values, actual.values, decimal=8)
+    assert fitting._parameter_value(actual.study_dict, ('Pb', '_fract_x'), 0) == actual.values[0]
+    assert fitting._parameter_value(study_dict, ('Pb', '_fract_x'), 0) ==         fitting._parameter_value(STUDY_DICT_PBSO4, ('Pb', '_fract_x'), 0)  # the fit refines a copy
+
+def test__fit_powder_pattern__PbSO4_u_iso():
+    y_obs, sigma = observed_pattern(STUDY_DICT_PBSO4)
+    study_dict = copy.deepcopy(STUDY_DICT_PBSO4)
+    atom = list(study_dict['phases'][0].values())[0]['_atom_site'][0]
+    b_iso = atom.pop('_B_iso_or_equiv')
+    atom.update({'_adp_type': 'Uiso', '_U_iso_or_equiv': b_iso / (8 * np.pi**2)})
+    assert abs(fitting._parameter_value(study_dict, (atom['_label'], '_B_iso_or_equiv'), 0) - b_iso) < 1e-12
+    parameters = [(atom['_label'], '_B_iso_or_equiv'), '_cell_length_a']
+    desired = fitting.fit_powder_pattern(STUDY_DICT_PBSO4, y_obs, parameters, sigma=sigma)
+    actual = fitting.fit_powder_pattern(study_dict, y_obs, parameters, sigma=sigma)
+    assert_almost_equal(desired.values, actual.values, decimal=8)
+    fitted_atom = list(actual.study_dict['phases'][0].values())[0]['_atom_site'][0]
+    assert_almost_equal(8 * np.pi**2 * fitted_atom['_U_iso_or_equiv'], actual.values[0], decimal=12)
+
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+def test__compute_patterns__PbSO4_dtype_out(dtype):
+    study_dicts = trial_study_dicts(STUDY_DICT_PBSO4, 3)
+    _, desired = powder.powder_patterns_from_json(study_dicts)
+    _, actual = powder.powder_patterns_from_json(study_dicts, dtype=dtype)
+    assert actual.dtype == dtype
+    assert_almost_equal(desired / desired.max(), actual / desired.max(), decimal=6, verbose=True)
+    out = np.full(desired.shape, np.nan, dtype=dtype)
+    assert powder.powder_patterns_from_json(study_dicts, out=out)[1] is out
+    assert np.array_equal(actual, out)
+    out = np.full(desired.shape[1], np.nan, dtype=dtype)
+    assert powder.powder_pattern_from_json(study_dicts[0], out=out)[1] is out
+    assert_almost_equal(actual[0] / desired.max(), out / desired.max(), decimal=6, verbose=True)
+    simulation = powder.PowderSimulation(study_dicts[1])
+    out = np.full(desired.shape[1], np.nan, dtype=dtype)
+    for _ in range(2):  # the buffer is reused by every step of a fit loop
+        assert simulation.compute(out=out)[1] is out
+    assert_almost_equal(actual[1] / desired.max(), out / desired.max(), decimal=6, verbose=True)
+    with parallel.PowderPool(processes=2) as pool:
+        out = np.empty(desired.shape, dtype=dtype)
+        assert pool.patterns_from_json(study_dicts, chunk_size=2, out=out)[1] is out
+    assert_almost_equal(actual / desired.max(), out / desired.max(), decimal=6, verbose=True)
+
+def test__compute_patterns__invalid_dtype_out():
+    with pytest.raises(ValueError):
+        powder.powder_pattern_from_json(STUDY_DICT_PBSO4, dtype=np.int32)
+    with pytest.raises(ValueError):
+        powder.powder_pattern_from_json(STUDY_DICT_PBSO4, out=np.empty(100))
+    with pytest.raises(ValueError):
+        powder.PowderSimulation(STUDY_DICT_PBSO4).compute(out=np.empty(2601, dtype=np.float16))
+
+@pytest.mark.parametrize('shared_context', [False, True], ids=['fresh_context', 'shared_context'])
+def test__compute_patterns__SrTiO3_call_order(shared_context:bool):
+    study_dict_pm3m = copy.deepcopy(STUDY_DICT_PM3M)
+    study_dict_pnma = copy.deepcopy(STUDY_DICT_PM3M)
+    study_dict_pnma['phases'][0]['SrTiO3']['_space_group_name_H-M_alt'] = 'P n m a'
+    context = powder.PowderContext() if shared_context else None
+    _, desired = powder.powder_pattern_from_json(study_dict_pm3m, context)
+    powder.powder_pattern_from_json(study_dict_pnma, context)
+    _, actual = powder.powder_pattern_from_json(study_dict_pm3m, context)
+    assert np.array_equal(desired, actual)
+    if context is not None:
+        assert len(context) == 2
+        context.reset()
+        assert len(context) == 0
+        _, actual = powder.powder_pattern_from_json(study_dict_pm3m, context)
+        assert np.array_equal(desired, actual)
+
+def test__compute_patterns__SrTiO3_context_size():
+    study_dicts = [copy.deepcopy(STUDY_DICT_PM3M) for _ in range(4)]
+    for i, study_dict in enumerate(study_dicts):  # one setup per cell, as in a cell refinement
+        study_dict['phases'][0]['SrTiO3']['_cell_length_a'] += 0.001 * i
+    desired = [powder.powder_pattern_from_json(study_dict)[1] for study_dict in study_dicts]
+    context = powder.PowderContext(maxsize=2)
+    actual = [powder.powder_pattern_from_json(study_dict, context)[1] for study_dict in study_dicts + study_dicts[:1]]
+    assert len(context) == context.maxsize
+    for desired_y, actual_y in zip(desired + desired[:1], actual):
+        assert np.array_equal(desired_y, actual_y)
+
+def test__compute_patterns__SrTiO3_threads():
+    study_dicts = trial_study_dicts(STUDY_DICT_PM3M, 16)
+    for study_dict in study_dicts[::2]:
+        study_dict['phases'][0]['SrTiO3']['_space_group_name_H-M_alt'] = 'P n m a'
+    desired = [powder.powder_pattern_from_json(study_dict)[1] for study_dict in study_dicts]
+    context = powder.PowderContext()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        actual = list(executor.map(lambda study_dict: powder.powder_pattern_from_json(study_dict, context)[1], study_dicts))
+    for desired_y, actual_y in zip(desired, actual):
+        assert np.array_equal(desired_y, actual_y)
+
+def test__compute_patterns__PbSO4_parallel():
+    study_dicts = trial_study_dicts(STUDY_DICT_PBSO4, 8)
+    _, desired = powder.powder_patterns_from_json(study_dicts)
+    out = np.empty_like(desired)
+    with parallel.PowderPool(processes=2) as pool:
+        _, actual = pool.patterns_from_json(study_dicts, chunk_size=3)
+        _, actual_out = pool.patterns_from_json(study_dicts, out=out)
+    assert isinstance(actual, parallel.SharedPatterns)
+    assert_almost_equal(desired, actual, decimal=10, verbose=True)
+    assert actual_out is out
+    assert_almost_equal(desired, out, decimal=10, verbose=True)
+    last = actual[-1]  # a view keeps the shared block mapped
+    del actual
+    assert_almost_equal(desired[-1], last, decimal=10, verbose=True)
+
+def test__compute_patterns__PbSO4_parallel_derived_arrays():
+    study_dicts = trial_study_dicts(STUDY_DICT_PBSO4, 4)
+    with parallel.PowderPool(processes=2) as pool:
+        _, actual = pool.patterns_from_json(study_dicts)
+    view, scaled, copied = actual[1:], actual * 2, actual.copy()
+    assert view._shared_memory is actual._shared_memory
+    assert type(scaled) is np.ndarray and copied._shared_memory is None
+    del actual, view
+    assert_almost_equal(copied * 2, scaled, decimal=10, verbose=True)
+
+def test__compute_patterns__PbSO4_parallel_failure():
+    study_dicts = trial_study_dicts(STUDY_DICT_PBSO4, 6)
+    list(study_dicts[0]['phases'][0].values())[0]['_atom_site'][0]['_type_symbol'] = 'Xx'
+    with parallel.PowderPool(processes=2) as pool:
+        with pytest.raises(KeyError):
+            pool.patterns_from_json(study_dicts, chunk_size=1)
+        _, actual = pool.patterns_from_json(study_dicts[1:])  # the workers outlive the failed call
+    assert actual.shape == (5, 2601)
+
+@pytest.mark.parametrize('processes', numbers_of_processes())
+def test__compute_patterns__PbSO4_parallel_scaling(benchmark, processes:int):
+    study_dicts = trial_study_dicts(STUDY_DICT_PBSO4, 64)
+    with parallel.PowderPool(processes) as pool:
+        pool.patterns_from_json(study_dicts[:processes])  # warm up the workers
+        actual = benchmark(pool.patterns_from_json, study_dicts)[1]
+    if benchmark.stats:
+        benchmark.extra_info['processes'] = processes
+        benchmark.extra_info['patterns_per_second'] = len(study_dicts) / benchmark.stats.stats.mean
+    assert actual.shape == (64, 2601)
+
+def test__compute_patterns__PbSO4_archive(tmp_path):
+    study_dicts = trial_study_dicts(STUDY_DICT_PBSO4, 10)
+    x, y = powder.powder_patterns_from_json(study_dicts, dtype=np.float32)
+    path = str(tmp_path / 'patterns.npz')
+    assert pattern_archive.write_pattern_archive(path, x, y, chunk_size=4) == 10
+    assert pattern_archive.write_pattern_archive(path, x, y[:3], append=True) == 13
+    actual_x, actual_y = pattern_archive.read_pattern_archive(path, 7)
+    assert np.array_equal(x, actual_x)
+    assert np.array_equal(y[7], actual_y)
+    _, actual_y = pattern_archive.read_pattern_archive(path)
+    assert np.array_equal(np.concatenate([y, y[:3]]), actual_y)
+    assert actual_y.dtype == np.float32
+
 # Debug
 
 if __name__ == '__main__':
@@ -0,0 +1,106 @@
+import os
+import shutil
+import numpy as np
+from numpy.testing import assert_almost_equal
+import pytest
+
+from pycrysfml import cif
+
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), 'corpus')
+CORPUS_NAMES = ['LaMnO3', 'Al2O3', 'Si', 'PbSO4', 'SrTiO3']  # files in sorted order, blocks in file order
+
+# Help functions
+
+def corpus_copies(dir:str, copies:int):
+    """Copies the corpus files the given number of times into subdirectories of dir."""
+    for i in range(copies):
+        shutil.copytree(CORPUS_DIR, os.path.join(dir, f'{i:04d}'))
+    return dir
+
+def records_by_name(records):
+    return {record.name: record for record in records}
+
+# Tests
+
+def test__cif_blocks__loops_and_text_fields():
+    text = "data_a _x 1 loop_ _y _z 1 2 3 4 _w 'quoted value' data_b _t\n;\nline\ndata_c\n;\n_s \"it's\" # comment"
+    blocks = list(cif.cif_blocks(text))
+    assert [name for name, _ in blocks] == ['a', 'b']
+    assert blocks[0][1] == {'_x': '1', '_y': ['1', '3'], '_z': ['2', '4'], '_w': 'quoted value'}
+    assert blocks[1][1] == {'_t': 'line\ndata_c', '_s': "it's"}
+
+def test__read_cif_records__directory():
+    records = list(cif.read_cif_records(CORPUS_DIR))
+    assert [record.name for record in records] == CORPUS_NAMES
+    records = records_by_name(records)
+    srtio3 = records['SrTiO3']
+    assert_almost_equal(srtio3.cell, [3.905, 3.905, 3.905, 90, 90, 90])
+    assert srtio3.space_group == 'P m -3 m'
+    assert srtio3.labels == ['Sr', 'Ti', 'O']
+    assert_almost_equal(srtio3.xyz, [[0.5, 0.5, 0.5], [0, 0, 0], [0.5, 0, 0]])
+    assert_almost_equal(srtio3.b_iso, [0.4, 0.5, 0.65])
+    assert srtio3.moments is None
+
+def test__read_cif_records__ddlm_tags_and_uiso():
+    pbso4 = records_by_name(cif.read_cif_records(os.path.join(CORPUS_DIR, 'pbso4.cif')))['PbSO4']
+    assert pbso4.space_group == 'P n m a'
+    assert pbso4.type_symbols[:2] == ['Pb2+', 'S6+']
+    assert pbso4.xyz.shape == (5, 3)
+    assert_almost_equal(pbso4.b_iso[0], 8 * np.pi**2 * 0.0176)
+    assert_almost_equal(pbso4.occupancy, np.ones(5))
+    assert pbso4.symmetry_operators[:2] == ['x,y,z', '-x+1/2,-y,z+1/2']
+    assert len(pbso4.symmetry_operators) == 8
+
+def test__read_cif_records__symmetry_operators():
+    text = ("data_a _cell_length_a 5.3 loop_ _symmetry_equiv_pos_as_xyz 'x, y, z' '-x, -y, -z' "
+            "data_b _cell_length_a 5.3 _symmetry_space_group_symop_operation_xyz 'x,y,z' "
+            "data_c _cell_length_a 5.3 _symmetry_space_group_name_H-M 'P 1'")
+    records = records_by_name(cif.cif_records(text))
+    assert records['a'].symmetry_operators == ['x, y, z', '-x, -y, -z']
+    assert records['b'].symmetry_operators == ['x,y,z']
+    assert records['c'].symmetry_operators is None
+
+def test__read_cif_records__multi_block_file():
+    records = records_by_name(cif.read_cif_records(os.path.join(CORPUS_DIR, 'oxides.cif')))
+    assert list(records) == ['Al2O3', 'Si']  # the header block has no cell
+    assert records['Al2O3'].type_symbols == ['Al', 'O']
+    assert records['Si'].labels == ['Si']
+    assert_almost_equal(records['Si'].xyz, [[0.125, 0.125, 0.125]])
+
+def test__read_cif_records__magnetic():
+    lamno3 = records_by_name(cif.read_cif_records(os.path.join(CORPUS_DIR, 'lamno3.mcif')))['LaMnO3']
+    assert lamno3.space_group == 'P n m a'
+    assert lamno3.magnetic_space_group == "Pn'ma'"
+    assert_almost_equal(lamno3.moments, [[0, 0, 0], [3.87, 0, 0], [0, 0, 0], [0, 0, 0]])
+
+@pytest.mark.parametrize('name, chunk_size', [('', None), ('', 1), ('oxides.cif', 1)])
+def test__read_cif_records__process_pool(name:str, chunk_size:int):
+    path = os.path.join(CORPUS_DIR, name)
+    desired = list(cif.read_cif_records(path))
+    actual = list(cif.read_cif_records(path, processes=2, chunk_size=chunk_size))
+    assert [record.name for record in actual] == [record.name for record in desired]
+    for d, a in zip(desired, actual):
+        assert_almost_equal(d.xyz, a.xyz)
+
+def test__read_cif_records__process_pool_data_line_in_text_field(tmp_path):
+    blocks = [f"data_b{i}\n_publ_section_comment\n;\ndata_not_a_block\n;\n_cell_length_a 5.{i}\n" for i in range(3)]
+    path = tmp_path / 'text_fields.cif'
+    path.write_text(''.join(blocks))
+    actual = list(cif.read_cif_records(str(path), processes=2, chunk_size=1))
+    assert [record.name for record in actual] == ['b0', 'b1', 'b2']
+    assert_almost_equal([record.cell[0] for record in actual], [5.0, 5.1, 5.2])
+
+def test__read_cif_records__files_per_second(benchmark, tmp_path):
+    copies = 100
+    corpus_dir = corpus_copies(str(tmp_path), copies)
+    n_files = len(cif.cif_files(corpus_dir))
+    records = benchmark(lambda: list(cif.read_cif_records(corpus_dir)))
+    if benchmark.stats:
+        benchmark.extra_info['files_per_second'] = n_files / benchmark.stats.stats.median
+    assert len(records) == copies * len(CORPUS_NAMES)
+
+# Debug
+
+if __name__ == '__main__':
+    test__read_cif_records__directory()
@@ -0,0 +1,73 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+
+from pycrysfml import databases
+
+
+DATABASE_TEXT = """\
+! Synthetic list-directed database in the layout of magnetic_data.txt
+1    1.1    'P1'    'P 1'
+  1  1
+  ( x, y, z; +1)    1  0  0  0  1  0  0  0  1   1  0  0  0
+2 2.4 "P-1'" 'P -1 1'  ! ignored comment
+-1.5d0 2.5E-1 .5 7
+"""
+
+# Help functions
+
+def write_database(directory, name='magnetic'):
+    path = directory / databases.DATABASE_FILES[name]
+    path.write_text(DATABASE_TEXT)
+    return str(path)
+
+# Tests
+
+def test__database_records__text(tmp_path):
+    write_database(tmp_path)
+    databases.clear_database_cache()
+    records = databases.database_records('magnetic', str(tmp_path))
+    assert records.path.endswith('magnetic_data.txt')
+    assert len(records) == 6
+    assert records.record(0) == []
+    assert records.record(1) == [1, 1.1, 'P1', 'P 1']
+    assert records.record(3)[:3] == ['(', 'x', 'y']
+    assert records.record(4) == [2, 2.4, "P-1'", "P -1 1"]
+    assert records.record(5) == [-1.5, 0.25, 0.5, 7]
+    np.testing.assert_array_equal(records.numbers(5), [-1.5, 0.25, 0.5, 7])
+    assert databases.database_records('magnetic', str(tmp_path)) is records
+    with pytest.raises(ValueError):
+        databases.database_records('nuclear', str(tmp_path))
+
+def test__database_records__binary(tmp_path):
+    text_path = write_database(tmp_path)
+    databases.clear_database_cache()
+    text_records = list(databases.database_records('magnetic', str(tmp_path)).records())
+    subprocess.run([sys.executable, databases.__file__, text_path], check=True)  # as the build does
+    assert os.path.exists(str(tmp_path / 'magnetic_data.bin'))
+    databases.clear_database_cache()
+    records = databases.database_records('magnetic', str(tmp_path))
+    assert records.path.endswith(databases.BINARY_EXTENSION)
+    assert list(records.records()) == text_records
+    numbers = records.numbers(5)
+    assert not numbers.flags.owndata and not numbers.flags.writeable  # a view of the mapped file
+    os.remove(text_path)  # the binary form alone is enough
+    databases.clear_database_cache()
+    assert list(databases.database_records('magnetic', str(tmp_path)).records()) == text_records
+
+def test__database_records__stale_binary(tmp_path):
+    text_path = write_database(tmp_path, 'superspace')
+    binary_path = databases.compile_database(text_path)
+    os.utime(binary_path, (0, 0))
+    databases.clear_database_cache()
+    assert databases.database_records('superspace', str(tmp_path)).path == text_path
+    info = databases.database_cache_info()
+    assert (info.hits, info.misses) == (0, 1)
+
+# Debug
+
+if __name__ == '__main__':
+    import pathlib, tempfile
+    test__database_records__binary(pathlib.Path(tempfile.mkdtemp()))
@@ -1,3 +1,4 @@
+import importlib.util
 import os
 import sys
 
@@ -33,6 +34,28 @@ def test__from_pycrysfml_import_cfml_utilities():
         print(f"::::: Failed to '{msg}': {e}")
         assert False
 
+def test__import_pycrysfml__no_top_level_modules():
+    import pycrysfml
+    assert importlib.util.find_spec('structure_cache') is None
+    assert importlib.util.find_spec('powder') is None
+
+def test__import_pycrysfml__generated_modules(tmp_path, monkeypatch):
+    import pycrysfml
+    (tmp_path / 'cfml_test_a.py').write_text('import cfml_test_b\nVALUE = cfml_test_b.VALUE + 1\n')
+    (tmp_path / 'cfml_test_b.py').write_text('VALUE = 1\n')
+    monkeypatch.setattr(pycrysfml, '__path__', pycrysfml.__path__ + [str(tmp_path)])
+    fixes = []
+    monkeypatch.setattr(pycrysfml, '_fix_python_path', lambda: fixes.append(True))
+    for name in ('cfml_test_a', 'cfml_test_b', 'pycrysfml.cfml_test_a', 'pycrysfml.cfml_test_b'):
+        monkeypatch.delitem(sys.modules, name, raising=False)
+    import pycrysfml.cfml_test_a
+    assert pycrysfml.cfml_test_a.VALUE == 2
+    assert sys.modules['cfml_test_b'] is sys.modules['pycrysfml.cfml_test_b']
+    assert sys.modules['cfml_test_b'].__spec__.name == 'pycrysfml.cfml_test_b'
+    assert fixes  # before loading the generated modules
+    for name in ('cfml_test_b', 'pycrysfml.cfml_test_a', 'pycrysfml.cfml_test_b'):
+        del sys.modules[name]
+
 # Debug
 
 if __name__ == '__main__':
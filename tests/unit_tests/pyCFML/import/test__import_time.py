@@ -0,0 +1,34 @@
+import re
+import subprocess
+import sys
+
+# Help functions
+
+def import_time(statement:str='import pycrysfml'):
+    """Returns the cumulative import time of pycrysfml in microseconds and the modules loaded
+    by the statement in a fresh interpreter, from the output of 'python -X importtime'."""
+    code = f"{statement}; import sys; print(' '.join(sys.modules))"
+    p = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], text=True, capture_output=True, check=True)
+    times = [int(m.group(1)) for m in re.finditer(r'\|\s*(\d+)\s*\|\s*pycrysfml\s*$', p.stderr, re.MULTILINE)]
+    return times[-1], set(p.stdout.split())
+
+# Tests
+
+def test__import_pycrysfml__lazy():
+    _, modules = import_time()
+    for name in ('subprocess', 'numpy', 'importlib.metadata', 'pycrysfml.crysfml08lib', 'pycrysfml.powder'):
+        assert name not in modules
+    _, modules = import_time('from pycrysfml import powder')
+    assert {'numpy', 'pycrysfml.powder'} <= modules
+    assert 'subprocess' not in modules
+
+def test__import_pycrysfml__time(benchmark):
+    microseconds, _ = benchmark(import_time)
+    if benchmark.stats:
+        benchmark.extra_info['import_time_us'] = microseconds
+    assert microseconds < 100_000
+
+# Debug
+
+if __name__ == '__main__':
+    print(import_time())
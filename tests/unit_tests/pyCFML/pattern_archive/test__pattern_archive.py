@@ -0,0 +1,105 @@
+import pathlib
+import tempfile
+import numpy as np
+import pytest
+
+from pycrysfml import pattern_archive
+
+
+X = np.linspace(1, 140, 2781)
+
+# Help functions
+
+def patterns(n:int, seed:int=0, dtype=np.float64):
+    """Returns n smooth test patterns on X."""
+    centres = np.random.default_rng(seed).uniform(10, 130, n)
+    return (20 + 1000 * np.exp(-((X - centres[:, None]) / 0.5)**2)).astype(dtype)
+
+# Tests
+
+def test__pattern_archive__random_access(tmp_path):
+    path = str(tmp_path / 'patterns.npz')
+    y = patterns(10)
+    with pattern_archive.PatternArchive(path, 'w', chunk_size=4) as archive:
+        archive.append(y[:7], X)
+        archive.append(y[7])  # a single pattern on the shared grid
+        archive.append(y[8:], X)
+    with pattern_archive.PatternArchive(path) as archive:
+        assert len(archive) == 10
+        assert np.array_equal(X, archive.x)
+        for index in (9, 0, 5, -1):
+            assert np.array_equal(y[index], archive[index])
+        x, actual = archive.read(3, 9)
+        assert np.array_equal(y[3:9], actual)
+        for start, stop in ((-3, None), (-6, -2), (2, -100), (-100, 4), (8, 20)):
+            assert np.array_equal(y[start:stop], archive.read(start, stop)[1])
+        with pytest.raises(IndexError):
+            archive[10]
+
+def test__pattern_archive__append_and_np_load(tmp_path):
+    path = str(tmp_path / 'patterns.npz')
+    y = patterns(5, dtype=np.float32)
+    pattern_archive.write_pattern_archive(path, X, y[:2])
+    pattern_archive.write_pattern_archive(path, X, y[2:], append=True)
+    x, actual = pattern_archive.read_pattern_archive(path)
+    assert actual.dtype == np.float32
+    assert np.array_equal(y, actual)
+    with np.load(path) as npz:  # members are plain .npy arrays
+        assert np.array_equal(X, npz['x'])
+        assert sum(len(npz[name]) for name in npz.files if name != 'x') == 5
+
+def test__pattern_archive__empty_range_and_read_only_x(tmp_path):
+    path = str(tmp_path / 'patterns.npz')
+    pattern_archive.write_pattern_archive(path, X, patterns(3, dtype=np.float32))
+    with pattern_archive.PatternArchive(path) as archive:
+        x, actual = archive.read(2, 2)
+        assert actual.shape == (0, len(X)) and actual.dtype == np.float32
+        with pytest.raises(ValueError):
+            x[0] = 0.0
+        with pytest.raises(ValueError):
+            archive.x.flags.writeable = True
+        assert np.array_equal(X, archive.read()[0])
+
+def test__pattern_archive__invalid_grid(tmp_path):
+    path = str(tmp_path / 'patterns.npz')
+    with pattern_archive.PatternArchive(path, 'w') as archive:
+        with pytest.raises(ValueError):
+            archive.append(patterns(1))  # no x grid yet
+        archive.append(patterns(1), X)
+        with pytest.raises(ValueError):
+            archive.append(patterns(1), X + 0.01)
+        with pytest.raises(ValueError):
+            archive.append(np.zeros((1, 100)))
+
+def test__pattern_archive__chunk_size(tmp_path):
+    path = str(tmp_path / 'patterns.npz')
+    with pytest.raises(ValueError):
+        pattern_archive.PatternArchive(path, 'w', chunk_size=0)
+    y = np.arange(10**6 + 2, dtype=np.int32).reshape(-1, 1)  # more patterns than the zero padding of the member names
+    pattern_archive.write_pattern_archive(path, [0.0], y, chunk_size=10**7)
+    pattern_archive.write_pattern_archive(path, [0.0], y[:2], chunk_size=10**7, append=True)
+    with pattern_archive.PatternArchive(path) as archive:
+        assert len(archive) == 10**6 + 4
+        assert archive[10**6 + 1][0] == 10**6 + 1
+        assert np.array_equal([[0], [1]], archive.read(-2)[1])
+
+def test__pattern_archive__compression(tmp_path):
+    y = patterns(64)
+    path = tmp_path / 'patterns.npz'
+    pattern_archive.write_pattern_archive(str(path), X, y)
+    text_size = len(''.join(' '.join(f'{v:.4f}' for v in row) + '\n' for row in y))
+    assert path.stat().st_size < y.nbytes < text_size
+
+def test__pattern_archive__read_one(benchmark, tmp_path):
+    path = str(tmp_path / 'patterns.npz')
+    y = patterns(1024)
+    pattern_archive.write_pattern_archive(path, X, y)
+    indices = iter(np.random.default_rng(1).integers(0, len(y), 1_000_000))
+    with pattern_archive.PatternArchive(path) as archive:
+        actual = benchmark(lambda: archive[next(indices)])
+    assert actual.shape == X.shape
+
+# Debug
+
+if __name__ == '__main__':
+    test__pattern_archive__random_access(pathlib.Path(tempfile.mkdtemp()))
@@ -0,0 +1,138 @@
+import os
+import numpy as np
+from numpy.testing import assert_almost_equal
+import pytest
+
+from pycrysfml import pattern_files
+
+
+FREE_SRTIO3 = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'functional_tests', 'CFML', 'PowderPattern',
+                           'desired', 'SrTiO3s.dat')
+X = np.array([10.0, 10.05, 10.1, 10.15, 10.2])
+Y = np.array([120.0, 135.5, 980.0, 141.0, 0.0])
+SIGMA = np.array([11.0, 11.6, 31.3, 11.9, 1.0])
+
+# Help functions
+
+def write(path, text:str):
+    path.write_text(text)
+    return str(path)
+
+def gsas_text(data_type:str):
+    fields = [f'{y:8.1f}{s:8.2f}' for y, s in zip(Y, SIGMA)] if data_type == 'ESD' else \
+             ['  ' + f'{y:6.0f}' for y in Y]
+    per_line = 5 if data_type == 'ESD' else 10
+    records = [''.join(fields[i:i + per_line]).ljust(80) for i in range(0, len(fields), per_line)]
+    header = f'BANK 1 {len(X)} {len(records)} CONS 1000.0 5.0 0 0 {data_type}'.ljust(80)
+    return 'Test pattern'.ljust(80) + '\n' + header + '\n' + '\n'.join(records) + '\n'
+
+# Tests
+
+@pytest.mark.parametrize('mmap', [False, True])
+def test__read_pattern__xysig(tmp_path, mmap:bool):
+    lines = ''.join(f'{x} {y} {s}\n' for x, y, s in zip(X, Y, SIGMA))
+    path = write(tmp_path / 'pattern.xys', f'XYDATA\nINTER 1.0 1.0 0\n! x y sigma\n{lines}')
+    x, y, sigma = pattern_files.read_pattern(path, mmap=mmap)
+    assert_almost_equal(X, x)
+    assert_almost_equal(Y, y)
+    assert_almost_equal(SIGMA, sigma)
+
+def test__read_pattern__xy_without_sigma(tmp_path):
+    path = write(tmp_path / 'pattern.dat', ''.join(f'{x} {y}\n' for x, y in zip(X, Y)))
+    assert pattern_files.detect_pattern_format(path) == 'xysig'
+    _, y, sigma = pattern_files.read_pattern(path)
+    assert_almost_equal(np.sqrt(np.maximum(Y, 1)), sigma)
+
+@pytest.mark.parametrize('mmap', [False, True])
+def test__read_pattern__free_written_by_cfml(mmap:bool):
+    assert pattern_files.detect_pattern_format(FREE_SRTIO3) == 'free'
+    x, y, sigma = pattern_files.read_pattern(FREE_SRTIO3, mmap=mmap)
+    assert len(x) == len(y) == len(sigma) == 2781
+    assert_almost_equal([x[0], x[-1]], [1, 140])
+    assert_almost_equal(y[:3], [20, 20, 20])
+
+@pytest.mark.parametrize('data_type', ['ESD', 'STD'])
+def test__read_pattern__gsas(tmp_path, data_type:str):
+    path = write(tmp_path / 'pattern.gsa', gsas_text(data_type))
+    assert pattern_files.detect_pattern_format(write(tmp_path / 'pattern.raw', gsas_text(data_type))) == 'gsas'
+    x, y, sigma = pattern_files.read_pattern(path)
+    assert_almost_equal(X, x)
+    assert_almost_equal(np.round(Y), np.round(y))
+    if data_type == 'ESD':
+        assert_almost_equal(SIGMA, sigma)
+
+def test__read_pattern__gsas_alt(tmp_path):
+    fields = [f'{x * 100:8.0f}{y * 10**4 / 1000:7.0f}{s * 10**4 / 1000:5.0f}' for x, y, s in zip(X, Y, SIGMA)]
+    records = [''.join(fields[i:i + 4]).ljust(80) for i in range(0, len(fields), 4)]
+    header = f'BANK 1 {len(X)} {len(records)} CONS 1000.0 5.0 0 0 ALT'.ljust(80)
+    x, y, sigma = pattern_files.read_pattern(write(tmp_path / 'pattern.gsa', header + '\n' + '\n'.join(records) + '\n'))
+    assert_almost_equal(X, x)
+    assert_almost_equal(Y / 1000, y)
+    assert_almost_equal(SIGMA / 1000, sigma)
+
+def test__read_pattern__gsas_slog_fxye(tmp_path):
+    tof = 1000.0 * 1.002**np.arange(len(Y))
+    lines = ''.join(f'{t} {y} {s}\n' for t, y, s in zip(tof, Y, SIGMA))
+    path = write(tmp_path / 'pattern.gsa', f'Test pattern\nBANK 1 {len(Y)} {len(Y)} SLOG 1000.0 1010.0 0.002 0 FXYE\n{lines}')
+    x, y, sigma = pattern_files.read_pattern(path)
+    assert_almost_equal(tof, x)
+    assert_almost_equal(Y, y)
+    assert_almost_equal(SIGMA, sigma)
+
+def test__read_pattern__cif(tmp_path):
+    loop = ''.join(f'{x} {y:.1f}({s * 10:.0f})\n' for x, y, s in zip(X, Y, SIGMA))
+    path = write(tmp_path / 'pattern.cif', f'data_pattern\nloop_\n_pd_meas_2theta_scan\n_pd_meas_counts_total\n{loop}')
+    x, y, sigma = pattern_files.read_pattern(path)
+    assert_almost_equal(X, x)
+    assert_almost_equal(Y, y)
+    assert_almost_equal(SIGMA, sigma)
+
+def test__read_pattern__socabim(tmp_path):
+    counts = '\n'.join(f'{y:.0f}' for y in Y)
+    path = write(tmp_path / 'pattern.raw', f'; Bruker\n_FILEVERSION=1\n_START=10.0\n_STEPSIZE=0.05\n_COUNTS\n{counts}\n')
+    assert pattern_files.detect_pattern_format(path) == 'socabim'
+    x, y, _ = pattern_files.read_pattern(path)
+    assert_almost_equal(X, x)
+    assert_almost_equal(np.round(Y), y)
+
+@pytest.mark.parametrize('mmap', [False, True])
+def test__read_pattern__comment_and_end_lines_in_data(tmp_path, mmap:bool):
+    lines = [f'{x} {y} {s}\n' for x, y, s in zip(X, Y, SIGMA)]
+    text = ''.join(lines[:2]) + '# detector gap\n\n' + ''.join(lines[2:]) + 'END\n'
+    x, y, sigma = pattern_files.read_pattern(write(tmp_path / 'pattern.xye', text), mmap=mmap)
+    assert_almost_equal(X, x)
+    assert_almost_equal(Y, y)
+    assert_almost_equal(SIGMA, sigma)
+
+@pytest.mark.parametrize('mmap', [False, True])
+def test__read_pattern__non_numeric_data(tmp_path, mmap:bool):
+    lines = [f'{x} {y} {s}\n' for x, y, s in zip(X, Y, SIGMA)]
+    path = write(tmp_path / 'pattern.xye', ''.join(lines[:2]) + 'scan 2\n' + ''.join(lines[2:]))
+    with pytest.raises(ValueError, match="'scan'"):
+        pattern_files.read_pattern(path, mmap=mmap)
+
+def test__read_pattern__socabim_comment_in_counts(tmp_path):
+    counts = '\n'.join(f'{y:.0f}' for y in Y[:2]) + '\n; gap\n' + '\n'.join(f'{y:.0f}' for y in Y[2:])
+    path = write(tmp_path / 'pattern.uxd', f'_START=10.0\n_STEPSIZE=0.05\n_COUNTS\n{counts}\n')
+    x, y, _ = pattern_files.read_pattern(path)
+    assert_almost_equal(X, x)
+    assert_almost_equal(np.round(Y), y)
+
+def test__read_pattern__unknown_format():
+    with pytest.raises(ValueError):
+        pattern_files.read_pattern(FREE_SRTIO3, format='xyz')
+    with pytest.raises(ValueError):
+        pattern_files.read_pattern(FREE_SRTIO3, format='ill')
+
+def test__read_pattern__large_xysig(benchmark, tmp_path):
+    n_points = 200_000
+    x = np.linspace(1, 160, n_points)
+    path = str(tmp_path / 'large.xys')
+    np.savetxt(path, np.column_stack([x, 100 + x, np.sqrt(100 + x)]), fmt='%.5f', header='large pattern', comments='! ')
+    x, y, sigma = benchmark(pattern_files.read_pattern, path, mmap=True)
+    assert len(x) == len(y) == len(sigma) == n_points
+
+# Debug
+
+if __name__ == '__main__':
+    test__read_pattern__free_written_by_cfml(True)
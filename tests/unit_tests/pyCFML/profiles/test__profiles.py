@@ -0,0 +1,146 @@
+import math
+import numpy as np
+from numpy.testing import assert_almost_equal
+import pytest
+
+from pycrysfml import profiles
+
+
+X = np.linspace(-5, 5, 2001)
+
+# Help functions
+
+def scalar_gaussian(x:float, H:float):
+    return 2 * math.sqrt(math.log(2) / math.pi) / H * math.exp(- 4 * math.log(2) * (x / H)**2)
+
+def scalar_lorentzian(x:float, H:float):
+    return 2.0 / math.pi / H / (1.0 + 4.0 / (H * H) * x * x)
+
+def scalar_back_to_back(x:float, alpha:float, beta:float):
+    N = 0.5 * alpha * beta / (alpha + beta)
+    return N * math.exp(-beta * x) if x >= 0 else N * math.exp(alpha * x)
+
+def scalar_ikeda_carpenter(x:float, alpha:float, beta:float, r:float):
+    if x <= 0:
+        return 0.0
+    exb = math.exp(-beta * x)
+    exa = math.exp(-alpha * x)
+    poly = 1.0 + (1.0 + 0.5 * (alpha - beta) * x) * (alpha - beta) * x
+    return 0.5 * alpha ** 3 * ((1.0 - r) * x**2 * exa + 2.0 * r * beta * (exb - exa * poly) / (alpha - beta) ** 3)
+
+# Tests
+
+def test__gaussian_lorentzian_pseudo_voigt():
+    x = np.array([-1.0, 0.0, 1.5])
+    fwhm = np.array([1.0, 1.5])
+    desired = [[scalar_gaussian(xi, H) for xi in x] for H in fwhm]
+    assert_almost_equal(desired, profiles.gaussian(x, fwhm), decimal=12)
+    desired = [[scalar_lorentzian(xi, H) for xi in x] for H in fwhm]
+    assert_almost_equal(desired, profiles.lorentzian(x, fwhm), decimal=12)
+    desired = [[0.9 * scalar_lorentzian(xi, H) + 0.1 * scalar_gaussian(xi, H) for xi in x] for H in fwhm]
+    assert_almost_equal(desired, profiles.pseudo_voigt(x, fwhm, 0.9), decimal=12)
+
+def test__tch_pseudo_voigt():
+    Hg, Hl = 2.0, 3.0
+    H = (Hg**5 + 2.69269 * Hg**4 * Hl + 2.42843 * Hg**3 * Hl**2 + 4.47163 * Hg**2 * Hl**3 + 0.07842 * Hg * Hl**4 + Hl**5) ** 0.2
+    r = Hl / H
+    eta = max(1.0e-06, 1.36603 * r - 0.47719 * r**2 + 0.11116 * r**3)  # Thompson et al., J. Appl. Cryst. 20, 79 (1987)
+    desired = eta * scalar_lorentzian(1.0, H) + (1 - eta) * scalar_gaussian(1.0, H)
+    assert_almost_equal(desired, profiles.tch_pseudo_voigt([1.0], Hg, Hl)[0, 0], decimal=12)
+
+def test__back_to_back_ikeda_carpenter():
+    x = np.array([-1.0, 0.0, 1.0, 2.5])
+    desired = [scalar_back_to_back(xi, 0.1, 0.3) for xi in x]
+    assert_almost_equal(desired, profiles.back_to_back(x, 0.1, 0.3)[0], decimal=12)
+    desired = [scalar_ikeda_carpenter(xi, 2.0, 3.0, 4.0) for xi in x]
+    assert_almost_equal(desired, profiles.ikeda_carpenter(x, 2.0, 3.0, 4.0)[0], decimal=12)
+
+@pytest.mark.parametrize('function, params', [(profiles.gaussian, (0.3,)),
+                                              (profiles.lorentzian, (0.01,)),
+                                              (profiles.pseudo_voigt, (0.05, 0.5)),
+                                              (profiles.tch_pseudo_voigt, (0.2, 0.01))])
+def test__profiles__area(function, params:tuple):
+    step = X[1] - X[0]
+    area = function(X, *params, center=[-1.0, 0.5], intensity=[1.0, 2.0]).sum(axis=1) * step
+    assert_almost_equal([1.0, 2.0], area, decimal=2)
+
+def test__profiles__summed_out():
+    rng = np.random.default_rng(1)
+    center = rng.uniform(-4, 4, 600)
+    fwhm = rng.uniform(0.05, 0.5, 600)
+    intensity = rng.uniform(1, 10, 600)
+    matrix = profiles.pseudo_voigt(X, fwhm, 0.3, center=center, intensity=intensity)
+    assert matrix.shape == (600, len(X))
+    out = np.full(len(X), np.nan)
+    summed = profiles.pseudo_voigt(X, fwhm, 0.3, center=center, intensity=intensity, summed=True, out=out)
+    assert summed is out
+    assert_almost_equal(matrix.sum(axis=0), summed, decimal=10)
+    out = np.empty((600, len(X)))
+    assert profiles.pseudo_voigt(X, fwhm, 0.3, center=center, intensity=intensity, out=out) is out
+    with pytest.raises(ValueError):
+        profiles.gaussian(X, fwhm, center=center, out=np.empty(len(X)))
+
+@pytest.mark.parametrize('window', [2.0, 5.0, 20.0])
+@pytest.mark.parametrize('eta', [0.0, 0.3, 1.0])
+def test__pseudo_voigt__window_truncation_error(window:float, eta:float):
+    x = np.linspace(-200, 200, 400001)
+    step = x[1] - x[0]
+    full = profiles.pseudo_voigt(x, 0.1, eta, summed=True)
+    windowed = profiles.pseudo_voigt(x, 0.1, eta, summed=True, window=window)
+    outside = (full - windowed).sum() * step
+    assert 0 <= outside <= profiles.truncation_error_bound(window, eta) + 1e-4
+    inside = np.abs(x) <= window * 0.1
+    assert_almost_equal(full[inside], windowed[inside], decimal=12)
+    assert not windowed[~inside].any()
+
+def test__profile_windows():
+    x = np.arange(0.0, 10.0, 0.5)
+    start, stop = profiles.profile_windows(x, np.array([1.0, 9.8]), np.array([0.4, 0.2]), 2.5)
+    assert list(start) == [0, 19]
+    assert list(stop) == [5, 20]
+
+def test__profiles__windowed_summed_matrix_blocks():
+    rng = np.random.default_rng(2)
+    center = np.sort(rng.uniform(-4, 4, 300))
+    fwhm = rng.uniform(0.05, 0.2, 300)
+    intensity = rng.uniform(1, 10, 300)
+    matrix = profiles.pseudo_voigt(X, fwhm, 0.3, center=center, intensity=intensity, window=10)
+    summed = profiles.pseudo_voigt(X, fwhm, 0.3, center=center, intensity=intensity, summed=True, window=10)
+    assert_almost_equal(matrix.sum(axis=0), summed, decimal=10)
+    accumulated = np.zeros(len(X))
+    for chunk, span, block in profiles.windowed_blocks(profiles.pseudo_voigt, X, fwhm, 0.3, center=center,
+                                                       intensity=intensity, window=10):
+        assert_almost_equal(matrix[chunk, span], block, decimal=12)
+        accumulated[span] += block.sum(axis=0)
+    assert_almost_equal(summed, accumulated, decimal=10)
+    full = profiles.pseudo_voigt(X, fwhm, 0.3, center=center, intensity=intensity, summed=True)
+    assert np.abs(full - summed).max() < profiles.truncation_error_bound(10) * full.max()
+    with pytest.raises(ValueError):
+        next(profiles.windowed_blocks(profiles.ikeda_carpenter, X, 2.0, 3.0, 4.0, window=10))
+
+def test__pseudo_voigt_derivatives():
+    x = np.linspace(-1, 1, 41)
+    center, fwhm, eta, h = 0.1, 0.3, 0.4, 1e-6
+    d_center, d_fwhm, d_eta = profiles.pseudo_voigt_derivatives(x, fwhm, eta, center=center, intensity=2.0)
+    for actual, shifts in [(d_center, (h, 0, 0)), (d_fwhm, (0, h, 0)), (d_eta, (0, 0, h))]:
+        plus = profiles.pseudo_voigt(x, fwhm + shifts[1], eta + shifts[2], center=center + shifts[0], intensity=2.0)
+        minus = profiles.pseudo_voigt(x, fwhm - shifts[1], eta - shifts[2], center=center - shifts[0], intensity=2.0)
+        assert_almost_equal((plus - minus) / (2 * h), actual, decimal=6)
+    windowed = profiles.pseudo_voigt_derivatives(x, fwhm, eta, center=center, window=1.0)
+    full = profiles.pseudo_voigt_derivatives(x, fwhm, eta, center=center)
+    inside = profiles.pseudo_voigt(x, fwhm, eta, center=center, window=1.0) != 0
+    for windowed_derivative, derivative in zip(windowed, full):
+        assert_almost_equal(np.where(inside, derivative, 0), windowed_derivative, decimal=12)
+
+def test__tch_fwhm_and_eta_derivatives():
+    g, l, h = np.array([0.2, 0.1]), np.array([0.05, 0.3]), 1e-7
+    d_fwhm_g, d_fwhm_l, d_eta_g, d_eta_l = profiles.tch_fwhm_and_eta_derivatives(g, l)
+    d_g = (np.array(profiles.tch_fwhm_and_eta(g + h, l)) - profiles.tch_fwhm_and_eta(g - h, l)) / (2 * h)
+    d_l = (np.array(profiles.tch_fwhm_and_eta(g, l + h)) - profiles.tch_fwhm_and_eta(g, l - h)) / (2 * h)
+    assert_almost_equal(d_g, [d_fwhm_g, d_eta_g], decimal=6)
+    assert_almost_equal(d_l, [d_fwhm_l, d_eta_l], decimal=6)
+
+# Debug
+
+if __name__ == '__main__':
+    test__profiles__summed_out()
@@ -0,0 +1,103 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+import pytest
+
+from pycrysfml import reflections
+from pycrysfml.space_groups import space_group_operators
+
+
+CELL_CUBIC = (3.9, 3.9, 3.9, 90, 90, 90)
+CELL_PBSO4 = (8.47793, 5.39682, 6.9581, 90, 90, 90)
+
+# Help functions
+
+def hkl_set(refl:np.ndarray):
+    return {(h, k, l) for h, k, l in zip(refl['h'], refl['k'], refl['l'])}
+
+# Tests
+
+def test__metric_tensor_derivatives():
+    cell = np.array([5.1, 5.3, 7.2, 85, 101.5, 95])
+    h = 1e-6
+    actual = reflections.metric_tensor_derivatives(*cell)
+    for i, shift in enumerate(np.eye(6) * h):
+        desired = (reflections.metric_tensor(*(cell + shift)) - reflections.metric_tensor(*(cell - shift))) / (2 * h)
+        assert_almost_equal(desired, actual[i], decimal=6)
+
+def test__reflection_list__Pm3m_multiplicities():
+    refl = reflections.reflection_list(CELL_CUBIC, 'P m -3 m', s_range=(0, 0.3))
+    assert refl.dtype == reflections.REFLECTION_DTYPE
+    assert hkl_set(refl) == {(1, 0, 0), (1, 1, 0), (1, 1, 1), (2, 0, 0), (2, 1, 0)}
+    assert list(refl['mult']) == [6, 12, 8, 6, 24]
+    assert_almost_equal(refl['d'], 3.9 / np.sqrt([1, 2, 3, 4, 5]), decimal=10)
+    assert_almost_equal(refl['s'], 0.5 / refl['d'], decimal=10)
+
+def test__reflection_list__Fm3m_absences():
+    refl = reflections.reflection_list(CELL_CUBIC, 'F m -3 m', s_range=(0, 0.5))
+    assert hkl_set(refl) == {(1, 1, 1), (2, 0, 0), (2, 2, 0), (3, 1, 1), (2, 2, 2)}
+
+def test__reflection_list__Pnma_absences():
+    refl = reflections.reflection_list(CELL_PBSO4, 'P n m a', s_range=(0, 0.6))
+    h, k, l = refl['h'], refl['k'], refl['l']
+    assert not ((h == 0) & ((k + l) % 2 == 1)).any()  # 0kl: k+l=2n
+    assert not ((l == 0) & (h % 2 == 1)).any()  # hk0: h=2n
+    assert not ((k == 0) & (l == 0) & (h % 2 == 1)).any()  # h00: h=2n
+    assert not ((h == 0) & (l == 0) & (k % 2 == 1)).any()  # 0k0: k=2n
+    assert not ((h == 0) & (k == 0) & (l % 2 == 1)).any()  # 00l: l=2n
+    assert (2, 1, 0) in hkl_set(refl)
+    assert set(refl['mult']) == {2, 4, 8}
+
+def test__reflection_list__two_theta_range():
+    wavelength = 1.5
+    refl = reflections.reflection_list(CELL_CUBIC, 'P m -3 m', two_theta_range=(25, 60), wavelength=wavelength)
+    two_theta = 2 * np.degrees(np.arcsin(wavelength * refl['s']))
+    assert (two_theta >= 25).all() and (two_theta <= 60).all()
+    assert hkl_set(refl) == {(1, 1, 0), (1, 1, 1), (2, 0, 0), (2, 1, 0), (2, 1, 1)}
+    with pytest.raises(ValueError):
+        reflections.reflection_list(CELL_CUBIC, 'P m -3 m', two_theta_range=(25, 60))
+
+def test__reflection_list__multiplicities_sum():
+    # the multiplicities of the independent reflections add up to all the allowed reflections
+    cell = (5.1, 5.3, 7.2, 90, 101.5, 90)
+    refl = reflections.reflection_list(cell, 'P 1', s_range=(0, 0.4))
+    all_hkl = len(refl) * 2
+    refl = reflections.reflection_list(cell, 'P 2/m', s_range=(0, 0.4))
+    assert refl['mult'].sum() == all_hkl
+
+def test__cached_reflections__cell_changes():
+    reflections.clear_reflection_cache()
+    group = 'P n m a'
+    s_max = 0.5
+    # 5% larger cell brings new reflections into the range; going back only moves reflections out of it
+    for scale, hits, misses in [(1.0, 0, 1), (1.001, 1, 1), (0.999, 2, 1), (1.05, 2, 2), (1.0, 3, 2)]:
+        cell = tuple(np.multiply(CELL_PBSO4, (scale, scale, scale, 1, 1, 1)))
+        hkl, mult, s = reflections.cached_reflections(cell, group, s_max)
+        desired_hkl, desired_mult, desired_s = reflections.generate_reflections(cell, *space_group_operators(group), s_max)
+        assert np.array_equal(desired_hkl, hkl)
+        assert np.array_equal(desired_mult, mult)
+        assert_almost_equal(desired_s, s, decimal=12)
+        info = reflections.reflection_cache_info()
+        assert (info.hits, info.misses) == (hits, misses)
+
+def test__cell__zero_copy_views():
+    cell = reflections.Cell(*CELL_PBSO4)
+    assert tuple(cell) == CELL_PBSO4
+    parameters = np.asarray(cell)
+    assert np.shares_memory(parameters, cell.parameters)
+    assert cell.metric.base is cell.parameters.base is cell.reciprocal_metric.base
+    assert not parameters.flags.writeable
+    assert_almost_equal(reflections.metric_tensor(*CELL_PBSO4), cell.metric, decimal=12)
+    assert_almost_equal(np.linalg.inv(cell.metric), cell.reciprocal_metric, decimal=12)
+    assert_almost_equal(reflections.cell_volume(*CELL_PBSO4), cell.volume, decimal=10)
+
+def test__cell__reflection_list():
+    cell = reflections.Cell(*CELL_PBSO4)
+    desired = reflections.reflection_list(CELL_PBSO4, 'P n m a', s_range=(0, 0.6))
+    actual = reflections.reflection_list(cell, 'P n m a', s_range=(0, 0.6))
+    assert np.array_equal(desired[['h', 'k', 'l', 'mult']], actual[['h', 'k', 'l', 'mult']])
+    assert_almost_equal(desired['s'], actual['s'], decimal=12)
+
+# Debug
+
+if __name__ == '__main__':
+    test__reflection_list__Pnma_absences()
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+
+from pycrysfml import scattering_tables
+
+
+# Tests
+
+def test__neutron_scattering_length():
+    assert scattering_tables.neutron_scattering_length('Pb') == 0.9405
+    assert scattering_tables.neutron_scattering_length('FE3+') == 0.945
+    assert list(scattering_tables.neutron_scattering_lengths(['O', 'Sr', 'O2-'])) == [0.5803, 0.702, 0.5803]
+    with pytest.raises(KeyError):
+        scattering_tables.neutron_scattering_length('Xx')
+    with pytest.raises(ValueError):
+        scattering_tables.neutron_scattering_length('12')
+
+def test__element_table__cache_info():
+    scattering_tables.clear_element_table_cache()
+    table = scattering_tables.element_table()
+    for _ in range(3):
+        scattering_tables.neutron_scattering_lengths(['Pb', 'S', 'O', 'O'])
+    info = scattering_tables.element_table_cache_info()
+    assert (info.hits, info.misses) == (9, 3)
+    assert scattering_tables.element_table() is table
+    assert not table.flags.writeable
+
+def test__element_table__binary_file(tmp_path, monkeypatch):
+    path = str(tmp_path / 'scattering_tables.npy')
+    subprocess.run([sys.executable, scattering_tables.__file__, path], check=True)  # as the build does
+    table = np.load(path, allow_pickle=False)
+    assert table.dtype == scattering_tables.ELEMENT_TABLE_DTYPE
+    assert len(table) == len(scattering_tables.NEUTRON_SCATTERING_LENGTHS)
+    table['neutron_scattering_length'][table['symbol'] == 'Pb'] = 1.5  # marks the file as the source
+    np.save(path, table)
+    monkeypatch.setattr(scattering_tables, 'ELEMENT_TABLE_FILE', path)
+    scattering_tables.clear_element_table_cache()
+    try:
+        assert scattering_tables.neutron_scattering_length('Pb') == 1.5
+    finally:
+        monkeypatch.undo()
+        scattering_tables.clear_element_table_cache()
+    assert scattering_tables.neutron_scattering_length('Pb') == 0.9405
+    assert os.path.getsize(path) < 2048
+
+# Debug
+
+if __name__ == '__main__':
+    test__neutron_scattering_length()
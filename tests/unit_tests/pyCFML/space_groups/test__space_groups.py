@@ -0,0 +1,128 @@
+import numpy as np
+import pytest
+
+from pycrysfml import space_groups
+
+
+CENTROSYMMETRIC_NUMBERS = {2, *range(10, 16), *range(47, 75), *range(83, 89), *range(123, 143),
+                           147, 148, *range(162, 168), 175, 176, *range(191, 195), *range(200, 207),
+                           *range(221, 231)}
+
+LAUE_CLASSES_BY_NUMBER = [(2, '-1'), (15, '2/m'), (74, 'mmm'), (88, '4/m'), (142, '4/mmm'),
+                          (148, '-3'), (167, '-3m'), (176, '6/m'), (194, '6/mmm'), (206, 'm-3'),
+                          (230, 'm-3m')]
+
+LAUE_CLASS_ORDERS = {'-1': 2, '2/m': 4, 'mmm': 8, '4/m': 8, '4/mmm': 16, '-3': 6, '-3m': 12,
+                     '6/m': 12, '6/mmm': 24, 'm-3': 24, 'm-3m': 48}
+
+CENTRING_COUNTS = {'P': 1, 'A': 2, 'B': 2, 'C': 2, 'I': 2, 'R': 3, 'F': 4}
+
+PBNM_XYZ = ['x,y,z', 'x+1/2,-y+1/2,-z', '-x,-y,z+1/2', '-x+1/2,y+1/2,-z+1/2',
+            '-x,-y,-z', '-x+1/2,y+1/2,z', 'x,y,-z+1/2', 'x+1/2,-y+1/2,z+1/2']
+
+# Help functions
+
+def laue_class_of_number(number:int):
+    for last_number, laue_class in LAUE_CLASSES_BY_NUMBER:
+        if number <= last_number:
+            return laue_class
+
+# Tests
+
+@pytest.mark.parametrize('number, hm, hall', space_groups.SPACE_GROUPS, ids=[hm for _, hm, _ in space_groups.SPACE_GROUPS])
+def test__space_group__order_laue_class(number:int, hm:str, hall:str):
+    group = space_groups.space_group(hm)
+    laue_class = laue_class_of_number(number)
+    assert group.number == number
+    assert group.hall == hall
+    assert group.laue_class.replace('-3m1', '-3m').replace('-31m', '-3m') == laue_class
+    assert group.centrosymmetric == (number in CENTROSYMMETRIC_NUMBERS)
+    point_group_order = LAUE_CLASS_ORDERS[laue_class] // (1 if group.centrosymmetric else 2)
+    assert len(group) == point_group_order * CENTRING_COUNTS[hm[0]]
+
+def test__space_group__symbol_variants():
+    group = space_groups.space_group('P 21/c')
+    assert space_groups.space_group('P21/c') is group
+    assert space_groups.space_group('P 1 21/c 1') is group
+    assert space_groups.space_group('-P 2ybc') is group
+    assert space_groups.space_group('F d -3 m:1').hall == 'F 4d 2 3 -1d'
+    assert space_groups.space_group('P -3 m 1').laue_class == '-3m1'
+    assert space_groups.space_group('P -3 1 m').laue_class == '-31m'
+
+@pytest.mark.parametrize('symbol, number, hall', [('P 4 2', 89, 'P 4 2'), ('P 3 2', 149, 'P 3 2'),
+                                                   ('P 3 2"', 150, 'P 3 2"'), ('P 6 2', 177, 'P 6 2'),
+                                                   ('P 42', 77, 'P 4c'), ('P32', 145, 'P 32'),
+                                                   ('P 63/mmc', 194, '-P 6c 2c')])
+def test__hall_symbol__hall_and_hm(symbol:str, number:int, hall:str):
+    assert space_groups.hall_symbol(symbol) == hall
+    assert space_groups.space_group(symbol).number == number
+
+@pytest.mark.parametrize('symbol, number, hall', [('P 21/n', 14, '-P 2yn'), ('P 1 21/n 1', 14, '-P 2yn'),
+                                                   ('P 2_1/n', 14, '-P 2yn'), ('P 1 1 21/b', 14, '-P 2bc'),
+                                                   ('I 2/a', 15, '-I 2ya'), ('C m c a', 64, '-C 2bc 2'),
+                                                   ('Cmca', 64, '-C 2bc 2'), ('P b n m', 62, '-P 2c 2ab'),
+                                                   ('Pbnm', 62, '-P 2c 2ab'), ('R -3 c:H', 167, '-R 3 2"c'),
+                                                   ('R -3 m:R', 166, '-P 3* 2'), ('P b a n:1', 50, 'P 2 2 -1ab')])
+def test__hall_symbol__settings_and_aliases(symbol:str, number:int, hall:str):
+    assert space_groups.hall_symbol(symbol) == hall
+    assert space_groups.space_group(symbol).number == number
+
+@pytest.mark.parametrize('number, hm, hall', space_groups.SETTINGS, ids=[hm for _, hm, _ in space_groups.SETTINGS])
+def test__space_group__settings(number:int, hm:str, hall:str):
+    group = space_groups.space_group(hm)
+    _, standard_hm, _ = space_groups.SPACE_GROUPS[number - 1]
+    standard = space_groups.space_group(standard_hm)
+    assert group.hall == hall
+    assert group.laue_class == standard.laue_class
+    assert group.centrosymmetric == standard.centrosymmetric
+    assert len(group) * (3 if hm.endswith(':R') else 1) == len(standard)
+
+def test__space_group__read_only():
+    group = space_groups.space_group('P n m a')
+    with pytest.raises(ValueError):
+        group.translations[0, 0] = 0.5
+    rotations, _ = space_groups.space_group_operators('P n m a')
+    rotations[0, 0, 0] = 0
+    assert np.array_equal(group.rotations[0], np.eye(3))
+
+def test__space_group__cache_info():
+    space_groups.clear_space_group_cache()
+    space_groups.space_group('P n m a')
+    space_groups.space_group('Pnma')
+    space_groups.space_group('-P 2ac 2n')
+    info = space_groups.space_group_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (2, 1, 1)
+    assert info.maxsize == space_groups.SPACE_GROUP_CACHE_SIZE
+
+def test__space_group__invalid_symbol():
+    with pytest.raises(ValueError):
+        space_groups.space_group('Q 2 2 2')
+    with pytest.raises(ValueError):
+        space_groups.hall_symbol('P 4/q')
+
+def test__operators_from_xyz():
+    rotations, translations = space_groups.operators_from_xyz(['x,y,z', '1/2-X, y , +z-0.25', '-y,x-y,z+2/3'])
+    assert np.array_equal(rotations[1], [[-1, 0, 0], [0, 1, 0], [0, 0, 1]])
+    assert np.array_equal(rotations[2], [[0, -1, 0], [1, -1, 0], [0, 0, 1]])
+    assert np.allclose(translations, [[0, 0, 0], [0.5, 0, 0.75], [0, 0, 2 / 3]])
+    for xyz in ('x,y', 'x,y,q', 'x,x,z', 'x,y,z+1/0'):
+        with pytest.raises(ValueError):
+            space_groups.operators_from_xyz([xyz])
+
+def test__space_group_from_operators():
+    group = space_groups.space_group('P n m a')
+    assert space_groups.space_group_from_operators(group.rotations, group.translations, 'P n m a') is group
+    rotations, translations = space_groups.operators_from_xyz(PBNM_XYZ)
+    assert space_groups.space_group_from_operators(rotations, translations).hall == '-P 2c 2ab'
+    assert space_groups.space_group_from_operators(rotations, translations, 'P n m a').hall == '-P 2c 2ab'
+    shift = np.full(3, 1 / 8)  # origin shift of a setting not in the tables
+    shifted = space_groups.space_group_from_operators(rotations, translations + shift - rotations @ shift)
+    assert (shifted.hall, shifted.number, shifted.hm) == (None, None, None)
+    assert (shifted.centring, shifted.laue_class, len(shifted)) == ('P', 'mmm', 8)
+    with pytest.raises(ValueError):
+        space_groups.space_group_from_operators(rotations[:3], translations[:3])
+
+# Debug
+
+if __name__ == '__main__':
+    test__space_group__symbol_variants()
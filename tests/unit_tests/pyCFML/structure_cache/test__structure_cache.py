@@ -0,0 +1,145 @@
+import os
+import shutil
+import numpy as np
+from numpy.testing import assert_almost_equal
+import pytest
+
+from pycrysfml import space_groups
+from pycrysfml import structure_cache
+
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), '..', 'cif', 'corpus')
+CFML_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'functional_tests', 'CFML')
+CFL_SRTIO3 = """Title SrTiO3
+Cell     3.9000    3.9000    3.9000     90.00     90.00     90.00
+Spgr P m -3 m
+! Label  Type  x  y  z  Biso  Occ
+Atom Sr        Sr        0.5000        0.5000        0.5000      0.4000      1.0000
+Atom Ti        Ti        0.0000        0.0000        0.0000      0.5000      1.0000
+Atom O         O         0.5000        0.0000        0.0000      0.6500      3.0000
+"""
+
+# Help functions
+
+def assert_same_structures(desired:list, actual:list):
+    assert len(desired) == len(actual)
+    for d, a in zip(desired, actual):
+        for field in ('path', 'name', 'space_group', 'magnetic_space_group', 'labels', 'type_symbols', 'symmetry_operators'):
+            assert getattr(d.record, field) == getattr(a.record, field)
+        for field in ('cell', 'xyz', 'occupancy', 'b_iso', 'moments'):
+            if getattr(d.record, field) is None:
+                assert getattr(a.record, field) is None
+            else:
+                assert_almost_equal(getattr(d.record, field), getattr(a.record, field))
+        assert (d.space_group is None) == (a.space_group is None)
+        if d.space_group is not None:
+            assert d.space_group.hall == a.space_group.hall
+            assert d.space_group.laue_class == a.space_group.laue_class
+            assert np.array_equal(d.space_group.rotations, a.space_group.rotations)
+            assert np.array_equal(d.space_group.translations, a.space_group.translations)
+
+# Tests
+
+@pytest.mark.parametrize('name', ['srtio3.cif', 'pbso4.cif', 'oxides.cif', 'lamno3.mcif'])
+def test__read_structures__cif_hit(name:str, tmp_path):
+    path = os.path.join(CORPUS_DIR, name)
+    cache_dir = str(tmp_path / 'cache')
+    structure_cache.clear_structure_cache(cache_dir)
+    desired = structure_cache.read_structures(path, use_cache=False)
+    assert_same_structures(desired, structure_cache.read_structures(path, cache_dir=cache_dir))
+    assert_same_structures(desired, structure_cache.read_structures(path, cache_dir=cache_dir))
+    info = structure_cache.structure_cache_info(cache_dir)
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+def test__read_structures__cfl_keyed_by_content(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    structure_cache.clear_structure_cache(cache_dir)
+    path = tmp_path / 'SrTiO3s.cfl'
+    path.write_text(CFL_SRTIO3)
+    structure, = structure_cache.read_structures(str(path), cache_dir=cache_dir)
+    assert structure.record.labels == ['Sr', 'Ti', 'O']
+    assert_almost_equal(structure.record.occupancy, [1, 1, 3])
+    assert structure.space_group.hall == space_groups.hall_symbol('P m -3 m')
+    copy = tmp_path / 'copy.cfl'
+    shutil.copy(path, copy)
+    structure, = structure_cache.read_structures(str(copy), cache_dir=cache_dir)  # same content, other path
+    assert structure.record.path == str(copy)
+    path.write_text(CFL_SRTIO3.replace('0.4000', '0.4500'))
+    structure, = structure_cache.read_structures(str(path), cache_dir=cache_dir)
+    assert_almost_equal(structure.record.b_iso, [0.45, 0.5, 0.65])
+    info = structure_cache.structure_cache_info(cache_dir)
+    assert (info.hits, info.misses, info.currsize) == (1, 2, 2)
+
+@pytest.mark.parametrize('name, hall, number, n_atoms', [
+    ('PowderPattern/actual/SrTiO3s.cfl', '-P 4 2 3', 221, 3),
+    ('PowderPattern/actual/ponsin.cfl', 'P 2ac 2ab', 19, 544),
+    ('hkl_gen/actual/d19.cfl', '-P 2c 2ab', 62, 0)])
+def test__read_structures__cfml_cfl(name:str, hall:str, number:int, n_atoms:int, tmp_path):
+    path = os.path.join(CFML_DIR, *name.split('/'))
+    cache_dir = str(tmp_path / 'cache')
+    structure_cache.clear_structure_cache(cache_dir)
+    desired = structure_cache.read_structures(path, use_cache=False)
+    structure, = desired
+    assert structure.space_group is not None
+    assert (structure.space_group.hall, structure.space_group.number) == (hall, number)
+    assert len(structure.record.labels) == n_atoms
+    assert_same_structures(desired, structure_cache.read_structures(path, cache_dir=cache_dir))
+    assert_same_structures(desired, structure_cache.read_structures(path, cache_dir=cache_dir))
+    info = structure_cache.structure_cache_info(cache_dir)
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+@pytest.mark.parametrize('operators, hall', [
+    ("'x, y, z' '-x, -y, -z'", '-P 1'),
+    ("x,y,z -x,-y,z+1/2 x+1/2,-y+1/2,-z -x+1/2,y+1/2,-z+1/2 -x,-y,-z x,y,-z+1/2 -x+1/2,y+1/2,z x+1/2,-y+1/2,z+1/2",
+     '-P 2c 2ab'),
+    ("x,y,z -x+1/8,-y,-z", None)])  # origin shift of a setting not in the tables
+def test__read_structures__symop_loop(operators:str, hall:str, tmp_path):
+    path = tmp_path / 'symop.cif'
+    path.write_text("data_symop _symmetry_space_group_name_H-M 'P 1' _cell_length_a 5.3 _cell_length_b 5.9 "
+                    f"_cell_length_c 7.5 loop_ _symmetry_equiv_pos_as_xyz {operators}")
+    cache_dir = str(tmp_path / 'cache')
+    desired = structure_cache.read_structures(str(path), use_cache=False)
+    structure, = desired
+    assert structure.space_group.hall == hall
+    assert len(structure.space_group) == len(structure.record.symmetry_operators)
+    structure_cache.read_structures(str(path), cache_dir=cache_dir)
+    assert_same_structures(desired, structure_cache.read_structures(str(path), cache_dir=cache_dir))
+
+def test__read_structures__unwritable_cache_dir(tmp_path):
+    path = os.path.join(CFML_DIR, 'hkl_gen', 'actual', 'd19.cfl')
+    cache_dir = tmp_path / 'file'
+    cache_dir.write_text('')  # a file, so the cache dir cannot be created
+    structure, = structure_cache.read_structures(path, cache_dir=str(cache_dir / 'cache'))
+    assert structure.record.space_group == 'P b n m'
+    assert structure.space_group.number == 62
+    assert_almost_equal(structure.record.cell, [5.34088, 5.89638, 7.4682, 90, 90, 90])
+
+def test__read_structures__cfl_name_from_path(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    structure_cache.clear_structure_cache(cache_dir)
+    untitled = CFL_SRTIO3.replace('Title SrTiO3\n', '')
+    for name in ('a', 'b'):
+        (tmp_path / f'{name}.cfl').write_text(untitled)
+        structure, = structure_cache.read_structures(str(tmp_path / f'{name}.cfl'), cache_dir=cache_dir)
+        assert structure.record.name == name
+        assert structure.space_group is space_groups.space_group('P m -3 m')  # shared with the space group cache
+    (tmp_path / 'c.cfl').write_text(CFL_SRTIO3)
+    structure, = structure_cache.read_structures(str(tmp_path / 'c.cfl'), cache_dir=cache_dir)
+    assert structure.record.name == 'SrTiO3'
+    info = structure_cache.structure_cache_info(cache_dir)
+    assert (info.hits, info.misses) == (1, 2)
+
+def test__read_structures__hit_time(benchmark, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    path = tmp_path / 'large.cfl'
+    atoms = ''.join(f'Atom C{i} C {i / 1000:.5f} 0.25 0.75 1.2 1.0\n' for i in range(1000))
+    path.write_text(CFL_SRTIO3.split('Atom')[0].replace('P m -3 m', 'F m -3 m') + atoms)
+    structure_cache.read_structures(str(path), cache_dir=cache_dir)
+    structure, = benchmark(structure_cache.read_structures, str(path), cache_dir=cache_dir)
+    assert len(structure.record.labels) == 1000
+    assert len(structure.space_group) == 192
+
+# Debug
+
+if __name__ == '__main__':
+    print(structure_cache.structure_cache_info())
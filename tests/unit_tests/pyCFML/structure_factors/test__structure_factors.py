@@ -0,0 +1,95 @@
+import numpy as np
+from numpy.testing import assert_almost_equal
+import pytest
+
+from pycrysfml import reflections
+from pycrysfml import structure_factors
+from pycrysfml.scattering_tables import neutron_scattering_length
+from pycrysfml.space_groups import space_group_operators
+
+
+ATOMS_PBSO4 = [
+    {'_label': 'Pb', '_type_symbol': 'Pb', '_fract_x': 0.18724, '_fract_y': 0.25, '_fract_z': 0.16615, '_B_iso_or_equiv': 1.2},
+    {'_label': 'S', '_type_symbol': 'S', '_fract_x': 0.06434, '_fract_y': 0.25, '_fract_z': 0.68261, '_B_iso_or_equiv': 0.5},
+    {'_label': 'O3', '_type_symbol': 'O', '_fract_x': 0.08043, '_fract_y': 0.02893, '_fract_z': 0.80734,
+     '_occupancy': 0.9, '_adp_type': 'Uiso', '_U_iso_or_equiv': 0.01}
+]
+CELL_PBSO4 = (8.47793, 5.39682, 6.9581, 90, 90, 90)
+
+# Help functions
+
+def direct_structure_factors(refl:np.ndarray, group:str, atoms:list):
+    """Sums b occ exp(-B s^2) exp(2 pi i h.(Rx+t)) over atoms and all the symmetry operators."""
+    rotations, translations = space_group_operators(group)
+    hkl = np.stack([refl['h'], refl['k'], refl['l']], axis=-1)
+    f = np.zeros(len(refl), dtype=complex)
+    for atom in atoms:
+        xyz = np.array([atom['_fract_x'], atom['_fract_y'], atom['_fract_z']])
+        b_iso = 8 * np.pi**2 * atom['_U_iso_or_equiv'] if atom.get('_adp_type') == 'Uiso' else atom['_B_iso_or_equiv']
+        for rotation, translation in zip(rotations, translations):
+            f += (atom.get('_occupancy', 1) * neutron_scattering_length(atom['_type_symbol']) *
+                  np.exp(-b_iso * refl['s']**2) * np.exp(2j * np.pi * hkl @ (rotation @ xyz + translation)))
+    return f
+
+# Tests
+
+@pytest.mark.parametrize('group', ['P n m a', 'P 21 21 21', 'P 1 21/c 1', 'F d -3 m'])
+def test__structure_factors__direct_sum(group:str):
+    refl = reflections.reflection_list(CELL_PBSO4, group, s_range=(0, 0.5))
+    desired = direct_structure_factors(refl, group, ATOMS_PBSO4)
+    actual = structure_factors.structure_factors(refl, group, ATOMS_PBSO4)
+    assert actual.dtype == complex
+    assert_almost_equal(desired, actual, decimal=10)
+
+def test__structure_factors__centrosymmetric_tables():
+    refl = reflections.reflection_list(CELL_PBSO4, 'P n m a', s_range=(0, 0.5))
+    assert structure_factors.structure_factor_tables(refl, 'P n m a').centrosymmetric_origin
+    assert not structure_factors.structure_factor_tables(refl, 'P 21 21 21').centrosymmetric_origin
+    assert not structure_factors.structure_factor_tables(refl, 'F d -3 m:1').centrosymmetric_origin  # inversion off the origin
+
+def test__structure_factors_batch():
+    refl = reflections.reflection_list(CELL_PBSO4, 'P n m a', s_range=(0, 0.6))
+    rng = np.random.default_rng(3)
+    xyz = rng.random((50, len(ATOMS_PBSO4), 3))
+    b_iso = np.where(rng.random((50, len(ATOMS_PBSO4))) < 0.5, 0.5, 1.0)
+    type_symbols = [atom['_type_symbol'] for atom in ATOMS_PBSO4]
+    actual = structure_factors.structure_factors_batch(refl, 'P n m a', type_symbols, xyz, 0.8, b_iso)
+    assert actual.shape == (50, len(refl))
+    for i in (0, 17, 49):
+        atoms = [dict(atom, _fract_x=x, _fract_y=y, _fract_z=z, _occupancy=0.8, _B_iso_or_equiv=b, _adp_type='Biso')
+                 for atom, (x, y, z), b in zip(ATOMS_PBSO4, xyz[i], b_iso[i])]
+        assert_almost_equal(direct_structure_factors(refl, 'P n m a', atoms), actual[i], decimal=10)
+    with pytest.raises(ValueError):
+        structure_factors.structure_factors_batch(refl, 'P n m a', type_symbols, xyz[0])
+
+def test__structure_factors__cache_info():
+    structure_factors.clear_structure_factor_cache()
+    refl = reflections.reflection_list(CELL_PBSO4, 'P n m a', s_range=(0, 0.5))
+    tables = structure_factors.structure_factor_tables(refl, 'P n m a')
+    structure_factors.structure_factors(refl, 'Pnma', ATOMS_PBSO4)
+    structure_factors.structure_factors(refl[:10], 'P n m a', ATOMS_PBSO4)
+    info = structure_factors.structure_factor_cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 2, 2)
+    assert tables.debye_waller(1.2) is tables.debye_waller(1.2)
+
+def test__atom_list__zero_copy_views():
+    atoms = structure_factors.AtomList(ATOMS_PBSO4)
+    assert atoms.labels == ['Pb', 'S', 'O3']
+    xyz, occupancy, scattering_length, b_iso = structure_factors.atom_arrays(atoms)
+    for desired, actual in zip(structure_factors.atom_arrays(ATOMS_PBSO4), (xyz, occupancy, scattering_length, b_iso)):
+        assert_almost_equal(desired, actual, decimal=12)
+        assert np.shares_memory(np.asarray(atoms), actual)
+
+def test__atom_list__structure_factors():
+    refl = reflections.reflection_list(CELL_PBSO4, 'P n m a', s_range=(0, 0.5))
+    atoms = structure_factors.AtomList(ATOMS_PBSO4)
+    desired = structure_factors.structure_factors(refl, 'P n m a', ATOMS_PBSO4)
+    assert_almost_equal(desired, structure_factors.structure_factors(refl, 'P n m a', atoms), decimal=10)
+    atoms.b_iso[0] = 0.7  # seen by the next call without rebuilding the list
+    desired = structure_factors.structure_factors(refl, 'P n m a', [dict(ATOMS_PBSO4[0], _B_iso_or_equiv=0.7)] + ATOMS_PBSO4[1:])
+    assert_almost_equal(desired, structure_factors.structure_factors(refl, 'P n m a', atoms), decimal=10)
+
+# Debug
+
+if __name__ == '__main__':
+    test__structure_factors_batch()